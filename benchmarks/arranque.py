@@ -0,0 +1,97 @@
+"""
+Mide el tiempo de arranque de un worker: importar el paquete, construir la
+app con create_app(), precalentar, y la latencia de la primera petición al
+catálogo con y sin precalentamiento. Cada medición corre en un intérprete
+nuevo para que no haya nada importado de antemano.
+
+Uso:
+    python -m benchmarks.arranque --repeticiones 5
+
+Sin DATABASE_URL usa un SQLite temporal con algunos productos.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+MEDICION = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from ecom_login.app import create_app
+from ecom_login.models import Usuario
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+if sys.argv[1] == 'precalentado':
+    from ecom_login.modules.utils.arranque_utils import precalentar
+    precalentar(app)
+t3 = time.perf_counter()
+cliente = app.test_client()
+with app.app_context():
+    usuario = Usuario.query.filter_by(correo='bench@local').first()
+with cliente.session_transaction() as sesion:
+    sesion['_user_id'] = str(usuario.id)
+    sesion['_fresh'] = True
+t4 = time.perf_counter()
+respuesta = cliente.get('/')
+t5 = time.perf_counter()
+assert respuesta.status_code == 200, respuesta.status_code
+print(json.dumps({
+    'importar': t1 - t0, 'create_app': t2 - t1, 'precalentar': t3 - t2, 'primera_peticion': t5 - t4,
+}))
+'''
+
+
+def preparar_base():
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Usuario, Producto
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        usuario = Usuario(nombre='bench', correo='bench@local', rol='cliente')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.add_all(
+            Producto(nombre=f'Producto {i}', descripcion='bench', precio=10.0, stock=50)
+            for i in range(100)
+        )
+        db.session.commit()
+
+
+def medir(modo):
+    salida = subprocess.run(
+        [sys.executable, '-c', MEDICION, modo],
+        check=True, capture_output=True, text=True, env=os.environ.copy(),
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        ruta = os.path.join(tempfile.mkdtemp(), 'arranque.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    preparar_base()
+
+    print(f'{"modo":<13} {"importar":>10} {"create_app":>11} {"precalentar":>12} {"1ª petición":>12}  (ms, mediana)')
+    for modo in ('frio', 'precalentado'):
+        muestras = [medir(modo) for _ in range(args.repeticiones)]
+        mediana = {k: statistics.median(m[k] for m in muestras) * 1000 for k in muestras[0]}
+        print(
+            f'{modo:<13} {mediana["importar"]:>10.1f} {mediana["create_app"]:>11.1f} '
+            f'{mediana["precalentar"]:>12.1f} {mediana["primera_peticion"]:>12.1f}'
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Benchmark de la búsqueda de texto completo: siembra N productos con nombres
+y descripciones combinando un vocabulario fijo y mide la latencia de
+consultas típicas (palabra completa, prefijo de autocompletado, varias
+palabras, página profunda, sin resultados) directamente contra el índice,
+sin pasar por la caché del catálogo.
+
+Uso:
+    python -m benchmarks.busqueda --productos 100000 --repeticiones 200
+    python -m benchmarks.busqueda --candidatos 0   # ordenando todas las coincidencias
+
+Sin DATABASE_URL usa un SQLite temporal en disco. Objetivo: p95 < 10 ms.
+Por defecto mide el BUSQUEDA_MAX_CANDIDATOS de la configuración; con
+--candidatos 0 se ordenan todas las coincidencias y las consultas amplias
+cuestan más cuantos más productos coinciden.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+OBJETIVO_MS = 10.0
+LOTE = 5000
+
+TIPOS = ('Figura', 'Peluche', 'Funko', 'Llavero', 'Póster', 'Taza', 'Carta', 'Maqueta', 'Estatua', 'Cómic')
+TEMAS = (
+    'dragón', 'samurái', 'astronauta', 'gato', 'robot', 'hechicera', 'pirata', 'dinosaurio',
+    'caballero', 'sirena', 'vampiro', 'ninja', 'fénix', 'unicornio', 'zombi', 'alienígena',
+)
+ADJETIVOS = ('rojo', 'dorado', 'brillante', 'clásico', 'retro', 'gigante', 'mini', 'oscuro', 'legendario', 'pastel')
+DETALLES = (
+    'edición limitada', 'pintado a mano', 'con caja original', 'numerado', 'de colección',
+    'articulado', 'con base iluminada', 'exclusivo de convención', 'firmado por el autor',
+)
+
+CONSULTAS = [
+    ('palabra', 'dragón'),
+    ('dos palabras', 'figura samurai'),
+    ('autocompletar 2.ª palabra', 'figura sam'),
+    ('prefijo corto', 'dr'),
+    ('prefijo autocompletar', 'astron'),
+    ('tres palabras', 'peluche gato dorado'),
+    ('descripción', 'pintado mano'),
+    ('sin resultados', 'xilófono'),
+]
+
+
+def productos_sinteticos(azar, cantidad, desde):
+    for i in range(desde, desde + cantidad):
+        yield {
+            'nombre': f'{azar.choice(TIPOS)} {azar.choice(TEMAS)} {azar.choice(ADJETIVOS)} #{i}',
+            'descripcion': f'{azar.choice(DETALLES).capitalize()}, {azar.choice(DETALLES)} ({azar.choice(TEMAS)})',
+            'precio': round(azar.uniform(5, 300), 2),
+            'stock': azar.randint(0, 500),
+            'imagen': '',
+        }
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--candidatos', type=int, default=None,
+                        help='BUSQUEDA_MAX_CANDIDATOS (0 = ordenar todas; por defecto, el de la config)')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        ruta = os.path.join(tempfile.mkdtemp(), 'busqueda.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Producto
+    from ecom_login.modules.utils.busqueda_utils import consultar_indice, terminos_de_busqueda
+
+    app = create_app()
+    if args.candidatos is not None:
+        app.config['BUSQUEDA_MAX_CANDIDATOS'] = args.candidatos
+    azar = random.Random(args.semilla)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        inicio = time.perf_counter()
+        filas = list(productos_sinteticos(azar, args.productos, 1))
+        for i in range(0, len(filas), LOTE):
+            db.session.execute(Producto.__table__.insert(), filas[i:i + LOTE])
+        db.session.commit()
+        print(f'{args.productos} productos sembrados e indexados en {time.perf_counter() - inicio:.1f} s '
+              f'({db.engine.dialect.name}, BUSQUEDA_MAX_CANDIDATOS={app.config["BUSQUEDA_MAX_CANDIDATOS"]})')
+
+        por_pagina = app.config['PRODUCTOS_POR_PAGINA']
+        casos = CONSULTAS + [('página 20', 'figura')]
+        print(f'{"consulta":<40} {"resultados":>10} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8}')
+        peor_p95 = 0.0
+        for nombre, texto in casos:
+            terminos = terminos_de_busqueda(texto)
+            pagina = 20 if nombre == 'página 20' else 1
+            tiempos = []
+            for _ in range(args.repeticiones):
+                t0 = time.perf_counter()
+                resultado = consultar_indice(terminos, pagina, por_pagina)
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            p95 = percentil(tiempos, 0.95)
+            peor_p95 = max(peor_p95, p95)
+            print(f'{nombre + " (" + texto + ")":<40} {len(resultado.productos):>10} '
+                  f'{statistics.median(tiempos):>8.2f} {p95:>8.2f} {max(tiempos):>8.2f}')
+
+    estado = 'OK' if peor_p95 < OBJETIVO_MS else 'LENTO'
+    print(f'{estado}: peor p95 {peor_p95:.2f} ms (objetivo < {OBJETIVO_MS:.0f} ms)')
+    return 0 if estado == 'OK' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Conductor de carga: usuarios virtuales recorren el flujo completo de compra
+
+    login -> catálogo (2 páginas) -> agregar_carrito -> finalizar_compra
+          -> selección de pago -> pago_tarjeta / pago_pse -> confirmación
+
+con la concurrencia indicada. Informa throughput y latencia p50/p99 por ruta
+y puede guardar el resultado en JSON para compararlo entre commits
+(python -m benchmarks.comparar antes.json despues.json).
+
+Uso:
+    python -m benchmarks.sembrar --usuarios 500 --productos 200 --limpiar
+    python -m benchmarks.carga --usuarios 500 --concurrencia 16 --duracion 30 --salida carga.json
+
+Sin --url levanta la aplicación en un servidor local (werkzeug, con hilos)
+sobre DATABASE_URL (SQLite o PostgreSQL local). Con --url ataca un servidor
+ya en marcha, por ejemplo gunicorn.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+from .sembrar import CONTRASENA, CORREO
+
+TARJETA_VALIDA = '4111111111111111'
+
+
+class SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    """Cada paso se mide por separado: las redirecciones no se siguen solas."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Registro:
+    def __init__(self):
+        self.latencias = {}
+        self.errores = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, ruta, segundos, ok):
+        with self._lock:
+            self.latencias.setdefault(ruta, []).append(segundos)
+            if not ok:
+                self.errores[ruta] = self.errores.get(ruta, 0) + 1
+
+
+class UsuarioVirtual:
+    def __init__(self, base, correo, registro, azar):
+        self.base = base.rstrip('/')
+        self.correo = correo
+        self.registro = registro
+        self.azar = azar
+        self.cliente = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SinRedirecciones()
+        )
+
+    def pedir(self, ruta, url, datos=None):
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.cliente.open(self.base + url, data=cuerpo, timeout=30)
+            estado, texto, destino = respuesta.status, respuesta.read().decode(), None
+        except urllib.error.HTTPError as e:
+            estado, texto, destino = e.code, e.read().decode(errors='replace'), e.headers.get('Location')
+        except OSError:
+            estado, texto, destino = 0, '', None
+        self.registro.agregar(ruta, time.perf_counter() - inicio, 200 <= estado < 400)
+        return estado, texto, destino
+
+    def compra(self):
+        self.pedir('POST /login', '/login', {'correo': self.correo, 'contraseña': CONTRASENA})
+        _, catalogo, _ = self.pedir('GET /', '/')
+        siguiente = re.search(r'\?despues=(\d+)', catalogo)
+        if siguiente:
+            _, catalogo, _ = self.pedir('GET /?despues=', f'/?despues={siguiente.group(1)}')
+
+        productos = re.findall(r'/carrito/agregar/(\d+)', catalogo)
+        if not productos:
+            return
+        producto_id = self.azar.choice(productos)
+        self.pedir('POST /carrito/agregar/<id>', f'/carrito/agregar/{producto_id}', {'cantidad': 1})
+        self.pedir('GET /carrito', '/carrito')
+        self.pedir('POST /finalizar_compra', '/finalizar_compra', {})
+
+        _, pago, _ = self.pedir('GET /pago/metodo', '/pago/metodo')
+        pedido = re.search(r'/pago/tarjeta/(\d+)', pago)
+        if not pedido:
+            return
+        pedido_id = pedido.group(1)
+        if self.azar.random() < 0.6:
+            self.pedir('POST /pago/tarjeta/<id>', f'/pago/tarjeta/{pedido_id}', {
+                'numero_tarjeta': TARJETA_VALIDA, 'nombre_titular': 'Bench', 'cvv': '123',
+            })
+        else:
+            self.pedir('POST /pago/pse/<id>', f'/pago/pse/{pedido_id}', {
+                'banco': 'Bancolombia', 'tipo_persona': 'Natural',
+                'tipo_documento': 'CC', 'numero_documento': '1234567',
+            })
+        self.pedir('GET /pago/confirmacion/<id>', f'/pago/confirmacion/{pedido_id}')
+        self.pedir('GET /logout', '/logout')
+
+
+def percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(int(q * len(ordenados)), len(ordenados) - 1)]
+
+
+def levantar_servidor():
+    from werkzeug.serving import make_server
+    from ecom_login.app import create_app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    servidor = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_port}'
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='servidor ya en marcha (por defecto se levanta uno local)')
+    parser.add_argument('--usuarios', type=int, default=500, help='usuarios sembrados entre los que elegir')
+    parser.add_argument('--primer-usuario', type=int, default=1)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=20, help='segundos de carga')
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--salida', help='archivo JSON con los resultados')
+    args = parser.parse_args()
+
+    servidor = None
+    base = args.url
+    if base is None:
+        servidor, base = levantar_servidor()
+
+    registro = Registro()
+    fin = time.monotonic() + args.duracion
+    compras = [0] * args.concurrencia
+
+    def trabajador(indice):
+        azar = random.Random(args.semilla + indice)
+        while time.monotonic() < fin:
+            correo = CORREO.format(args.primer_usuario + azar.randrange(args.usuarios))
+            UsuarioVirtual(base, correo, registro, azar).compra()
+            compras[indice] += 1
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(args.concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+    if servidor is not None:
+        servidor.shutdown()
+
+    rutas = {}
+    for ruta, latencias in sorted(registro.latencias.items()):
+        rutas[ruta] = {
+            'peticiones': len(latencias),
+            'errores': registro.errores.get(ruta, 0),
+            'rps': len(latencias) / transcurrido,
+            'p50_ms': percentil(latencias, 0.5) * 1000,
+            'p99_ms': percentil(latencias, 0.99) * 1000,
+        }
+
+    print(f'{"ruta":<30} {"pet.":>7} {"err.":>5} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for ruta, r in rutas.items():
+        print(f'{ruta:<30} {r["peticiones"]:>7} {r["errores"]:>5} {r["rps"]:>8.1f} {r["p50_ms"]:>8.1f} {r["p99_ms"]:>8.1f}')
+    print(f'compras completas: {sum(compras)} en {transcurrido:.1f} s ({sum(compras) / transcurrido:.2f}/s)')
+
+    if args.salida:
+        resultado = {
+            'commit': commit_actual(),
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'base_de_datos': (os.environ.get('DATABASE_URL') or '').split(':', 1)[0],
+            'python': platform.python_version(),
+            'concurrencia': args.concurrencia,
+            'duracion_s': transcurrido,
+            'compras': sum(compras),
+            'rutas': rutas,
+        }
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, sort_keys=True, ensure_ascii=False)
+            archivo.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark del carrito: operaciones por segundo con cada CARRITO_BACKEND
+('bd', 'memoria', 'sqlite') y cuántas escrituras llegan a carrito_items.
+Cada hilo es un usuario con su sesión iniciada que repite agregar, cambiar
+cantidad, ver el carrito y quitar, a través de las rutas de la tienda.
+
+Uso:
+    python -m benchmarks.carrito --backends bd memoria sqlite --hilos 4 --ciclos 200
+
+Sin DATABASE_URL usa un SQLite temporal en disco (los fsync cuentan). Las
+escrituras de los backends diferidos incluyen la persistencia final.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+CLAVE = 'bench'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['bd', 'memoria', 'sqlite'])
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--ciclos', type=int, default=200, help='ciclos de 4 operaciones por hilo')
+    parser.add_argument('--productos', type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directorio, "carrito.db")}'
+    # El login no es lo que se mide
+    os.environ.setdefault('HASH_METODO', 'pbkdf2:sha256:1')
+    os.environ.setdefault('HASH_PROCESOS', '0')
+
+    from sqlalchemy import event
+    from ecom_login.app import create_app
+    from ecom_login.config import Config
+    from ecom_login.models import db, Usuario, Producto
+    from ecom_login.modules.utils.almacen_carrito_utils import almacen_carrito
+
+    print(f'{"backend":>8} {"ops/s":>10} {"escrituras carrito_items":>25} {"commits":>9}')
+    for backend in args.backends:
+        class ConfigBench(Config):
+            CARRITO_BACKEND = backend
+            CARRITO_RUTA = os.path.join(directorio, f'carritos_{backend}.sqlite3')
+            CARRITO_PERSISTIR_INTERVALO = 0
+            PEDIDOS_LIMPIEZA_INTERVALO = 0
+
+        app = create_app(ConfigBench)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for i in range(args.hilos):
+                usuario = Usuario(nombre=f'bench {i}', correo=f'bench{i}@local', rol='cliente')
+                usuario.set_password(CLAVE)
+                db.session.add(usuario)
+            db.session.add_all(
+                Producto(nombre=f'Producto {i}', descripcion='bench', precio=10.0, stock=10**6)
+                for i in range(args.productos)
+            )
+            db.session.commit()
+            motor = db.engine
+
+        contadores = {'escrituras': 0, 'commits': 0}
+        lock = threading.Lock()
+
+        def sentencia(conn, cursor, sql, parametros, contexto, executemany):
+            if 'carrito_items' in sql.split('WHERE')[0] and sql.lstrip().split()[0] in ('INSERT', 'UPDATE', 'DELETE'):
+                with lock:
+                    contadores['escrituras'] += 1
+
+        def commit(conn):
+            with lock:
+                contadores['commits'] += 1
+
+        event.listen(motor, 'before_cursor_execute', sentencia)
+        event.listen(motor, 'commit', commit)
+
+        clientes = []
+        for i in range(args.hilos):
+            cliente = app.test_client()
+            cliente.post('/login', data={'correo': f'bench{i}@local', 'contraseña': CLAVE})
+            clientes.append(cliente)
+        contadores.update(escrituras=0, commits=0)
+
+        def trabajar(cliente):
+            for ciclo in range(args.ciclos):
+                producto_id = ciclo % args.productos + 1
+                cliente.post(f'/carrito/agregar/{producto_id}', data={'cantidad': '1'})
+                cliente.post(f'/carrito/actualizar/{producto_id}', data={'cantidad': '2'})
+                cliente.get('/carrito')
+                cliente.get(f'/carrito/eliminar/{producto_id}')
+
+        hilos = [threading.Thread(target=trabajar, args=(cliente,)) for cliente in clientes]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+        with app.app_context():
+            almacen_carrito.persistir()
+
+        event.remove(motor, 'before_cursor_execute', sentencia)
+        event.remove(motor, 'commit', commit)
+        operaciones = 4 * args.ciclos * args.hilos
+        print(f'{backend:>8} {operaciones / segundos:>10.1f} {contadores["escrituras"]:>25} {contadores["commits"]:>9}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Benchmark de creación de pedidos: compara el flujo anterior de
+finalizar_compra (commit del pedido + un DetallePedido ORM por línea + otro
+commit) con el actual (una transacción, detalles en un executemany).
+
+Uso:
+    python -m benchmarks.checkout --pedidos 200 --lineas 1 10 100
+
+Sin DATABASE_URL usa un SQLite temporal en disco (los fsync cuentan).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def crear_pedido_antes(db, Pedido, DetallePedido, usuario_id, lineas, total):
+    """Réplica del flujo original: dos commits y un objeto ORM por línea."""
+    pedido = Pedido(usuario_id=usuario_id, total=total, estado='Pendiente de Pago')
+    db.session.add(pedido)
+    db.session.commit()
+    for linea in lineas:
+        db.session.add(DetallePedido(pedido_id=pedido.id, **linea))
+    db.session.commit()
+    return pedido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos', type=int, default=200)
+    parser.add_argument('--lineas', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        ruta = os.path.join(tempfile.mkdtemp(), 'checkout.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Usuario, Producto, Pedido, DetallePedido
+    from ecom_login.modules.utils.pedidos_utils import crear_pedido
+
+    app = create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        usuario = Usuario(nombre='bench', correo='bench@local', rol='cliente')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.add_all(
+            Producto(nombre=f'Producto {i}', descripcion='bench', precio=10.0, stock=10**6)
+            for i in range(max(args.lineas))
+        )
+        db.session.commit()
+        usuario_id = usuario.id
+        productos = [p.id for p in Producto.query.order_by(Producto.id)]
+
+        def despues(lineas, total):
+            crear_pedido(usuario_id, lineas, total)
+            db.session.commit()
+
+        def antes(lineas, total):
+            crear_pedido_antes(db, Pedido, DetallePedido, usuario_id, lineas, total)
+
+        print(f'{"líneas":>7} {"antes (ped/s)":>15} {"después (ped/s)":>17} {"mejora":>8}')
+        for n in args.lineas:
+            lineas = [
+                {'producto_id': pid, 'cantidad': 1, 'precio': 10.0, 'subtotal': 10.0}
+                for pid in productos[:n]
+            ]
+            resultados = {}
+            for nombre, funcion in (('antes', antes), ('despues', despues)):
+                db.session.expunge_all()
+                inicio = time.perf_counter()
+                for _ in range(args.pedidos):
+                    funcion(lineas, 10.0 * n)
+                resultados[nombre] = args.pedidos / (time.perf_counter() - inicio)
+            print(
+                f'{n:>7} {resultados["antes"]:>15.1f} {resultados["despues"]:>17.1f} '
+                f'{resultados["despues"] / resultados["antes"]:>7.2f}x'
+            )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Compara dos resultados JSON de benchmarks.carga (por ejemplo, de dos commits).
+
+Uso:
+    python -m benchmarks.comparar antes.json despues.json
+"""
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('antes')
+    parser.add_argument('despues')
+    args = parser.parse_args()
+
+    with open(args.antes, encoding='utf-8') as archivo:
+        antes = json.load(archivo)
+    with open(args.despues, encoding='utf-8') as archivo:
+        despues = json.load(archivo)
+
+    print(f'{antes.get("commit")} -> {despues.get("commit")}')
+    print(f'{"ruta":<30} {"req/s":>17} {"p50 ms":>17} {"p99 ms":>17}')
+    for ruta in sorted(set(antes['rutas']) | set(despues['rutas'])):
+        a = antes['rutas'].get(ruta)
+        d = despues['rutas'].get(ruta)
+        if a is None or d is None:
+            print(f'{ruta:<30} {"(solo en " + ("después" if a is None else "antes") + ")":>17}')
+            continue
+        columnas = []
+        for clave in ('rps', 'p50_ms', 'p99_ms'):
+            cambio = (d[clave] - a[clave]) / a[clave] * 100 if a[clave] else 0.0
+            columnas.append(f'{d[clave]:>8.1f} ({cambio:+5.0f}%)')
+        print(f'{ruta:<30} ' + ' '.join(columnas))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Prueba de concurrencia del descuento de stock: muchos pagos en paralelo
+compiten por pocas unidades de los mismos productos. Cada pedido tiene su
+intento de pago en la cola y se cobra por el mismo camino que la ruta de
+pago (cola_pagos.procesar: reclamar, pasarela simulada y finalizar).
+Con --rechazadas N cada N-ésimo pago usa la tarjeta que la pasarela
+rechaza, así también se prueba la devolución del stock reservado.
+
+Uso:
+    python -m benchmarks.concurrencia_stock --hilos 32 --pedidos 200 --stock 25 --rechazadas 5
+
+Sin DATABASE_URL usa un SQLite temporal; con DATABASE_URL apuntando a un
+PostgreSQL local corre contra él (¡borra y recrea las tablas!).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--pedidos', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=25)
+    parser.add_argument('--rechazadas', type=int, default=0, help='Cada N-ésimo pago se rechaza (0 = ninguno)')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        ruta = os.path.join(tempfile.mkdtemp(), 'concurrencia.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Usuario, Producto, Pedido, DetallePedido, MetodoPago
+    from ecom_login.modules.utils.cola_pagos_utils import cola_pagos, nueva_clave, PasarelaSimulada, APROBADO, RECHAZADO
+
+    app = create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        usuario = Usuario(nombre='bench', correo='bench@local', rol='cliente')
+        usuario.set_password('bench')
+        a = Producto(nombre='Producto A', descripcion='hot sku', precio=10, stock=args.stock)
+        b = Producto(nombre='Producto B', descripcion='hot sku', precio=10, stock=args.stock)
+        db.session.add_all([usuario, a, b])
+        db.session.flush()
+
+        intentos = []
+        for i in range(args.pedidos):
+            pedido = Pedido(usuario_id=usuario.id, total=20, estado='Pendiente de Pago')
+            db.session.add(pedido)
+            db.session.flush()
+            # La mitad de los pedidos lista los productos en orden inverso
+            orden = (a, b) if i % 2 == 0 else (b, a)
+            for producto in orden:
+                db.session.add(DetallePedido(
+                    pedido_id=pedido.id, producto_id=producto.id, cantidad=1, precio=10, subtotal=10
+                ))
+            metodo = MetodoPago(pedido_id=pedido.id, tipo_pago='tarjeta', estado_pago='Pendiente',
+                                clave_idempotencia=nueva_clave())
+            db.session.add(metodo)
+            db.session.flush()
+            rechazada = args.rechazadas and i % args.rechazadas == 0
+            numero = PasarelaSimulada.TARJETA_RECHAZADA if rechazada else '4111111111111111'
+            intentos.append((metodo.id, {'numero_tarjeta': numero}))
+        db.session.commit()
+        ids_productos = (a.id, b.id)
+
+    errores = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(min(args.hilos, args.pedidos))
+
+    def pagar(intento):
+        metodo_id, datos_cobro = intento
+        with app.test_request_context():
+            try:
+                barrera.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                cola_pagos.procesar(metodo_id, datos_cobro)
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errores.append(repr(e))
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        list(pool.map(pagar, intentos))
+
+    with app.app_context():
+        stocks = [db.session.get(Producto, pid).stock for pid in ids_productos]
+        confirmados = Pedido.query.filter_by(estado='Confirmado').count()
+        aprobados = MetodoPago.query.filter_by(estado_pago=APROBADO).count()
+        rechazados = MetodoPago.query.filter_by(estado_pago=RECHAZADO).count()
+
+    print(f'pedidos={args.pedidos} hilos={args.hilos} stock_inicial={args.stock} rechazadas=cada {args.rechazadas}')
+    print(f'confirmados={confirmados} aprobados={aprobados} rechazados={rechazados} '
+          f'stock_final={stocks} errores={len(errores)}')
+    for error in errores[:5]:
+        print('  ', error)
+
+    ok = (
+        confirmados == aprobados <= args.stock
+        and aprobados + rechazados == args.pedidos
+        and all(s == args.stock - confirmados for s in stocks)
+        and not errores
+    )
+    # Sin rechazos de la pasarela se tiene que vender todo lo que alcanza
+    if not args.rechazadas:
+        ok = ok and confirmados == min(args.stock, args.pedidos)
+    print('OK' if ok else 'FALLO: se vendió más (o menos) de lo disponible')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
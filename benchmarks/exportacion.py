@@ -0,0 +1,101 @@
+"""
+Comprobación de memoria de la exportación de pedidos: siembra un conjunto
+pequeño y otro grande, descarga /admin/pedidos/exportar.<formato> en
+streaming y mide el pico de memoria de Python (tracemalloc) de cada
+descarga. Como referencia mide también cargar las mismas filas con .all().
+
+Uso:
+    python -m benchmarks.exportacion --usuarios 500 20000 --formato csv
+
+Sale con código 1 si el pico del conjunto grande pasa de 2x el del pequeño
+(+2 MiB de margen): con yield_per la memoria no debe crecer con las filas.
+Sin DATABASE_URL usa un SQLite temporal en disco.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+MIB = 1024 * 1024
+TANDA_USUARIOS = 5000
+
+
+def medir(funcion):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    duracion = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, pico, duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, nargs=2, default=[500, 20000], metavar=('PEQUENO', 'GRANDE'))
+    parser.add_argument('--productos', type=int, default=500)
+    parser.add_argument('--formato', choices=['csv', 'jsonl'], default='csv')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        ruta = os.path.join(tempfile.mkdtemp(), 'exportacion.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    os.environ.setdefault('HASH_PROCESOS', '0')
+
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago
+    from ecom_login.modules.utils.exportar_utils import consulta_exportacion
+    from ecom_login.modules.utils.listado_pedidos_utils import FiltrosPedidos
+    from benchmarks.sembrar import sembrar
+
+    app = create_app()
+    modelos = (Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(nombre='admin', correo='admin@bench.local', rol='admin')
+        admin.set_password('bench123')
+        db.session.add(admin)
+        db.session.commit()
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'correo': 'admin@bench.local', 'contraseña': 'bench123'})
+
+    def descargar():
+        respuesta = cliente.get(f'/admin/pedidos/exportar.{args.formato}', buffered=False)
+        filas = total = 0
+        for trozo in respuesta.response:
+            total += len(trozo)
+            filas += trozo.count(b'\n') if isinstance(trozo, bytes) else trozo.count('\n')
+        respuesta.close()
+        return filas, total
+
+    def cargar_todo():
+        with app.app_context():
+            return len(db.session.execute(consulta_exportacion(FiltrosPedidos())).all())
+
+    sembrados = 0
+    picos = []
+    print(f'{"usuarios":>9} {"filas":>9} {"MiB":>8} {"streaming pico MiB":>19} {"s":>6} {".all() pico MiB":>16}')
+    for objetivo in args.usuarios:
+        with app.app_context():
+            while sembrados < objetivo:
+                tanda = min(TANDA_USUARIOS, objetivo - sembrados)
+                sembrar(db, modelos, tanda, args.productos, 3, sembrados)
+                sembrados += tanda
+        (filas, total), pico, duracion = medir(descargar)
+        _, pico_todo, _ = medir(cargar_todo)
+        picos.append(pico)
+        print(f'{objetivo:>9} {filas:>9} {total / MIB:>8.1f} {pico / MIB:>19.2f} {duracion:>6.1f} {pico_todo / MIB:>16.2f}')
+
+    limite = 2 * picos[0] + 2 * MIB
+    estado = 'OK' if picos[1] <= limite else 'CRECE'
+    print(f'{estado}: pico grande {picos[1] / MIB:.2f} MiB, límite {limite / MIB:.2f} MiB')
+    return 0 if estado == 'OK' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark del hashing de contraseñas: verificaciones (logins) por segundo y
+por núcleo con el método configurado, en el hilo de la petición y en el pool
+de procesos de ServicioHash con distintos tamaños. Al final comprueba el
+límite de HASH_COLA_MAX: tres veces esa cantidad de logins simultáneos (como
+los hilos de un worker gthread) deben rechazarse con HashSaturado al instante
+en lugar de esperar; si no se rechaza ninguno termina con error.
+
+Uso:
+    python -m benchmarks.hash_login --logins 64 --metodo scrypt:32768:8:1 --cola-max 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def medir(servicio, hash_guardado, logins, hilos):
+    rechazados = [0]
+    lock = threading.Lock()
+
+    def login(_):
+        from ecom_login.modules.utils.hash_utils import HashSaturado
+        try:
+            servicio.verificar(hash_guardado, 'bench123')
+        except HashSaturado:
+            with lock:
+                rechazados[0] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(login, range(logins)))
+    return time.perf_counter() - inicio, rechazados[0]
+
+
+def comprobar_saturacion(metodo, procesos, cola_max, hash_guardado):
+    """Logins simultáneos por encima de HASH_COLA_MAX con el servicio configurado como en la app."""
+    from flask import Flask
+    from ecom_login.modules.utils.hash_utils import HashSaturado, ServicioHash
+
+    app = Flask(__name__)
+    app.config.update(HASH_METODO=metodo, HASH_PROCESOS=procesos, HASH_COLA_MAX=cola_max)
+    servicio = ServicioHash(app)
+    servicio.verificar(hash_guardado, 'bench123')  # arrancar los procesos fuera de la medición
+
+    hilos = cola_max * 3
+    rechazos, aceptados = [], []
+    barrera = threading.Barrier(hilos)
+    lock = threading.Lock()
+
+    def login(_):
+        barrera.wait()
+        t0 = time.perf_counter()
+        try:
+            servicio.verificar(hash_guardado, 'bench123')
+            destino = aceptados
+        except HashSaturado:
+            destino = rechazos
+        with lock:
+            destino.append((time.perf_counter() - t0) * 1000)
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(login, range(hilos)))
+
+    print(f'saturación: {hilos} logins simultáneos, HASH_COLA_MAX={cola_max}, {procesos} procesos')
+    print(f'  aceptados  {len(aceptados):>4}  max {max(aceptados, default=0):8.1f} ms')
+    print(f'  rechazados {len(rechazos):>4}  max {max(rechazos, default=0):8.1f} ms')
+    return len(rechazos) > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--metodo', default='scrypt:32768:8:1')
+    parser.add_argument('--procesos', type=int, nargs='+', default=None)
+    parser.add_argument('--cola-max', type=int, default=4, help='HASH_COLA_MAX de la comprobación de saturación')
+    args = parser.parse_args()
+
+    from werkzeug.security import generate_password_hash
+    from ecom_login.modules.utils.hash_utils import ServicioHash
+
+    nucleos = os.cpu_count() or 1
+    tamanos = args.procesos or sorted({1, 2, nucleos})
+    hash_guardado = generate_password_hash('bench123', method=args.metodo)
+
+    print(f'método {args.metodo}, {args.logins} logins, {nucleos} núcleos')
+    print(f'{"modo":<22} {"logins/s":>10} {"logins/s/núcleo":>16} {"rechazados":>11}')
+
+    servicio = ServicioHash()
+    servicio.metodo, servicio.procesos = args.metodo, 0
+    duracion, _ = medir(servicio, hash_guardado, args.logins, 1)
+    print(f'{"en el hilo":<22} {args.logins / duracion:>10.1f} {args.logins / duracion:>16.1f} {0:>11}')
+
+    for procesos in tamanos:
+        servicio = ServicioHash()
+        servicio.metodo, servicio.procesos = args.metodo, procesos
+        servicio._cupos = threading.BoundedSemaphore(args.logins)
+        servicio.verificar(hash_guardado, 'bench123')  # arrancar los procesos fuera de la medición
+        duracion, rechazados = medir(servicio, hash_guardado, args.logins, procesos * 2)
+        usados = min(procesos, nucleos)
+        print(
+            f'{f"pool de {procesos} procesos":<22} {args.logins / duracion:>10.1f} '
+            f'{args.logins / duracion / usados:>16.1f} {rechazados:>11}'
+        )
+
+    if not comprobar_saturacion(args.metodo, max(tamanos), args.cola_max, hash_guardado):
+        print('ERROR: HASH_COLA_MAX no rechazó ningún login')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Sembrador de datos sintéticos para pruebas de carga.
+
+Genera usuarios, productos, carritos e historial de pedidos (con sus
+detalles y métodos de pago) en proporciones parecidas a las de la tienda:
+~30 % de los usuarios con carrito abierto, ~3 pedidos por usuario, 1-6
+líneas por pedido, y pago registrado en todos los pedidos ya confirmados.
+
+Uso:
+    python -m benchmarks.sembrar --usuarios 1000 --productos 500 [--limpiar]
+
+Todos los usuarios quedan con la contraseña de CONTRASENA (benchmarks.carga
+la usa para iniciar sesión). Usa DATABASE_URL como la aplicación.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+CONTRASENA = 'bench123'
+CORREO = 'usuario{}@bench.local'
+LOTE = 5000
+
+ESTADOS = (
+    ('Entregado', 0.55), ('Enviado', 0.1), ('Confirmado', 0.1),
+    ('Cancelado', 0.1), ('Pendiente de Pago', 0.15),
+)
+BANCOS = ('Bancolombia', 'Davivienda', 'BBVA Colombia', 'Banco de Bogotá')
+
+
+def insertar_en_lotes(db, tabla, filas):
+    for i in range(0, len(filas), LOTE):
+        db.session.execute(tabla.insert(), filas[i:i + LOTE])
+
+
+def sembrar(db, modelos, usuarios, productos, pedidos_por_usuario, semilla):
+    from sqlalchemy import func, select, text
+    from ecom_login.modules.utils.hash_utils import servicio_hash
+
+    Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago = modelos
+    azar = random.Random(semilla)
+    ahora = datetime.utcnow()
+
+    # Un solo hash para todos: hashear miles de contraseñas no es lo que se mide
+    hash_comun = servicio_hash.hashear(CONTRASENA)
+    primer_usuario = (db.session.scalar(select(func.max(Usuario.id))) or 0) + 1
+    insertar_en_lotes(db, Usuario.__table__, [
+        {'nombre': f'Usuario {i}', 'correo': CORREO.format(i), 'contrasena': hash_comun, 'rol': 'cliente'}
+        for i in range(primer_usuario, primer_usuario + usuarios)
+    ])
+    primer_producto = (db.session.scalar(select(func.max(Producto.id))) or 0) + 1
+    insertar_en_lotes(db, Producto.__table__, [
+        {
+            'nombre': f'Coleccionable {i}',
+            'descripcion': f'Figura de colección número {i}, edición limitada',
+            'precio': round(azar.uniform(5, 300), 2),
+            'stock': azar.randint(50, 5000),
+            'imagen': '',
+        }
+        for i in range(primer_producto, primer_producto + productos)
+    ])
+    ids_usuarios = range(primer_usuario, primer_usuario + usuarios)
+    ids_productos = range(primer_producto, primer_producto + productos)
+
+    carrito = []
+    for usuario_id in ids_usuarios:
+        if azar.random() < 0.3:
+            for producto_id in azar.sample(ids_productos, min(azar.randint(1, 5), productos)):
+                carrito.append({'usuario_id': usuario_id, 'producto_id': producto_id, 'cantidad': azar.randint(1, 3)})
+    insertar_en_lotes(db, CarritoItem.__table__, carrito)
+
+    estados, pesos = zip(*ESTADOS)
+    primer_pedido = (db.session.scalar(select(func.max(Pedido.id))) or 0) + 1
+    pedidos, detalles, pagos = [], [], []
+    pedido_id = primer_pedido
+    for usuario_id in ids_usuarios:
+        for _ in range(azar.randint(0, pedidos_por_usuario * 2)):
+            fecha = ahora - timedelta(minutes=azar.randint(0, 60 * 24 * 365))
+            estado = azar.choices(estados, pesos)[0]
+            total = 0.0
+            for producto_id in azar.sample(ids_productos, min(azar.randint(1, 6), productos)):
+                cantidad = azar.randint(1, 3)
+                precio = round(azar.uniform(5, 300), 2)
+                total += precio * cantidad
+                detalles.append({
+                    'pedido_id': pedido_id, 'producto_id': producto_id,
+                    'cantidad': cantidad, 'precio': precio, 'subtotal': precio * cantidad,
+                })
+            pedidos.append({'id': pedido_id, 'usuario_id': usuario_id, 'fecha': fecha, 'total': total, 'estado': estado})
+            if estado != 'Pendiente de Pago':
+                tarjeta = azar.random() < 0.6
+                pagos.append({
+                    'pedido_id': pedido_id,
+                    'tipo_pago': 'tarjeta' if tarjeta else 'pse',
+                    'estado_pago': 'Cancelado' if estado == 'Cancelado' else 'Aprobado',
+                    'numero_tarjeta': f'{azar.randint(0, 9999):04d}' if tarjeta else None,
+                    'nombre_titular': f'Usuario {usuario_id}' if tarjeta else None,
+                    'banco': None if tarjeta else azar.choice(BANCOS),
+                    'tipo_persona': None if tarjeta else 'Natural',
+                    'tipo_documento': None if tarjeta else 'CC',
+                    'numero_documento': None if tarjeta else f'{azar.randint(0, 9999):04d}',
+                    'fecha_pago': fecha + timedelta(minutes=azar.randint(1, 30)),
+                })
+            pedido_id += 1
+    insertar_en_lotes(db, Pedido.__table__, pedidos)
+    insertar_en_lotes(db, DetallePedido.__table__, detalles)
+    insertar_en_lotes(db, MetodoPago.__table__, pagos)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Los ids de pedidos se asignaron a mano: adelantar la secuencia
+        db.session.execute(text(
+            "SELECT setval(pg_get_serial_sequence('pedidos', 'id'), (SELECT MAX(id) FROM pedidos))"
+        ))
+    # Las filas se insertaron sin el ORM: los resúmenes de ventas se recalculan
+    from ecom_login.modules.utils.ventas_utils import resumen_ventas
+    resumen_ventas.reconstruir()
+    db.session.commit()
+
+    return {
+        'usuarios': usuarios, 'productos': productos, 'carrito_items': len(carrito),
+        'pedidos': len(pedidos), 'detalles_pedido': len(detalles), 'metodos_pago': len(pagos),
+        'primer_usuario': primer_usuario,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--productos', type=int, default=500)
+    parser.add_argument('--pedidos-por-usuario', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--limpiar', action='store_true', help='borra y recrea todas las tablas antes de sembrar')
+    args = parser.parse_args()
+
+    from ecom_login.app import create_app
+    from ecom_login.models import db, Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago
+
+    app = create_app()
+    with app.app_context():
+        if args.limpiar:
+            db.drop_all()
+        db.create_all()
+        inicio = time.perf_counter()
+        resumen = sembrar(
+            db, (Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago),
+            args.usuarios, args.productos, args.pedidos_por_usuario, args.semilla,
+        )
+    print(', '.join(f'{k}={v}' for k, v in resumen.items()) + f' ({time.perf_counter() - inicio:.1f} s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
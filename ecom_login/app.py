@@ -1,23 +1,52 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Blueprint, Response, stream_with_context, send_file, render_template, request, redirect, url_for, flash, session, jsonify, abort, current_app
+from flask.cli import with_appcontext
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_wtf import FlaskForm
+from flask_migrate import Migrate
 from wtforms import StringField, SubmitField
 from wtforms.validators import DataRequired, Length
 from .config import Config
-from .models import db, Usuario, Producto, CarritoItem, Pedido, DetallePedido, MetodoPago
-from .modules.utils.pagos_utils import verificar_propietario_pedido, verificar_y_actualizar_stock, registrar_pago_tarjeta, registrar_pago_pse, verificar_tarjeta_luhn
+from .models import db, Usuario, Producto, Pedido, DetallePedido, MetodoPago
+from .modules.utils.pagos_utils import verificar_propietario_pedido, datos_publicos_tarjeta, datos_publicos_pse, verificar_tarjeta_luhn
+from .modules.utils.cola_pagos_utils import cola_pagos, nueva_clave, ultimo_intento, ESTADOS_FINALES, EN_COLA, APROBADO
+from .modules.utils.catalogo_utils import paginar_productos, obtener_pagina_catalogo, renderizar_tarjetas
+from .modules.utils.cache_utils import cache_catalogo, invalidar_catalogo
+from .modules.utils.consultas_utils import carga_detalle_pedido
+from .modules.utils.listado_pedidos_utils import FiltrosPedidos, paginar_pedidos, contar_por_estado, ESTADOS_PEDIDO
+from .modules.utils.almacen_carrito_utils import almacen_carrito
+from .modules.utils.pedidos_utils import pedido_para_carrito
+from .modules.utils.stock_utils import liberar_stock
+from .modules.utils.limpieza_utils import limpiador_pedidos
+from .modules.utils.archivo_utils import archivo_pedidos, buscar_pedido, pagina_mis_pedidos
+from .modules.utils.estaticos_utils import estaticos, compilar_estaticos
+from .modules.utils.imagenes_utils import imagenes_productos, FORMATOS as FORMATOS_IMAGEN
+from .modules.utils.condicional_utils import get_condicional, version_catalogo, version_mis_pedidos, version_pedido
+from .modules.utils.indices_utils import verificar_indices
+from .modules.utils.arranque_utils import precalentar
+from .modules.utils.pool_utils import telemetria_pool
+from .modules.utils.metricas_utils import metricas
+from .modules.utils.hash_utils import servicio_hash, HashSaturado
+from .modules.utils.sesion_utils import cache_principales, invalidar_usuario
+from .modules.utils.busqueda_utils import buscar_productos, crear_indice_busqueda
+from .modules.utils.ventas_utils import resumen_ventas
+from .modules.utils.exportar_utils import GENERADORES, FORMATOS
+from .modules.utils.productos_utils import validar_producto
+from .modules.utils.importar_utils import formato_de_archivo, leer_filas, importar_productos
 from dotenv import load_dotenv
+import click
+import csv
+import io
 import os
+import time
 
 # ---------------------- CONFIGURACIÓN INICIAL ----------------------
-app = Flask(__name__)
+# Importar este módulo no toca la base de datos: la aplicación se construye
+# en create_app() y el esquema se crea con `flask db upgrade` (o `flask crear-tablas`).
+tienda = Blueprint('tienda', __name__)
 
-app.config.from_object(Config)
-
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+# Migraciones (flask db upgrade / flask db downgrade)
+MIGRACIONES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+migrate = Migrate()
 
 # config/messages.py
 ACCESS_DENIED_MSG = "Acceso denegado."
@@ -25,40 +54,115 @@ ACCESS_DENIED_MSG = "Acceso denegado."
 
 # ---------------------- CONFIGURACIÓN DE LOGIN ----------------------
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'tienda.login'
 login_manager.login_message = "Por favor, inicia sesión para acceder a esta página."
 login_manager.login_message_category = "warning"
 
 @login_manager.user_loader
 def load_user(user_id):
-    return Usuario.query.get(int(user_id))
+    return cache_principales.obtener(int(user_id))
+
+
+def create_app(config=Config):
+    """Construye la aplicación. No abre conexiones ni crea tablas."""
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    telemetria_pool.init_app(app)
+    db.init_app(app)
+    cache_catalogo.init_app(app)
+    migrate.init_app(app, db, directory=MIGRACIONES_DIR)
+    login_manager.init_app(app)
+    metricas.init_app(app)
+    servicio_hash.init_app(app)
+    cache_principales.init_app(app)
+    resumen_ventas.init_app(app)
+    cola_pagos.init_app(app)
+    limpiador_pedidos.init_app(app)
+    almacen_carrito.init_app(app)
+    archivo_pedidos.init_app(app)
+    get_condicional.init_app(app)
+    estaticos.init_app(app)
+    imagenes_productos.init_app(app)
+
+    app.register_blueprint(tienda)
+    app.cli.add_command(crear_tablas_cmd)
+    app.cli.add_command(warmup_cmd)
+    app.cli.add_command(verificar_indices_cmd)
+    app.cli.add_command(reconstruir_ventas_cmd)
+    app.cli.add_command(importar_productos_cmd)
+    app.cli.add_command(recuperar_pagos_cmd)
+    app.cli.add_command(limpiar_pedidos_cmd)
+    app.cli.add_command(archivar_pedidos_cmd)
+    app.cli.add_command(compilar_estaticos_cmd)
+    app.cli.add_command(procesar_imagenes_cmd)
+    return app
+
 
 # ---------------------- RUTAS ----------------------
-@app.route('/')
+@tienda.route('/')
 @login_required
 def home():
-    productos = Producto.query.all()
-    return render_template('user/catalogo.html', nombre=current_user.correo, productos=productos)
+    # 304 si el catálogo no cambió desde la última visita
+    no_modificado = get_condicional.no_modificado(version_catalogo())
+    if no_modificado:
+        return no_modificado
+    pagina = obtener_pagina_catalogo(
+        despues_de=request.args.get('despues', type=int),
+        antes_de=request.args.get('antes', type=int),
+    )
+    return render_template('user/catalogo.html', nombre=current_user.correo,
+                           productos=pagina.productos, pagina=pagina,
+                           tarjetas=renderizar_tarjetas(pagina.productos))
+
+
+# ---------- BÚSQUEDA ----------
+@tienda.route('/buscar')
+@login_required
+def buscar():
+    q = request.args.get('q', '').strip()
+    pagina = buscar_productos(q, pagina=request.args.get('pagina', 1, type=int))
+    return render_template('user/buscar.html', q=q, pagina=pagina, productos=pagina.productos,
+                           tarjetas=renderizar_tarjetas(pagina.productos),
+                           max_candidatos=current_app.config['BUSQUEDA_MAX_CANDIDATOS'])
+
+
+@tienda.route('/buscar/json')
+@login_required
+def buscar_json():
+    # Para autocompletar: cada palabra se busca como prefijo
+    pagina = buscar_productos(
+        request.args.get('q', ''),
+        pagina=request.args.get('pagina', 1, type=int),
+        por_pagina=request.args.get('limite', type=int),
+    )
+    return jsonify(pagina.como_dict())
 
 
 # ---------- LOGIN ----------
-@app.route('/login', methods=['GET', 'POST'])
+@tienda.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         correo = request.form['correo']
         contrasena = request.form['contraseña']
 
         usuario = Usuario.query.filter_by(correo=correo).first()
-        if usuario and check_password_hash(usuario.contrasena, contrasena):
-            login_user(usuario)
+        valida, necesita_rehash = (
+            servicio_hash.verificar(usuario.contrasena, contrasena) if usuario else (False, False)
+        )
+        if valida:
+            # Hash con parámetros viejos: rehacerlo ahora que tenemos la contraseña
+            if necesita_rehash:
+                usuario.set_password(contrasena)
+                db.session.commit()
+            login_user(cache_principales.recordar(usuario))
             flash('Has iniciado sesión correctamente.', 'success')
 
             # Redirigir según rol
             if usuario.rol == 'admin':
-                return redirect(url_for('admin_dashboard'))
+                return redirect(url_for('tienda.admin_dashboard'))
             else:
-                return redirect(url_for('home'))
+                return redirect(url_for('tienda.home'))
         else:
             flash('Correo o contraseña incorrectos.', 'danger')
 
@@ -66,7 +170,7 @@ def login():
 
 
 # ---------- REGISTRO ----------
-@app.route('/register', methods=['GET', 'POST'])
+@tienda.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         nombre = request.form['nombre']
@@ -82,13 +186,13 @@ def register():
             db.session.add(nuevo)
             db.session.commit()
             flash('Registro exitoso. Ahora puedes iniciar sesión.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('tienda.login'))
 
     return render_template('register.html')
 
 
 # ---------- CAMBIO DE CONTRASEÑA ----------
-@app.route('/change_password', methods=['GET', 'POST'])
+@tienda.route('/change_password', methods=['GET', 'POST'])
 @login_required
 def change_password():
     if request.method == 'POST':
@@ -96,26 +200,30 @@ def change_password():
         nueva = request.form['nueva']
         confirmar = request.form['confirmar']
 
+        # current_user es un principal cacheado: la cuenta se cambia sobre el Usuario real
+        usuario = db.session.get(Usuario, current_user.id)
+
         # Validar contraseña actual
-        if not check_password_hash(current_user.contrasena, actual):
+        if not usuario.check_password(actual):
             flash('La contraseña actual es incorrecta.', 'danger')
-            return redirect(url_for('change_password'))
+            return redirect(url_for('tienda.change_password'))
 
         if nueva != confirmar:
             flash('Las contraseñas nuevas no coinciden.', 'warning')
-            return redirect(url_for('change_password'))
+            return redirect(url_for('tienda.change_password'))
 
         # Actualizar contraseña
-        current_user.contrasena = generate_password_hash(nueva)
+        usuario.set_password(nueva)
+        invalidar_usuario(usuario.id)
         db.session.commit()
         flash('Contraseña actualizada correctamente.', 'success')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     return render_template('cambio_pass.html')
 
 
 # ---------- AJUSTES DE USUARIO ----------
-@app.route('/ajustes', methods=['GET', 'POST'])
+@tienda.route('/ajustes', methods=['GET', 'POST'])
 @login_required
 def ajustes_usuario():
     if request.method == 'POST':
@@ -124,67 +232,117 @@ def ajustes_usuario():
         if existente:
             flash('Ese correo ya está en uso.', 'warning')
         else:
-            current_user.correo = nuevo_correo
+            usuario = db.session.get(Usuario, current_user.id)
+            usuario.correo = nuevo_correo
+            invalidar_usuario(usuario.id)
             db.session.commit()
             flash('Correo actualizado correctamente.', 'success')
-            return redirect(url_for('home'))
+            return redirect(url_for('tienda.home'))
 
     return render_template('ajustes.html', correo_actual=current_user.correo)
 
 
+# ---------- HASHING SATURADO ----------
+PLANTILLAS_CON_HASH = {
+    'tienda.login': 'login.html',
+    'tienda.register': 'register.html',
+    'tienda.change_password': 'cambio_pass.html',
+}
+
+
+@tienda.errorhandler(HashSaturado)
+def hash_saturado(error):
+    flash('El servidor está ocupado. Intenta de nuevo en unos segundos.', 'warning')
+    plantilla = PLANTILLAS_CON_HASH.get(request.endpoint, 'login.html')
+    return render_template(plantilla), 503, {'Retry-After': '1'}
+
+
 # ---------- LOGOUT ----------
-@app.route('/logout')
+@tienda.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Sesión cerrada correctamente.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('tienda.login'))
 
 
 # ---------------------ADMINISTRADOR-----------------------
 
-@app.route('/admin/dashboard')
+@tienda.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
     if current_user.rol != 'admin':
         flash('No tienes permiso para acceder a esta sección.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
-    productos = Producto.query.all()
-    return render_template('admin/dashboard.html', productos=productos)
+    pagina = paginar_productos(
+        despues_de=request.args.get('despues', type=int),
+        antes_de=request.args.get('antes', type=int),
+    )
+    return render_template('admin/dashboard.html', productos=pagina.productos, pagina=pagina,
+                           ventas=resumen_ventas.tablero())
 
 
 # ---------- ADMIN: LISTAR PEDIDOS ----------
-@app.route('/admin/pedidos')
+@tienda.route('/admin/pedidos')
 @login_required
 def admin_pedidos():
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
+
+    filtros = FiltrosPedidos.desde_args(request.args)
+    pagina = paginar_pedidos(
+        filtros,
+        despues_de=request.args.get('despues'),
+        antes_de=request.args.get('antes'),
+    )
+    return render_template('admin/pedidos.html', pedidos=pagina.pedidos, pagina=pagina, filtros=filtros,
+                           por_estado=contar_por_estado(filtros), estados=ESTADOS_PEDIDO)
+
+
+# ---------- ADMIN: EXPORTAR PEDIDOS ----------
+@tienda.route('/admin/pedidos/exportar.<formato>')
+@login_required
+def exportar_pedidos(formato):
+    if current_user.rol != 'admin':
+        flash(ACCESS_DENIED_MSG, 'danger')
+        return redirect(url_for('tienda.home'))
+    if formato not in GENERADORES:
+        abort(404)
 
-    pedidos = Pedido.query.order_by(Pedido.fecha.desc()).all()
-    return render_template('admin/pedidos.html', pedidos=pedidos)
+    # Mismos filtros que admin_pedidos; el cuerpo se genera mientras se envía
+    filtros = FiltrosPedidos.desde_args(request.args)
+    nombre = f"pedidos-{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}.{formato}"
+    return Response(
+        stream_with_context(GENERADORES[formato](filtros)),
+        mimetype=FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename={nombre}'},
+    )
 
 
 # ---------- ADMIN: VER DETALLE DE PEDIDO ----------
-@app.route('/admin/pedido/<int:pedido_id>')
+@tienda.route('/admin/pedido/<int:pedido_id>')
 @login_required
 def admin_detalle_pedido(pedido_id):
     if current_user.rol != 'admin':
         flash('Acceso denegado.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
     
-    pedido = Pedido.query.get_or_404(pedido_id)
+    # Los pedidos viejos pueden estar en el archivo
+    pedido = buscar_pedido(pedido_id, con_usuario=True)
+    if pedido is None:
+        abort(404)
     return render_template('admin/detalle_pedido_admin.html', pedido=pedido)
 
 
 # ---------- ADMIN: CAMBIAR ESTADO ----------
-@app.route('/admin/pedido/<int:pedido_id>/estado', methods=['POST'])
+@tienda.route('/admin/pedido/<int:pedido_id>/estado', methods=['POST'])
 @login_required
 def cambiar_estado_pedido(pedido_id):
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     pedido = Pedido.query.get_or_404(pedido_id)
     nuevo_estado = request.form['estado']
@@ -192,40 +350,40 @@ def cambiar_estado_pedido(pedido_id):
     db.session.commit()
 
     flash(f'Estado del pedido #{pedido.id} actualizado a "{nuevo_estado}".', 'success')
-    return redirect(url_for('admin_pedidos'))
+    return redirect(url_for('tienda.admin_pedidos'))
 
 
 # ---------- ADMIN: CANCELAR PEDIDO ----------
-@app.route('/admin/pedido/<int:pedido_id>/cancelar', methods=['POST'])
+@tienda.route('/admin/pedido/<int:pedido_id>/cancelar', methods=['POST'])
 @login_required
 def cancelar_pedido_admin(pedido_id):
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
-    pedido = Pedido.query.get_or_404(pedido_id)
+    # Bloqueado como en cola_pagos.finalizar(): un cobro que termina a la vez ve el pedido cancelado
+    pedido = Pedido.query.filter_by(id=pedido_id).with_for_update().first_or_404()
     
     # Solo se pueden cancelar pedidos que no estén entregados o ya cancelados
     if pedido.estado in ['Entregado', 'Cancelado']:
         flash(f'No se puede cancelar un pedido con estado "{pedido.estado}".', 'warning')
-        return redirect(url_for('admin_pedidos'))
+        return redirect(url_for('tienda.admin_pedidos'))
     
     try:
         # Si el pedido está confirmado (ya se descontó stock), devolver el stock
         if pedido.estado in ['Confirmado', 'Enviado']:
-            detalles = DetallePedido.query.filter_by(pedido_id=pedido.id).all()
-            for detalle in detalles:
-                producto = Producto.query.get(detalle.producto_id)
-                if producto:
-                    producto.stock += detalle.cantidad
+            lineas = db.session.query(DetallePedido.producto_id, DetallePedido.cantidad).filter_by(pedido_id=pedido.id).all()
+            liberar_stock(lineas)
+            invalidar_catalogo()
         
         # Cambiar estado a Cancelado
         pedido.estado = 'Cancelado'
         
-        # Actualizar estado de pago si existe
-        metodo_pago = MetodoPago.query.filter_by(pedido_id=pedido.id).first()
-        if metodo_pago:
-            metodo_pago.estado_pago = 'Cancelado'
+        # Actualizar estado de pago si existe. Los intentos que se están cobrando
+        # los cierra finalizar(): ve el pedido cancelado y devuelve su reserva
+        MetodoPago.query.filter(
+            MetodoPago.pedido_id == pedido.id, MetodoPago.estado_pago.in_((EN_COLA, APROBADO))
+        ).update({'estado_pago': 'Cancelado'}, synchronize_session=False)
         
         db.session.commit()
         flash(f'Pedido #{pedido.id} cancelado exitosamente. Stock restaurado.', 'success')
@@ -234,118 +392,164 @@ def cancelar_pedido_admin(pedido_id):
         db.session.rollback()
         flash(f'Error al cancelar el pedido: {str(e)}', 'danger')
     
-    return redirect(url_for('admin_pedidos'))
+    return redirect(url_for('tienda.admin_pedidos'))
 
 
-@app.route('/dashboard')
+# ---------- ADMIN: ESTADÍSTICAS DE CACHÉ ----------
+@tienda.route('/admin/cache')
+@login_required
+def admin_cache():
+    if current_user.rol != 'admin':
+        flash(ACCESS_DENIED_MSG, 'danger')
+        return redirect(url_for('tienda.home'))
+
+    return jsonify({**cache_catalogo.estadisticas(), 'usuarios': cache_principales.estadisticas()})
+
+
+# ---------- ADMIN: ESTADO DEL POOL DE CONEXIONES ----------
+@tienda.route('/admin/pool')
+@login_required
+def admin_pool():
+    if current_user.rol != 'admin':
+        flash(ACCESS_DENIED_MSG, 'danger')
+        return redirect(url_for('tienda.home'))
+
+    return jsonify(telemetria_pool.estado())
+
+
+# ---------- ADMIN: MÉTRICAS (FORMATO PROMETHEUS) ----------
+@tienda.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.rol != 'admin':
+        flash(ACCESS_DENIED_MSG, 'danger')
+        return redirect(url_for('tienda.home'))
+
+    cache = cache_catalogo.estadisticas()
+    principales = cache_principales.estadisticas()
+    pool = telemetria_pool.estado()
+    pagos = cola_pagos.estadisticas()
+    limpieza = limpiador_pedidos.estadisticas()
+    carrito = almacen_carrito.estadisticas()
+    archivo = archivo_pedidos.estadisticas()
+    imagenes = imagenes_productos.estadisticas()
+    extras = [
+        ('ecom_cache_catalogo_aciertos_total', 'counter', 'Aciertos de la caché del catálogo', cache['aciertos']),
+        ('ecom_cache_catalogo_fallos_total', 'counter', 'Fallos de la caché del catálogo', cache['fallos']),
+        ('ecom_cache_usuarios_consultas_ahorradas_total', 'counter', 'Cargas de current_user servidas sin consultar la base', principales['consultas_ahorradas']),
+        ('ecom_cache_usuarios_fallos_total', 'counter', 'Cargas de current_user que consultaron la base', principales['fallos']),
+        ('ecom_cache_usuarios_invalidaciones_total', 'counter', 'Principales descartados por cambios en la cuenta', principales['invalidaciones']),
+        ('ecom_pool_conexiones_en_uso', 'gauge', 'Conexiones prestadas del pool', pool.get('en_uso', 0)),
+        ('ecom_pool_overflow', 'gauge', 'Conexiones abiertas por encima de pool_size', pool.get('overflow', 0)),
+        ('ecom_pool_espera_max_segundos', 'gauge', 'Mayor espera para obtener una conexión', pool['espera_max_ms'] / 1000),
+        ('ecom_pool_timeouts_total', 'counter', 'Checkouts que agotaron pool_timeout', pool['timeouts']),
+        ('ecom_pagos_encolados_total', 'counter', 'Intentos de pago guardados en la cola', pagos['encolados']),
+        ('ecom_pagos_reintentos_total', 'counter', 'Envíos repetidos resueltos por la clave de idempotencia', pagos['reintentos']),
+        ('ecom_pagos_aprobados_total', 'counter', 'Cobros aprobados por la pasarela', pagos['aprobados']),
+        ('ecom_pagos_rechazados_total', 'counter', 'Cobros rechazados por la pasarela', pagos['rechazados']),
+        ('ecom_pagos_errores_total', 'counter', 'Cobros que fallaron en el worker', pagos['errores']),
+        ('ecom_pagos_en_curso', 'gauge', 'Cobros en el pool de este proceso', pagos['en_curso']),
+        ('ecom_pedidos_abandonados_borrados_total', 'counter', 'Pedidos pendientes de pago borrados por el limpiador', limpieza['pedidos']),
+        ('ecom_pedidos_abandonados_filas_total', 'counter', 'Filas recuperadas por el limpiador (pedidos, líneas e intentos)',
+         limpieza['pedidos'] + limpieza['detalles_pedido'] + limpieza['metodos_pago']),
+        ('ecom_carrito_escrituras_total', 'counter', 'Operaciones que modificaron un carrito',
+         sum(carrito[operacion] for operacion in ('sumar', 'fijar', 'quitar', 'vaciar'))),
+        ('ecom_carrito_lecturas_total', 'counter', 'Carritos valorados (ver carrito y checkout)', carrito['valorar']),
+        ('ecom_carrito_persistidos_total', 'counter', 'Carritos escritos en carrito_items por el almacén diferido', carrito['persistidos']),
+        ('ecom_carrito_entradas', 'gauge', 'Carritos en el almacén diferido', carrito['entradas']),
+        ('ecom_carrito_sucios', 'gauge', 'Carritos con cambios sin persistir', carrito['sucios']),
+        ('ecom_pedidos_archivados_total', 'counter', 'Pedidos movidos al archivo', archivo['pedidos']),
+        ('ecom_pedidos_archivo_filas_total', 'counter', 'Filas movidas al archivo (pedidos, líneas e intentos)',
+         archivo['pedidos'] + archivo['detalles_pedido'] + archivo['metodos_pago']),
+        ('ecom_pedidos_archivo_lecturas_total', 'counter', 'Lecturas que tuvieron que consultar el archivo', archivo['lecturas']),
+        ('ecom_imagenes_procesadas_total', 'counter', 'Imágenes de productos descargadas y convertidas en miniaturas', imagenes['procesadas']),
+        ('ecom_imagenes_errores_total', 'counter', 'Imágenes de productos que no se pudieron procesar', imagenes['errores']),
+        ('ecom_imagenes_variantes_total', 'counter', 'Miniaturas WebP/JPEG generadas', imagenes['variantes']),
+    ]
+    return Response(metricas.prometheus(extras), mimetype='text/plain; version=0.0.4')
+
+
+@tienda.route('/dashboard')
 @login_required
 def dashboard():
     if current_user.rol == 'admin':
-        return redirect(url_for('admin_dashboard'))
-    productos = Producto.query.all()
-    return render_template('user/catalogo.html', productos=productos)
+        return redirect(url_for('tienda.admin_dashboard'))
+    pagina = obtener_pagina_catalogo(
+        despues_de=request.args.get('despues', type=int),
+        antes_de=request.args.get('antes', type=int),
+    )
+    return render_template('user/catalogo.html', productos=pagina.productos, pagina=pagina,
+                           tarjetas=renderizar_tarjetas(pagina.productos))
 
 
 # ---------- ADMIN: NUEVO PRODUCTO ----------
-@app.route('/admin/productos/nuevo', methods=['POST'])
+@tienda.route('/admin/productos/nuevo', methods=['POST'])
 @login_required
 def nuevo_producto():
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     try:
-        nombre = request.form['nombre']
-        descripcion = request.form['descripcion']
-        precio = float(request.form['precio'])
-        stock = int(request.form['stock'])
-        imagen = request.form['imagen']
-        
-        # ✅ VALIDACIÓN: No permitir precios negativos
-        if precio < 0:
-            flash('❌ El precio no puede ser negativo.', 'danger')
-            return redirect(url_for('admin_dashboard'))
-        
-        # ✅ VALIDACIÓN: No permitir stock negativo
-        if stock < 0:
-            flash('❌ El stock no puede ser negativo.', 'danger')
-            return redirect(url_for('admin_dashboard'))
-
-        producto = Producto(
-            nombre=nombre, 
-            descripcion=descripcion, 
-            precio=precio, 
-            stock=stock, 
-            imagen=imagen
-        )
-        db.session.add(producto)
+        valores = validar_producto(request.form)
+    except ValueError as e:
+        flash(f'❌ {e}', 'danger')
+        return redirect(url_for('tienda.admin_dashboard'))
+
+    # Miniaturas antes de abrir la transacción: puede descargar la imagen
+    miniaturas, error_imagen = imagenes_productos.valores_para(valores['imagen'])
+    if error_imagen:
+        flash(f'Imagen sin miniaturas: {error_imagen}', 'warning')
+
+    try:
+        db.session.add(Producto(**valores, **miniaturas))
+        invalidar_catalogo()
         db.session.commit()
         flash('✅ Producto agregado correctamente.', 'success')
-    except ValueError:
-        flash('❌ Error: Precio y stock deben ser números válidos.', 'danger')
     except Exception as e:
         flash(f'❌ Error al agregar producto: {str(e)}', 'danger')
     
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('tienda.admin_dashboard'))
 
 
 # ---------- ADMIN: EDITAR PRODUCTO ----------
-@app.route('/admin/productos/editar/<int:id>', methods=['GET', 'POST'])
+@tienda.route('/admin/productos/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
 def editar_producto(id):
     # Verificar si el usuario tiene el rol de 'admin'
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     # Obtener el producto desde la base de datos
     producto = Producto.query.get_or_404(id)
 
     if request.method == 'POST':
         try:
-            # Obtener los datos del formulario
-            nombre = request.form['nombre']
-            descripcion = request.form['descripcion']
-            precio = float(request.form['precio'])
-            stock = int(request.form['stock'])
-            imagen = request.form['imagen']
-
-            # VALIDACIÓN: No permitir precios negativos
-            if precio < 0:
-                flash('❌ El precio no puede ser negativo.', 'danger')
-                return redirect(url_for('editar_producto', id=id))
-
-            # VALIDACIÓN: No permitir stock negativo
-            if stock < 0:
-                flash('❌ El stock no puede ser negativo.', 'danger')
-                return redirect(url_for('editar_producto', id=id))
-
-            # VALIDACIÓN: Nombre debe tener una longitud mínima (si es necesario)
-            if len(nombre) < 3:
-                flash('❌ El nombre del producto debe tener al menos 3 caracteres.', 'danger')
-                return redirect(url_for('editar_producto', id=id))
-
-            # VALIDACIÓN: Descripción debe tener una longitud mínima (si es necesario)
-            if len(descripcion) < 5:
-                flash('❌ La descripción debe tener al menos 5 caracteres.', 'danger')
-                return redirect(url_for('editar_producto', id=id))
+            # Mismas reglas que nuevo_producto y la importación masiva
+            valores = validar_producto(request.form)
+        except ValueError as e:
+            flash(f'❌ {e}', 'danger')
+            return redirect(url_for('tienda.editar_producto', id=id))
+
+        miniaturas, error_imagen = imagenes_productos.valores_para(valores['imagen'], anterior=producto)
+        if error_imagen:
+            flash(f'Imagen sin miniaturas: {error_imagen}', 'warning')
+        valores.update(miniaturas)
 
+        try:
             # Actualizar el producto con los nuevos datos
-            producto.nombre = nombre
-            producto.descripcion = descripcion
-            producto.precio = precio
-            producto.stock = stock
-            producto.imagen = imagen
+            for campo, valor in valores.items():
+                setattr(producto, campo, valor)
 
             # Guardar los cambios en la base de datos
+            invalidar_catalogo()
             db.session.commit()
             flash('✅ Producto actualizado correctamente.', 'success')
 
             # Redirigir al dashboard de admin
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('tienda.admin_dashboard'))
 
-        except ValueError:
-            flash('❌ Error: Precio y stock deben ser números válidos.', 'danger')
         except Exception as e:
             flash(f'❌ Error al actualizar producto: {str(e)}', 'danger')
 
@@ -354,62 +558,96 @@ def editar_producto(id):
 
 
 # ---------- ADMIN: ELIMINAR PRODUCTO ----------
-@app.route('/admin/productos/eliminar/<int:id>', methods=['POST'])
+@tienda.route('/admin/productos/eliminar/<int:id>', methods=['POST'])
 @login_required
 def eliminar_producto(id):
     if current_user.rol != 'admin':
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     producto = Producto.query.get_or_404(id)
     db.session.delete(producto)
+    invalidar_catalogo()
     db.session.commit()
     flash('Producto eliminado.', 'info')
-    return redirect(url_for('admin_dashboard'))
-
-
-# ---------------------- FUNCIÓN AUXILIAR PARA CALCULAR STOCK DISPONIBLE ----------------------
-def obtener_stock_real(producto_id):
-    """
-    Devuelve el stock REAL del producto (sin reservas).
-    Este es el stock físico que hay en el inventario.
-    """
-    producto = Producto.query.get(producto_id)
-    if not producto:
-        return 0
-    
-    return producto.stock
+    return redirect(url_for('tienda.admin_dashboard'))
+
+
+# ---------- ADMIN: IMPORTAR PRODUCTOS (CSV / JSON-LINES) ----------
+@tienda.route('/admin/productos/importar', methods=['POST'])
+@login_required
+def importar_productos_admin():
+    if current_user.rol != 'admin':
+        flash(ACCESS_DENIED_MSG, 'danger')
+        return redirect(url_for('tienda.home'))
+
+    archivo = request.files.get('archivo')
+    formato = formato_de_archivo(archivo and archivo.filename, request.form.get('formato'))
+    if not archivo or not formato:
+        flash('❌ Sube un archivo .csv o .jsonl.', 'danger')
+        return redirect(url_for('tienda.admin_dashboard'))
+
+    # Con "estricto" un solo error deshace toda la importación
+    estricto = bool(request.form.get('estricto'))
+    flujo = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    try:
+        informe = importar_productos(leer_filas(flujo, formato))
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        flash(f'❌ No se pudo leer el archivo: {e}', 'danger')
+        return redirect(url_for('tienda.admin_dashboard'))
+
+    confirmado = not (estricto and informe.total_errores)
+    if confirmado:
+        db.session.commit()
+    else:
+        db.session.rollback()
+
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({**informe.como_dict(), 'confirmado': confirmado})
+    return render_template('admin/importacion.html', informe=informe, confirmado=confirmado)
+
+
+# ---------- IMÁGENES DE PRODUCTOS (MINIATURAS) ----------
+@tienda.route('/img/<clave>/<int:ancho>.<formato>')
+def imagen_producto(clave, ancho, formato):
+    # La URL lleva el hash del contenido: nunca cambia, se cachea un año
+    ruta = imagenes_productos.variante(clave, ancho, formato)
+    if ruta is None:
+        abort(404)
+    respuesta = send_file(ruta, mimetype=FORMATOS_IMAGEN[formato][1], max_age=imagenes_productos.max_age)
+    respuesta.cache_control.public = True
+    respuesta.cache_control.immutable = True
+    return respuesta
 
 
 # ---------------------- CARRITO DE COMPRAS ----------------------
-@app.route('/carrito')
+# El carrito se lee y escribe a través de almacen_carrito (CARRITO_BACKEND):
+# con 'bd' cada operación es una fila en carrito_items; con 'memoria' o
+# 'sqlite' las escrituras se acumulan y se persisten en segundo plano.
+@tienda.route('/carrito')
 @login_required
 def ver_carrito():
-    items = CarritoItem.query.filter_by(usuario_id=current_user.id).all()
+    valoracion = almacen_carrito.valorar(current_user.id)
     
     # Verificar disponibilidad de cada item
     advertencias = []
-    items_validos = []
     
-    for item in items:
-        stock_real = obtener_stock_real(item.producto_id)
-        
-        if stock_real <= 0:
-            # Producto agotado - eliminar del carrito
-            advertencias.append(
-                f'❌ {item.producto.nombre} está agotado y fue eliminado de tu carrito.'
-            )
-            db.session.delete(item)
-        elif item.cantidad > stock_real:
-            # Ajustar cantidad al stock disponible
-            advertencias.append(
-                f'⚠ {item.producto.nombre}: Solo hay {stock_real} unidades disponibles. '
-                f'Se ajustó la cantidad en tu carrito.'
-            )
-            item.cantidad = stock_real
-            items_validos.append(item)
-        else:
-            items_validos.append(item)
+    for linea in valoracion.agotados:
+        # Producto agotado - eliminar del carrito
+        advertencias.append(
+            f'❌ {linea.producto.nombre} está agotado y fue eliminado de tu carrito.'
+        )
+        almacen_carrito.quitar(current_user.id, linea.item.producto_id)
+    
+    for linea in valoracion.ajustados:
+        # Ajustar cantidad al stock disponible
+        advertencias.append(
+            f'⚠ {linea.producto.nombre}: Solo hay {linea.cantidad_valida} unidades disponibles. '
+            f'Se ajustó la cantidad en tu carrito.'
+        )
+        almacen_carrito.fijar(current_user.id, linea.item.producto_id, linea.cantidad_valida)
+        linea.item.cantidad = linea.cantidad_valida
     
     if advertencias:
         db.session.commit()
@@ -417,15 +655,18 @@ def ver_carrito():
     for advertencia in advertencias:
         flash(advertencia, 'warning')
     
-    total = sum(item.producto.precio * item.cantidad for item in items_validos)
-    return render_template('user/carrito.html', items=items_validos, total=total)
+    items_validos = [linea.item for linea in valoracion.validos]
+    return render_template('user/carrito.html', items=items_validos, total=valoracion.total)
 
 
-@app.route('/carrito/agregar/<int:producto_id>', methods=['POST'])
+@tienda.route('/carrito/agregar/<int:producto_id>', methods=['POST'])
 @login_required
 def agregar_carrito(producto_id):
-    # Obtener el producto
-    producto = Producto.query.get_or_404(producto_id)
+    # Obtener el producto y lo que ya hay de él en el carrito
+    fila = almacen_carrito.producto_y_cantidad(current_user.id, producto_id)
+    if fila is None:
+        abort(404)
+    producto, en_carrito = fila
     
     # Obtener cantidad del formulario (por defecto 1)
     try:
@@ -436,29 +677,22 @@ def agregar_carrito(producto_id):
         cantidad = 1
     
     # ✅ Obtener el stock REAL (físico)
-    stock_real = obtener_stock_real(producto_id)
+    stock_real = producto.stock
     
     if stock_real <= 0:
         flash('❌ Este producto está agotado.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
     
     # Verificar si ya existe en el carrito
-    item = CarritoItem.query.filter_by(
-        usuario_id=current_user.id, 
-        producto_id=producto_id
-    ).first()
-    
-    if item:
+    if en_carrito:
         # Verificar que no exceda el stock real
-        nueva_cantidad = item.cantidad + cantidad
-        if nueva_cantidad > stock_real:
+        if en_carrito + cantidad > stock_real:
             flash(
                 f'⚠ No hay suficiente stock de {producto.nombre}. '
-                f'Stock disponible: {stock_real}. Ya tienes {item.cantidad} en tu carrito.',
+                f'Stock disponible: {stock_real}. Ya tienes {en_carrito} en tu carrito.',
                 'warning'
             )
-            return redirect(url_for('home'))
-        item.cantidad = nueva_cantidad
+            return redirect(url_for('tienda.home'))
     else:
         # Verificar que la cantidad no exceda el stock real
         if cantidad > stock_real:
@@ -467,14 +701,8 @@ def agregar_carrito(producto_id):
                 'warning'
             )
             cantidad = stock_real
-        
-        nuevo = CarritoItem(
-            usuario_id=current_user.id, 
-            producto_id=producto_id, 
-            cantidad=cantidad
-        )
-        db.session.add(nuevo)
     
+    almacen_carrito.sumar(current_user.id, producto_id, cantidad)
     db.session.commit()
     
     if cantidad == 1:
@@ -482,17 +710,16 @@ def agregar_carrito(producto_id):
     else:
         flash(f'✅ {cantidad} unidades de {producto.nombre} agregadas al carrito 🛒', 'success')
     
-    return redirect(url_for('home'))
+    return redirect(url_for('tienda.home'))
 
 
-@app.route('/carrito/actualizar/<int:item_id>', methods=['POST'])
+@tienda.route('/carrito/actualizar/<int:producto_id>', methods=['POST'])
 @login_required
-def actualizar_cantidad_carrito(item_id):
-    item = CarritoItem.query.get_or_404(item_id)
-    
-    if item.usuario_id != current_user.id:
-        flash('Acción no permitida.', 'danger')
-        return redirect(url_for('ver_carrito'))
+def actualizar_cantidad_carrito(producto_id):
+    fila = almacen_carrito.producto_y_cantidad(current_user.id, producto_id)
+    if fila is None or not fila[1]:
+        abort(404)
+    producto = fila[0]
     
     try:
         nueva_cantidad = int(request.form.get('cantidad', 1))
@@ -500,77 +727,68 @@ def actualizar_cantidad_carrito(item_id):
             nueva_cantidad = 1
         
         # ✅ Verificar stock REAL
-        stock_real = obtener_stock_real(item.producto_id)
+        stock_real = producto.stock
         
         if nueva_cantidad > stock_real:
             flash(
-                f'⚠ Solo hay {stock_real} unidades disponibles de {item.producto.nombre}.',
+                f'⚠ Solo hay {stock_real} unidades disponibles de {producto.nombre}.',
                 'warning'
             )
             nueva_cantidad = stock_real if stock_real > 0 else 1
         
-        item.cantidad = nueva_cantidad
+        almacen_carrito.fijar(current_user.id, producto_id, nueva_cantidad)
         db.session.commit()
         flash('✅ Cantidad actualizada.', 'success')
     
     except ValueError:
         flash('❌ Cantidad inválida.', 'danger')
     
-    return redirect(url_for('ver_carrito'))
+    return redirect(url_for('tienda.ver_carrito'))
 
 
-@app.route('/carrito/eliminar/<int:item_id>')
+@tienda.route('/carrito/eliminar/<int:producto_id>')
 @login_required
-def eliminar_item(item_id):
-    item = CarritoItem.query.get_or_404(item_id)
-    if item.usuario_id != current_user.id:
-        flash('Acción no permitida.', 'danger')
-        return redirect(url_for('ver_carrito'))
-    db.session.delete(item)
+def eliminar_item(producto_id):
+    almacen_carrito.quitar(current_user.id, producto_id)
     db.session.commit()
     flash('Producto eliminado del carrito.', 'info')
-    return redirect(url_for('ver_carrito'))
+    return redirect(url_for('tienda.ver_carrito'))
 
 
-@app.route('/carrito/vaciar')
+@tienda.route('/carrito/vaciar')
 @login_required
 def vaciar_carrito():
-    CarritoItem.query.filter_by(usuario_id=current_user.id).delete()
+    almacen_carrito.vaciar(current_user.id)
     db.session.commit()
     flash('Carrito vaciado correctamente.', 'info')
-    return redirect(url_for('ver_carrito'))
+    return redirect(url_for('tienda.ver_carrito'))
 
 
 # ---------- FINALIZAR COMPRA ----------
-@app.route('/finalizar_compra', methods=['POST'])
+@tienda.route('/finalizar_compra', methods=['POST'])
 @login_required
 def finalizar_compra():
     try:
-        carrito = CarritoItem.query.filter_by(usuario_id=current_user.id).all()
-        if not carrito:
+        valoracion = almacen_carrito.valorar(current_user.id)
+        if not valoracion.lineas:
             flash('❌ Tu carrito está vacío.', 'warning')
-            return redirect(url_for('ver_carrito'))
+            return redirect(url_for('tienda.ver_carrito'))
 
         # ✅ VALIDACIÓN CRÍTICA: Verificar stock REAL de cada producto
-        productos_sin_stock = []
-        for item in carrito:
-            stock_real = obtener_stock_real(item.producto_id)
-            
-            if stock_real <= 0:
-                productos_sin_stock.append(item.producto.nombre)
-            elif stock_real < item.cantidad:
-                flash(
-                    f'⚠ No hay suficiente stock de {item.producto.nombre}. '
-                    f'Stock disponible: {stock_real}. Por favor ajusta la cantidad.',
-                    'danger'
-                )
-                return redirect(url_for('ver_carrito'))
+        if valoracion.ajustados:
+            linea = valoracion.ajustados[0]
+            flash(
+                f'⚠ No hay suficiente stock de {linea.producto.nombre}. '
+                f'Stock disponible: {linea.cantidad_valida}. Por favor ajusta la cantidad.',
+                'danger'
+            )
+            return redirect(url_for('tienda.ver_carrito'))
         
         # Si hay productos sin stock, eliminarlos del carrito
+        productos_sin_stock = [linea.producto.nombre for linea in valoracion.agotados]
         if productos_sin_stock:
-            for item in carrito:
-                if item.producto.nombre in productos_sin_stock:
-                    db.session.delete(item)
+            for linea in valoracion.agotados:
+                almacen_carrito.quitar(current_user.id, linea.item.producto_id)
             db.session.commit()
             
             flash(
@@ -578,55 +796,56 @@ def finalizar_compra():
                 f'{", ".join(productos_sin_stock)}. Por favor revisa tu carrito.',
                 'danger'
             )
-            return redirect(url_for('ver_carrito'))
-
-        total = sum(item.producto.precio * item.cantidad for item in carrito)
-
-        # Crear pedido con estado "Pendiente de Pago"
-        pedido = Pedido(usuario_id=current_user.id, total=total, estado='Pendiente de Pago')
-        db.session.add(pedido)
-        db.session.commit()
-
-        # Guardar detalles CON subtotal
-        for item in carrito:
-            subtotal_calculado = item.producto.precio * item.cantidad
-            detalle = DetallePedido(
-                pedido_id=pedido.id,
-                producto_id=item.producto_id,
-                cantidad=item.cantidad,
-                precio=item.producto.precio,
-                subtotal=subtotal_calculado
-            )
-            db.session.add(detalle)
-
+            return redirect(url_for('tienda.ver_carrito'))
+
+        # El carrito que se compra queda también en carrito_items
+        almacen_carrito.persistir([current_user.id])
+
+        # Crear pedido con estado "Pendiente de Pago" y sus detalles en una sola transacción
+        lineas = [
+            {
+                'producto_id': linea.item.producto_id,
+                'cantidad': linea.item.cantidad,
+                'precio': linea.producto.precio,
+                'subtotal': linea.subtotal,
+            }
+            for linea in valoracion.lineas
+        ]
+        # Un clic repetido reutiliza el pedido pendiente del carrito en lugar de crear otro
+        pedido_id = pedido_para_carrito(current_user.id, lineas, valoracion.total).id
         db.session.commit()
 
         # Guardar ID del pedido en sesión y redirigir a selección de pago
-        session['pedido_pendiente'] = pedido.id
-        return redirect(url_for('seleccionar_metodo_pago'))
+        session['pedido_pendiente'] = pedido_id
+        return redirect(url_for('tienda.seleccionar_metodo_pago'))
     
     except Exception as e:
         db.session.rollback()
-        print(f"ERROR en finalizar_compra: {str(e)}")
+        current_app.logger.exception('ERROR en finalizar_compra')
         flash(f'❌ Error al procesar el pedido: {str(e)}', 'danger')
-        return redirect(url_for('ver_carrito'))
+        return redirect(url_for('tienda.ver_carrito'))
 
 
 # ---------- SELECCIONAR MÉTODO DE PAGO ----------
-@app.route('/pago/metodo')
+@tienda.route('/pago/metodo')
 @login_required
 def seleccionar_metodo_pago():
     pedido_id = session.get('pedido_pendiente')
     if not pedido_id:
         flash('No hay ningún pedido pendiente.', 'warning')
-        return redirect(url_for('ver_carrito'))
+        return redirect(url_for('tienda.ver_carrito'))
     
-    pedido = Pedido.query.get_or_404(pedido_id)
+    pedido = db.session.get(Pedido, pedido_id)
+    if pedido is None:
+        # El limpiador borró el pedido abandonado
+        session.pop('pedido_pendiente', None)
+        flash('Tu pedido pendiente expiró. Finaliza la compra de nuevo.', 'warning')
+        return redirect(url_for('tienda.ver_carrito'))
     return render_template('user/seleccionar_pago.html', pedido=pedido)
 
 
 # ---------- PAGO CON TARJETA ----------
-@app.route('/pago/tarjeta/<int:pedido_id>', methods=['GET', 'POST'])
+@tienda.route('/pago/tarjeta/<int:pedido_id>', methods=['GET', 'POST'])
 @login_required
 def pago_tarjeta(pedido_id):
     pedido = Pedido.query.get_or_404(pedido_id)
@@ -634,7 +853,7 @@ def pago_tarjeta(pedido_id):
     # Verificar que el usuario sea el propietario del pedido
     if not verificar_propietario_pedido(pedido):
         flash('❌ No tienes acceso a este pedido.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     if request.method == 'POST':
         # Obtener los datos del formulario
@@ -645,37 +864,35 @@ def pago_tarjeta(pedido_id):
         # Validación de tarjeta y CVV
         if len(numero_tarjeta) != 16 or len(cvv) != 3:
             flash('❌ Datos de tarjeta inválidos. Asegúrate de que la tarjeta tenga 16 dígitos y el CVV 3 dígitos.', 'danger')
-            return redirect(url_for('pago_tarjeta', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_tarjeta', pedido_id=pedido.id))
 
         # Validación usando el algoritmo Luhn para verificar el número de tarjeta
         if not verificar_tarjeta_luhn(numero_tarjeta):
             flash('❌ Número de tarjeta inválido. Por favor revisa el número de tu tarjeta.', 'danger')
-            return redirect(url_for('pago_tarjeta', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_tarjeta', pedido_id=pedido.id))
 
+        # El intento queda en cola y se cobra en segundo plano (cola_pagos);
+        # la clave del formulario evita un segundo cobro si se reenvía
         try:
-            # Verificar si el stock está disponible antes de procesar el pago
-            if not verificar_y_actualizar_stock(pedido):
-                flash('❌ No hay suficiente stock para completar tu pedido.', 'danger')
-                return redirect(url_for('ver_carrito'))
-
-            # Procesar el pago
-            registrar_pago_tarjeta(pedido, numero_tarjeta, nombre_titular)
-            flash('¡Pago con tarjeta procesado exitosamente! 🎉', 'success')
-
-            # Redirigir a la página de confirmación del pago
-            return redirect(url_for('confirmacion_pago', pedido_id=pedido.id))
-
+            cola_pagos.encolar(
+                pedido, 'tarjeta', request.form.get('clave_idempotencia') or nueva_clave(),
+                datos_publicos_tarjeta(numero_tarjeta, nombre_titular),
+                {'numero_tarjeta': numero_tarjeta, 'nombre_titular': nombre_titular, 'cvv': cvv},
+            )
         except Exception as e:
             db.session.rollback()
             flash(f'❌ Error al procesar el pago: {str(e)}', 'danger')
-            return redirect(url_for('pago_tarjeta', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_tarjeta', pedido_id=pedido.id))
+
+        # La confirmación muestra "procesando" y consulta el estado hasta que termine
+        return redirect(url_for('tienda.confirmacion_pago', pedido_id=pedido.id))
 
     # Si es GET, mostrar el formulario de pago
-    return render_template('user/pago_tarjeta.html', pedido=pedido)
+    return render_template('user/pago_tarjeta.html', pedido=pedido, clave=nueva_clave())
 
 
 # ---------- PAGO CON PSE ----------
-@app.route('/pago/pse/<int:pedido_id>', methods=['GET', 'POST'])
+@tienda.route('/pago/pse/<int:pedido_id>', methods=['GET', 'POST'])
 @login_required
 def pago_pse(pedido_id):
     # Obtener el pedido desde la base de datos
@@ -684,7 +901,7 @@ def pago_pse(pedido_id):
     # Verificar que el usuario sea el propietario del pedido
     if not verificar_propietario_pedido(pedido):
         flash('❌ No tienes acceso a este pedido.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
 
     # Lista de bancos disponibles para el pago
     bancos = [
@@ -703,71 +920,249 @@ def pago_pse(pedido_id):
         # Validación de campos requeridos
         if not all([banco, tipo_persona, tipo_documento, numero_documento]):
             flash('❌ Por favor completa todos los campos.', 'danger')
-            return redirect(url_for('pago_pse', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_pse', pedido_id=pedido.id))
 
         # Validación: Verificar si el banco seleccionado es válido
         if banco not in bancos:
             flash('❌ El banco seleccionado no es válido.', 'danger')
-            return redirect(url_for('pago_pse', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_pse', pedido_id=pedido.id))
 
         # Validación del número de documento (puedes personalizar según el tipo de documento)
         if not numero_documento.isdigit():
             flash('❌ El número de documento debe ser un valor numérico.', 'danger')
-            return redirect(url_for('pago_pse', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_pse', pedido_id=pedido.id))
 
         try:
-            # Verificar si el stock está disponible antes de procesar el pago
-            if not verificar_y_actualizar_stock(pedido):
-                flash('❌ No hay suficiente stock para completar tu pedido.', 'danger')
-                return redirect(url_for('ver_carrito'))
-
-            # Procesar el pago PSE
-            registrar_pago_pse(pedido, banco, tipo_persona, tipo_documento, numero_documento)
-            flash('¡Pago PSE procesado exitosamente! 🎉', 'success')
-
-            # Redirigir a la página de confirmación del pago
-            return redirect(url_for('confirmacion_pago', pedido_id=pedido.id))
-
+            cola_pagos.encolar(
+                pedido, 'pse', request.form.get('clave_idempotencia') or nueva_clave(),
+                datos_publicos_pse(banco, tipo_persona, tipo_documento, numero_documento),
+                {'banco': banco, 'tipo_persona': tipo_persona,
+                 'tipo_documento': tipo_documento, 'numero_documento': numero_documento},
+            )
         except Exception as e:
             db.session.rollback()  # Rollback de cualquier cambio en caso de error
             flash(f'❌ Error al procesar el pago: {str(e)}', 'danger')
-            return redirect(url_for('pago_pse', pedido_id=pedido.id))
+            return redirect(url_for('tienda.pago_pse', pedido_id=pedido.id))
+
+        return redirect(url_for('tienda.confirmacion_pago', pedido_id=pedido.id))
 
     # Si es GET, mostrar el formulario de pago
-    return render_template('user/pago_pse.html', pedido=pedido, bancos=bancos)
+    return render_template('user/pago_pse.html', pedido=pedido, bancos=bancos, clave=nueva_clave())
 
 
 # ---------- CONFIRMACIÓN DE PAGO ----------
-@app.route('/pago/confirmacion/<int:pedido_id>')
+@tienda.route('/pago/confirmacion/<int:pedido_id>')
 @login_required
 def confirmacion_pago(pedido_id):
-    pedido = Pedido.query.get_or_404(pedido_id)
+    pedido = (
+        Pedido.query.options(*carga_detalle_pedido(con_pago=True))
+        .filter_by(id=pedido_id)
+        .first_or_404()
+    )
     
     if pedido.usuario_id != current_user.id:
         flash(ACCESS_DENIED_MSG, 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('tienda.home'))
     
-    metodo = MetodoPago.query.filter_by(pedido_id=pedido.id).first()
-    return render_template('user/confirmacion_pago.html', pedido=pedido, metodo=metodo)
+    metodo = max(pedido.metodo_pago, key=lambda intento: intento.id, default=None)
+    if metodo and metodo.estado_pago == 'Aprobado':
+        session.pop('pedido_pendiente', None)
+    return render_template('user/confirmacion_pago.html', pedido=pedido, metodo=metodo,
+                           terminado=metodo is None or metodo.estado_pago in ESTADOS_FINALES)
+
+
+# ---------- ESTADO DEL PAGO (LO CONSULTA LA CONFIRMACIÓN) ----------
+@tienda.route('/pago/estado/<int:pedido_id>')
+@login_required
+def estado_pago(pedido_id):
+    pedido = Pedido.query.filter_by(id=pedido_id, usuario_id=current_user.id).first_or_404()
+    metodo = ultimo_intento(pedido.id)
+    if metodo and metodo.estado_pago not in ESTADOS_FINALES and cola_pagos.recuperar(pedido.id):
+        # El intento llevaba más de PAGOS_TIMEOUT sin terminar
+        metodo = ultimo_intento(pedido.id)
+    return jsonify({
+        'estado_pago': metodo and metodo.estado_pago,
+        'estado_pedido': pedido.estado,
+        'mensaje': metodo and metodo.mensaje,
+        'terminado': metodo is None or metodo.estado_pago in ESTADOS_FINALES,
+    })
 
 
 # ---------- MIS PEDIDOS ----------
-@app.route('/mis_pedidos')
+@tienda.route('/mis_pedidos')
 @login_required
 def mis_pedidos():
-    pedidos = Pedido.query.filter_by(usuario_id=current_user.id).all()
-    return render_template('user/mis_pedidos.html', pedidos=pedidos)
+    no_modificado = get_condicional.no_modificado(version_mis_pedidos(current_user.id))
+    if no_modificado:
+        return no_modificado
+    # Por páginas; las últimas siguen con los pedidos archivados
+    pedidos, siguiente = pagina_mis_pedidos(
+        current_user.id,
+        despues=request.args.get('despues'),
+        en_archivo=request.args.get('archivo') == '1',
+    )
+    return render_template('user/mis_pedidos.html', pedidos=pedidos, siguiente=siguiente)
 
 
 # ---------- DETALLE DE PEDIDO ----------
-@app.route('/pedido/<int:pedido_id>')
+@tienda.route('/pedido/<int:pedido_id>')
 @login_required
 def detalle_pedido(pedido_id):
-    pedido = Pedido.query.filter_by(id=pedido_id, usuario_id=current_user.id).first_or_404()
-    detalles = DetallePedido.query.filter_by(pedido_id=pedido.id).all()
-    return render_template('user/detalle_pedido.html', pedido=pedido, detalles=detalles)
+    version = version_pedido(pedido_id, current_user.id)
+    if version is not None:
+        no_modificado = get_condicional.no_modificado(version, modificado=version)
+        if no_modificado:
+            return no_modificado
+    pedido = buscar_pedido(pedido_id, usuario_id=current_user.id)
+    if pedido is None:
+        abort(404)
+    return render_template('user/detalle_pedido.html', pedido=pedido, detalles=pedido.detalles)
+
+
+# ---------------------- COMANDOS CLI ----------------------
+@click.command('crear-tablas')
+@with_appcontext
+def crear_tablas_cmd():
+    """Crea las tablas que falten (para entornos sin migraciones)."""
+    db.create_all()
+    # Si productos ya existía, create_all no crea el índice de búsqueda
+    with db.engine.begin() as conexion:
+        crear_indice_busqueda(conexion)
+    click.echo('Tablas creadas.')
+
+
+@click.command('warmup')
+@with_appcontext
+def warmup_cmd():
+    """Precompila plantillas y llena las cachés antes de servir tráfico."""
+    inicio = time.perf_counter()
+    resumen = precalentar(current_app._get_current_object())
+    click.echo(
+        f"{resumen['plantillas']} plantillas compiladas, "
+        f"{resumen['productos']} productos en caché, "
+        f"{(time.perf_counter() - inicio) * 1000:.1f} ms"
+    )
+
+
+@click.command('verificar-indices')
+@with_appcontext
+def verificar_indices_cmd():
+    """Comprueba con EXPLAIN que cada consulta caliente use su índice."""
+    fallos = 0
+    for ruta, indice, usa_indice, plan in verificar_indices():
+        estado = 'OK   ' if usa_indice else 'FALTA'
+        click.echo(f'{estado} {ruta:<26} {indice}')
+        if not usa_indice:
+            fallos += 1
+            click.echo('      ' + plan.replace('\n', '\n      '))
+    if fallos:
+        raise SystemExit(1)
+
+
+@click.command('reconstruir-ventas')
+@with_appcontext
+def reconstruir_ventas_cmd():
+    """Recalcula los resúmenes de ventas desde pedidos y detalles_pedido."""
+    inicio = time.perf_counter()
+    resumen_ventas.reconstruir()
+    db.session.commit()
+    click.echo(f'Resúmenes de ventas reconstruidos en {time.perf_counter() - inicio:.2f} s.')
+
+
+@click.command('importar-productos')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Por defecto, según la extensión.')
+@click.option('--estricto', is_flag=True, help='No importar nada si alguna fila tiene errores.')
+@with_appcontext
+def importar_productos_cmd(archivo, formato, estricto):
+    """Crea o actualiza productos desde un CSV o JSON-lines (filas con id se actualizan)."""
+    formato = formato_de_archivo(archivo, formato)
+    if not formato:
+        raise click.UsageError('Formato no reconocido: usa --formato csv|jsonl.')
+
+    inicio = time.perf_counter()
+    with open(archivo, encoding='utf-8-sig', newline='') as flujo:
+        informe = importar_productos(leer_filas(flujo, formato))
+    for linea, mensaje in informe.errores:
+        click.echo(f'línea {linea}: {mensaje}', err=True)
+    if informe.errores_omitidos:
+        click.echo(f'... y {informe.errores_omitidos} errores más.', err=True)
+
+    if estricto and informe.total_errores:
+        db.session.rollback()
+        click.echo(f'{informe.total_errores} filas con errores; no se importó nada.')
+        raise SystemExit(1)
+    db.session.commit()
+    click.echo(
+        f'{informe.creados} creados, {informe.actualizados} actualizados, '
+        f'{informe.total_errores} con errores en {time.perf_counter() - inicio:.2f} s.'
+    )
+
+
+@click.command('recuperar-pagos')
+@with_appcontext
+def recuperar_pagos_cmd():
+    """Resuelve los pagos que llevan más de PAGOS_TIMEOUT segundos sin terminar."""
+    resueltos = cola_pagos.recuperar()
+    click.echo(f'{resueltos} pagos interrumpidos resueltos.')
+
+
+@click.command('limpiar-pedidos')
+@click.option('--max-lotes', type=int, default=None, help='Detenerse tras N lotes (por defecto, hasta terminar).')
+@with_appcontext
+def limpiar_pedidos_cmd(max_lotes):
+    """Borra los pedidos 'Pendiente de Pago' abandonados (PEDIDOS_PENDIENTES_TTL_HORAS)."""
+    inicio = time.perf_counter()
+    recuperados = cola_pagos.recuperar()
+    total = limpiador_pedidos.limpiar(max_lotes)
+    click.echo(
+        f"{total['pedidos']} pedidos, {total['detalles_pedido']} líneas y {total['metodos_pago']} "
+        f"intentos de pago borrados en {total['lotes']} lotes ({recuperados} pagos interrumpidos "
+        f"resueltos) en {time.perf_counter() - inicio:.2f} s."
+    )
+
+
+@click.command('archivar-pedidos')
+@click.option('--max-lotes', type=int, default=None, help='Detenerse tras N lotes (por defecto, hasta terminar).')
+@with_appcontext
+def archivar_pedidos_cmd(max_lotes):
+    """Mueve al archivo los pedidos entregados o cancelados (PEDIDOS_ARCHIVO_DIAS)."""
+    inicio = time.perf_counter()
+    total = archivo_pedidos.archivar(max_lotes)
+    click.echo(
+        f"{total['pedidos']} pedidos, {total['detalles_pedido']} líneas y {total['metodos_pago']} "
+        f"intentos de pago archivados en {total['lotes']} lotes en {time.perf_counter() - inicio:.2f} s."
+    )
+
+
+@click.command('compilar-estaticos')
+@with_appcontext
+def compilar_estaticos_cmd():
+    """Versiona los estáticos por contenido y genera sus variantes gzip/brotli."""
+    inicio = time.perf_counter()
+    manifiesto = compilar_estaticos(current_app.static_folder)
+    estaticos.cargar(current_app)
+    for ruta, entrada in sorted(manifiesto.items()):
+        variantes = ', '.join(f'{extension} {tamano} B' for extension, tamano in sorted(entrada['variantes'].items()))
+        click.echo(f"{ruta} -> {entrada['ruta']} ({entrada['bytes']} B{'; ' + variantes if variantes else ''})")
+    click.echo(f'{len(manifiesto)} archivos compilados en {time.perf_counter() - inicio:.2f} s.')
+
+
+@click.command('procesar-imagenes')
+@click.option('--max-lotes', type=int, default=None, help='Detenerse tras N lotes (por defecto, hasta terminar).')
+@with_appcontext
+def procesar_imagenes_cmd(max_lotes):
+    """Genera las miniaturas de los productos con imagen sin procesar (p. ej. importados)."""
+    if not imagenes_productos.disponible:
+        raise click.ClickException('Falta Pillow: pip install Pillow')
+    inicio = time.perf_counter()
+    total = imagenes_productos.procesar_pendientes(max_lotes)
+    click.echo(
+        f"{total['procesadas']} imágenes procesadas y {total['errores']} con errores "
+        f"en {total['lotes']} lotes en {time.perf_counter() - inicio:.2f} s."
+    )
 
 
 # ---------------------- EJECUCIÓN ----------------------
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
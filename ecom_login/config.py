@@ -1,8 +1,144 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
+
+
+def _env_bool(nombre, defecto=False):
+    valor = os.environ.get(nombre)
+    if not valor:
+        return defecto
+    return valor.lower() in ('1', 'true', 'si')
+
+
+def opciones_motor(uri):
+    """
+    Opciones del pool de conexiones según variables de entorno. SQLite usa
+    los valores por defecto de Flask-SQLAlchemy.
+    """
+    if not uri or uri.startswith('sqlite'):
+        return {}
+
+    opciones = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 5),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 10),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT') or 30),
+        # Reciclar antes de que Postgres/PgBouncer/un balanceador corten la conexión
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+        # Detecta conexiones muertas tras un reinicio de Postgres
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+    # PgBouncer en modo transacción: nada de prepared statements del lado del
+    # servidor (psycopg2 nunca los usa; psycopg 3 los activa tras N ejecuciones)
+    if _env_bool('DB_PGBOUNCER') and uri.startswith('postgresql+psycopg:'):
+        opciones['connect_args'] = {'prepare_threshold': None}
+    return opciones
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'clave-secreta-123'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_motor(SQLALCHEMY_DATABASE_URI)
+
+    # Catálogo: tamaño de página para la paginación por cursor
+    PRODUCTOS_POR_PAGINA = int(os.environ.get('PRODUCTOS_POR_PAGINA') or 12)
+
+    # Panel de pedidos: filas por página (paginación por cursor)
+    PEDIDOS_POR_PAGINA = int(os.environ.get('PEDIDOS_POR_PAGINA') or 50)
+    # Exportación CSV/JSON-lines: filas por lote del cursor del servidor
+    EXPORTAR_LOTE = int(os.environ.get('EXPORTAR_LOTE') or 1000)
+    # Importación masiva de productos: filas por INSERT/UPDATE agrupado
+    IMPORTAR_LOTE = int(os.environ.get('IMPORTAR_LOTE') or 1000)
+
+    # Búsqueda: páginas de resultados por relevancia que se pueden recorrer (usa OFFSET)
+    # y cuántas coincidencias (las más recientes) se ordenan por relevancia. El tope
+    # mantiene el p95 bajo 10 ms con 100k productos (benchmarks/busqueda.py); la página
+    # de búsqueda lo avisa. 0 = ordenar todas (20-40 ms en consultas amplias).
+    BUSQUEDA_MAX_PAGINAS = int(os.environ.get('BUSQUEDA_MAX_PAGINAS') or 50)
+    BUSQUEDA_MAX_CANDIDATOS = int(os.environ.get('BUSQUEDA_MAX_CANDIDATOS') or 1000)
+
+    # Caché del catálogo: 'memoria' (por proceso) o 'sqlite' (compartida entre workers)
+    CATALOGO_CACHE_BACKEND = os.environ.get('CATALOGO_CACHE_BACKEND') or 'memoria'
+    CATALOGO_CACHE_TTL = int(os.environ.get('CATALOGO_CACHE_TTL') or 300)
+    CATALOGO_CACHE_MAX_ENTRADAS = int(os.environ.get('CATALOGO_CACHE_MAX_ENTRADAS') or 1000)
+    CATALOGO_CACHE_RUTA = os.environ.get('CATALOGO_CACHE_RUTA') or os.path.join(
+        tempfile.gettempdir(), 'ecom_catalogo_cache.sqlite3'
+    )
+
+    # Caché de principales para load_user (por proceso): segundos de vida y tamaño máximo
+    USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL') or 60)
+    USUARIOS_CACHE_MAX_ENTRADAS = int(os.environ.get('USUARIOS_CACHE_MAX_ENTRADAS') or 10000)
+
+    # Modo de depuración: cualquier lazy load no planificado en las rutas de pedidos lanza error
+    CARGA_ESTRICTA = _env_bool('CARGA_ESTRICTA')
+
+    # Instrumentación: peticiones más lentas que esto se registran con su SQL
+    UMBRAL_PETICION_LENTA_MS = int(os.environ.get('UMBRAL_PETICION_LENTA_MS') or 500)
+
+    # Contraseñas: método de werkzeug con su costo (p. ej. 'scrypt:32768:8:1' o
+    # 'pbkdf2:sha256:1000000'). Los hashes con otros parámetros se rehacen al iniciar sesión.
+    HASH_METODO = os.environ.get('HASH_METODO') or 'scrypt:32768:8:1'
+    # HASH_COLA_MAX limita los hashes en curso por worker (en total workers ×
+    # HASH_COLA_MAX); con los hilos de gunicorn.conf.py (GUNICORN_HILOS) debe ser
+    # menor que los hilos, así el resto de rutas siempre tiene hilos libres.
+    HASH_PROCESOS = int(os.environ.get('HASH_PROCESOS') or 2)
+    HASH_COLA_MAX = int(os.environ.get('HASH_COLA_MAX') or 4)
+
+    # Pagos: pasarela ('simulada' o 'paquete.modulo:Clase'), hilos que cobran en
+    # segundo plano (0 = dentro de la petición) y segundos tras los que un
+    # intento sin terminar se da por interrumpido (flask recuperar-pagos)
+    PAGOS_PASARELA = os.environ.get('PAGOS_PASARELA') or 'simulada'
+    PAGOS_HILOS = int(os.environ.get('PAGOS_HILOS') or 4)
+    PAGOS_TIMEOUT = int(os.environ.get('PAGOS_TIMEOUT') or 120)
+    PAGOS_LATENCIA_SIMULADA = float(os.environ.get('PAGOS_LATENCIA_SIMULADA') or 0)
+
+    # Pedidos 'Pendiente de Pago' abandonados: horas sin actividad antes de
+    # borrarlos, pedidos por transacción y cada cuántos segundos corre el
+    # limpiador en cada worker. Por defecto 0 = solo con `flask limpiar-pedidos`
+    # desde una única tarea programada (cron, scheduler de la plataforma): con
+    # un intervalo cada worker de gunicorn borraría por su cuenta.
+    PEDIDOS_PENDIENTES_TTL_HORAS = float(os.environ.get('PEDIDOS_PENDIENTES_TTL_HORAS') or 24)
+    PEDIDOS_LIMPIEZA_LOTE = int(os.environ.get('PEDIDOS_LIMPIEZA_LOTE') or 500)
+    PEDIDOS_LIMPIEZA_INTERVALO = int(os.environ.get('PEDIDOS_LIMPIEZA_INTERVALO') or 0)
+
+    # Archivo de pedidos: los entregados o cancelados hace más de estos días
+    # pasan a las tablas *_archivados, de a PEDIDOS_ARCHIVO_LOTE por
+    # transacción, cada PEDIDOS_ARCHIVO_INTERVALO segundos (0 = solo con
+    # `flask archivar-pedidos`)
+    PEDIDOS_ARCHIVO_DIAS = int(os.environ.get('PEDIDOS_ARCHIVO_DIAS') or 180)
+    PEDIDOS_ARCHIVO_LOTE = int(os.environ.get('PEDIDOS_ARCHIVO_LOTE') or 500)
+    PEDIDOS_ARCHIVO_INTERVALO = int(os.environ.get('PEDIDOS_ARCHIVO_INTERVALO') or 3600)
+
+    # Carrito: 'bd' (cada operación escribe en carrito_items), 'memoria' (un
+    # solo proceso) o 'sqlite' (compartido entre los workers de una máquina).
+    # Los dos últimos escriben carrito_items cada CARRITO_PERSISTIR_INTERVALO
+    # segundos, de a CARRITO_PERSISTIR_LOTE usuarios, y antes del checkout.
+    CARRITO_BACKEND = os.environ.get('CARRITO_BACKEND') or 'bd'
+    CARRITO_MAX_ENTRADAS = int(os.environ.get('CARRITO_MAX_ENTRADAS') or 10000)
+    CARRITO_PERSISTIR_INTERVALO = int(os.environ.get('CARRITO_PERSISTIR_INTERVALO') or 30)
+    CARRITO_PERSISTIR_LOTE = int(os.environ.get('CARRITO_PERSISTIR_LOTE') or 200)
+    CARRITO_RUTA = os.environ.get('CARRITO_RUTA') or os.path.join(
+        tempfile.gettempdir(), 'ecom_carritos.sqlite3'
+    )
+
+    # Estáticos compilados con `flask compilar-estaticos` (nombre con hash,
+    # variantes gzip/brotli): se sirven con caché de ESTATICOS_MAX_AGE segundos
+    ESTATICOS_VERSIONADOS = _env_bool('ESTATICOS_VERSIONADOS', True)
+    ESTATICOS_MAX_AGE = int(os.environ.get('ESTATICOS_MAX_AGE') or 365 * 24 * 3600)
+
+    # Miniaturas de productos: variantes WebP/JPEG de estos anchos guardadas en
+    # IMAGENES_DIR bajo el hash del contenido. Las imágenes importadas se
+    # procesan cada IMAGENES_INTERVALO segundos (0 = solo con `flask procesar-imagenes`)
+    IMAGENES_DIR = os.environ.get('IMAGENES_DIR') or os.path.join(
+        tempfile.gettempdir(), 'ecom_imagenes'
+    )
+    IMAGENES_ANCHOS = [int(ancho) for ancho in (os.environ.get('IMAGENES_ANCHOS') or '320,480,640,960').split(',')]
+    IMAGENES_CALIDAD = int(os.environ.get('IMAGENES_CALIDAD') or 80)
+    IMAGENES_MAX_BYTES = int(os.environ.get('IMAGENES_MAX_BYTES') or 10 * 1024 * 1024)
+    IMAGENES_TIMEOUT = float(os.environ.get('IMAGENES_TIMEOUT') or 10)
+    IMAGENES_MAX_AGE = int(os.environ.get('IMAGENES_MAX_AGE') or 365 * 24 * 3600)
+    IMAGENES_LOTE = int(os.environ.get('IMAGENES_LOTE') or 50)
+    IMAGENES_INTERVALO = int(os.environ.get('IMAGENES_INTERVALO') or 0)
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from .modules.utils.hash_utils import servicio_hash
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -15,10 +15,11 @@ class Usuario(db.Model, UserMixin):
 
     # Contraseñas seguras
     def set_password(self, password):
-        self.contrasena = generate_password_hash(password)
+        self.contrasena = servicio_hash.hashear(password)
 
     def check_password(self, password):
-        return check_password_hash(self.contrasena, password)
+        valida, _ = servicio_hash.verificar(self.contrasena, password)
+        return valida
 
 class Producto(db.Model):
     __tablename__ = 'productos'
@@ -28,6 +29,16 @@ class Producto(db.Model):
     precio = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, nullable=False)
     imagen = db.Column(db.String(255), nullable=True)
+    # Miniaturas: hash del contenido de `imagen` y su ancho original. NULL =
+    # sin procesar (p. ej. importada), '' = no se pudo procesar.
+    imagen_clave = db.Column(db.String(32), nullable=True)
+    imagen_ancho = db.Column(db.Integer, nullable=True)
+    # GET condicional: cualquier UPDATE (CRUD, stock, importación) la renueva
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_productos_actualizado_en', 'actualizado_en'),
+    )
 
 class Pedido(db.Model):
     __tablename__ = 'pedidos'
@@ -35,13 +46,28 @@ class Pedido(db.Model):
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     total = db.Column(db.Float, nullable=False, default=0.0)
-    estado = db.Column(db.String(20), default='Pendiente')
+    # active_history: el valor anterior se carga siempre al cambiarlo (resumen de ventas)
+    estado = db.column_property(db.Column(db.String(20), default='Pendiente'), active_history=True)
+    # GET condicional de mis_pedidos y detalle_pedido
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_pedidos_usuario_fecha', 'usuario_id', 'fecha'),  # mis_pedidos
+        # admin_pedidos: un índice por orden (fecha/total) y por filtro de estado;
+        # el id al final sirve de desempate para la paginación por cursor
+        db.Index('ix_pedidos_fecha_id', 'fecha', 'id'),
+        db.Index('ix_pedidos_estado_fecha_id', 'estado', 'fecha', 'id'),
+        db.Index('ix_pedidos_total_id', 'total', 'id'),
+        db.Index('ix_pedidos_estado_total_id', 'estado', 'total', 'id'),
+    )
 
     usuario = db.relationship('Usuario', backref='pedidos', lazy=True)
 
     # relación hacia los detalles del pedido
     detalles = db.relationship('DetallePedido', backref='pedido_padre', lazy=True)
 
+    archivado = False
+
 
 class DetallePedido(db.Model):
     __tablename__ = 'detalles_pedido'
@@ -51,6 +77,10 @@ class DetallePedido(db.Model):
     cantidad = db.Column(db.Integer, nullable=False)
     precio = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)  
+
+    __table_args__ = (
+        db.Index('ix_detalles_pedido_pedido_id', 'pedido_id'),
+    )
     
     producto = db.relationship('Producto', backref='detalles_pedido', lazy=True)
 
@@ -59,7 +89,7 @@ class MetodoPago(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos.id'), nullable=False)
     tipo_pago = db.Column(db.String(50), nullable=False)  # 'tarjeta' o 'pse'
-    estado_pago = db.Column(db.String(20), default='Pendiente')  # Pendiente, Aprobado, Rechazado
+    estado_pago = db.Column(db.String(20), default='Pendiente')  # Pendiente, Procesando, Verificando, Aprobado, Rechazado, Reembolsar o Cancelado
     
     # Campos para tarjeta
     numero_tarjeta = db.Column(db.String(4), nullable=True) 
@@ -72,6 +102,18 @@ class MetodoPago(db.Model):
     numero_documento = db.Column(db.String(50), nullable=True)
     
     fecha_pago = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Cola de pagos: la clave evita cobrar dos veces el mismo envío del formulario
+    clave_idempotencia = db.Column(db.String(64), nullable=True)
+    referencia = db.Column(db.String(100), nullable=True)  # id de la transacción en la pasarela
+    mensaje = db.Column(db.String(200), nullable=True)  # motivo del rechazo
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_metodos_pago_pedido_id', 'pedido_id'),
+        db.Index('ux_metodos_pago_clave', 'clave_idempotencia', unique=True),
+        db.Index('ix_metodos_pago_estado_actualizado', 'estado_pago', 'actualizado_en'),
+    )
     
     pedido = db.relationship('Pedido', backref='metodo_pago', lazy=True)
 class CarritoItem(db.Model):
@@ -81,5 +123,100 @@ class CarritoItem(db.Model):
     producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'))
     cantidad = db.Column(db.Integer, default=1)
 
+    # Un producto aparece una sola vez en el carrito de cada usuario (permite upsert)
+    __table_args__ = (
+        db.Index('uq_carrito_items_usuario_producto', 'usuario_id', 'producto_id', unique=True),
+    )
+
     usuario = db.relationship('Usuario', backref='carrito', lazy=True)
     producto = db.relationship('Producto', backref='carrito_items', lazy=True)
+
+
+# ---------- ARCHIVO DE PEDIDOS ----------
+# Pedidos entregados o cancelados hace más de PEDIDOS_ARCHIVO_DIAS, movidos
+# por archivo_utils con el mismo id. Solo llevan los índices que usan
+# mis_pedidos y el detalle del pedido.
+
+class PedidoArchivado(db.Model):
+    __tablename__ = 'pedidos_archivados'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    archivado_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_pedidos_archivados_usuario_fecha', 'usuario_id', 'fecha'),
+    )
+
+    usuario = db.relationship('Usuario', lazy=True)
+    detalles = db.relationship('DetallePedidoArchivado', lazy=True)
+    metodo_pago = db.relationship('MetodoPagoArchivado', lazy=True)
+
+    archivado = True
+
+class DetallePedidoArchivado(db.Model):
+    __tablename__ = 'detalles_pedido_archivados'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos_archivados.id'), nullable=False)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False)
+    precio = db.Column(db.Float, nullable=False)
+    subtotal = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_detalles_pedido_archivados_pedido_id', 'pedido_id'),
+    )
+
+    producto = db.relationship('Producto', lazy=True)
+
+class MetodoPagoArchivado(db.Model):
+    __tablename__ = 'metodos_pago_archivados'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos_archivados.id'), nullable=False)
+    tipo_pago = db.Column(db.String(50), nullable=False)
+    estado_pago = db.Column(db.String(20))
+    numero_tarjeta = db.Column(db.String(4), nullable=True)
+    nombre_titular = db.Column(db.String(100), nullable=True)
+    banco = db.Column(db.String(100), nullable=True)
+    tipo_persona = db.Column(db.String(20), nullable=True)
+    tipo_documento = db.Column(db.String(20), nullable=True)
+    numero_documento = db.Column(db.String(50), nullable=True)
+    fecha_pago = db.Column(db.DateTime)
+    referencia = db.Column(db.String(100), nullable=True)
+    mensaje = db.Column(db.String(200), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_metodos_pago_archivados_pedido_id', 'pedido_id'),
+    )
+
+
+# ---------- RESÚMENES DE VENTAS ----------
+# Se mantienen en la misma transacción que cambia el pedido (ventas_utils);
+# `flask reconstruir-ventas` los recalcula desde pedidos y detalles_pedido.
+
+class VentaDiaria(db.Model):
+    __tablename__ = 'ventas_diarias'
+    dia = db.Column(db.Date, primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0.0)
+
+class VentaProducto(db.Model):
+    __tablename__ = 'ventas_productos'
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), primary_key=True)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_ventas_productos_unidades', 'unidades'),  # más vendidos
+    )
+
+    producto = db.relationship('Producto', lazy=True)
+
+class PedidosPorEstado(db.Model):
+    __tablename__ = 'pedidos_por_estado'
+    estado = db.Column(db.String(20), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)  # histórico, incluye el archivo
+    archivados = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # vivos = cantidad - archivados
@@ -0,0 +1,481 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import delete, event, select, tuple_, update
+from ...models import db, Producto, CarritoItem
+from .carrito_utils import valorar_carrito, valorar_cantidades, linea_para_agregar, sumar_al_carrito, fijar_lineas_carrito
+from .tareas_utils import TareaPeriodica
+
+
+# ---------- BACKEND EN LA BASE DE DATOS ----------
+
+class CarritoBD:
+    """
+    El carrito vive en carrito_items: cada operación es una escritura en la
+    base de datos principal dentro de la transacción de la petición (la ruta
+    hace el commit). Sirve con cualquier número de workers y máquinas.
+    """
+
+    diferido = False
+
+    def valorar(self, usuario_id):
+        return valorar_carrito(usuario_id)
+
+    def producto_y_cantidad(self, usuario_id, producto_id):
+        fila = linea_para_agregar(usuario_id, producto_id)
+        if fila is None:
+            return None
+        producto, item = fila
+        return producto, item.cantidad if item else 0
+
+    def cantidad(self, usuario_id, producto_id):
+        return db.session.scalar(
+            select(CarritoItem.cantidad)
+            .where(CarritoItem.usuario_id == usuario_id, CarritoItem.producto_id == producto_id)
+        ) or 0
+
+    def sumar(self, usuario_id, producto_id, cantidad):
+        sumar_al_carrito(usuario_id, producto_id, cantidad)
+
+    def fijar(self, usuario_id, producto_id, cantidad):
+        db.session.execute(
+            update(CarritoItem)
+            .where(CarritoItem.usuario_id == usuario_id, CarritoItem.producto_id == producto_id)
+            .values(cantidad=cantidad)
+            .execution_options(synchronize_session=False)
+        )
+
+    def quitar(self, usuario_id, producto_id):
+        db.session.execute(
+            delete(CarritoItem)
+            .where(CarritoItem.usuario_id == usuario_id, CarritoItem.producto_id == producto_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def vaciar(self, usuario_id):
+        db.session.execute(
+            delete(CarritoItem).where(CarritoItem.usuario_id == usuario_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def persistir(self, usuarios=None):
+        return 0
+
+    def estadisticas(self):
+        return {'entradas': 0, 'sucios': 0}
+
+
+# ---------- BACKENDS DIFERIDOS (WRITE-BEHIND) ----------
+
+class _CarritoDiferido:
+    """
+    Base de los almacenes que guardan el carrito fuera de la base de datos
+    principal. Cada carrito es {producto_id: cantidad} con una versión y una
+    marca de sucio; carrito_items solo se escribe al persistir (cada
+    CARRITO_PERSISTIR_INTERVALO segundos y antes del checkout). Un carrito
+    que no está en el almacén se carga desde carrito_items.
+
+    Las subclases implementan _leer, _guardar_limpio, _cambiar_si_existe,
+    _sucios, _marcar_limpio y estadisticas.
+    """
+
+    diferido = True
+
+    def __init__(self, lote):
+        self.lote = lote
+
+    def _cargar(self, usuario_id):
+        lineas = self._leer(usuario_id)
+        if lineas is not None:
+            return lineas
+        lineas = dict(db.session.execute(
+            select(CarritoItem.producto_id, CarritoItem.cantidad)
+            .where(CarritoItem.usuario_id == usuario_id)
+            .order_by(CarritoItem.id)
+        ).all())
+        # Si otra petición lo cargó o modificó entre tanto, gana la del almacén
+        self._guardar_limpio(usuario_id, lineas)
+        actual = self._leer(usuario_id)
+        return lineas if actual is None else actual
+
+    def _cambiar(self, usuario_id, funcion):
+        # Solo se desalojan carritos limpios: si desapareció, se vuelve a cargar
+        while True:
+            self._cargar(usuario_id)
+            if self._cambiar_si_existe(usuario_id, funcion):
+                return
+
+    def valorar(self, usuario_id):
+        return valorar_cantidades(self._cargar(usuario_id))
+
+    def producto_y_cantidad(self, usuario_id, producto_id):
+        producto = db.session.get(Producto, producto_id)
+        if producto is None:
+            return None
+        return producto, self.cantidad(usuario_id, producto_id)
+
+    def cantidad(self, usuario_id, producto_id):
+        return self._cargar(usuario_id).get(producto_id, 0)
+
+    def sumar(self, usuario_id, producto_id, cantidad):
+        def sumar(lineas):
+            lineas[producto_id] = lineas.get(producto_id, 0) + cantidad
+        self._cambiar(usuario_id, sumar)
+
+    def fijar(self, usuario_id, producto_id, cantidad):
+        def fijar(lineas):
+            if producto_id in lineas:
+                lineas[producto_id] = cantidad
+        self._cambiar(usuario_id, fijar)
+
+    def quitar(self, usuario_id, producto_id):
+        self._cambiar(usuario_id, lambda lineas: lineas.pop(producto_id, None))
+
+    def vaciar(self, usuario_id):
+        """
+        Vaciar es raro (una vez por compra) y no debe revivir tras una caída:
+        se borra carrito_items en la transacción actual y el almacén se vacía
+        recién cuando esa transacción se confirma (vaciar_confirmado). Si se
+        revierte, el carrito sigue intacto.
+        """
+        db.session.execute(
+            delete(CarritoItem).where(CarritoItem.usuario_id == usuario_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.info.setdefault('carritos_vaciados', set()).add(usuario_id)
+
+    def vaciar_confirmado(self, usuario_id):
+        # Tras el commit no se puede consultar la base: si el carrito no está
+        # en el almacén no hay nada que vaciar (carrito_items ya está vacío)
+        self._cambiar_si_existe(usuario_id, lambda lineas: lineas.clear())
+
+    def persistir(self, usuarios=None):
+        """
+        Escribe en carrito_items los carritos sucios (solo los de `usuarios` si
+        se indica), de a `lote` usuarios por transacción: un DELETE de las
+        líneas que ya no están y un upsert executemany de las demás. Puede
+        correr a la vez en varios workers (tarea periódica, checkout, atexit)
+        para el mismo usuario: el upsert evita chocar con el índice único.
+        Un carrito modificado mientras se escribía sigue sucio para la
+        próxima vez. Devuelve cuántos carritos se escribieron.
+        """
+        sucios = self._sucios(usuarios)
+        for inicio in range(0, len(sucios), self.lote):
+            lote = sucios[inicio:inicio + self.lote]
+            ids = [usuario_id for usuario_id, _, _ in lote]
+            productos = {producto_id for _, lineas, _ in lote for producto_id in lineas}
+            existentes = set()
+            if productos:
+                existentes = set(db.session.scalars(select(Producto.id).where(Producto.id.in_(productos))))
+
+            filas = [
+                {'usuario_id': usuario_id, 'producto_id': producto_id, 'cantidad': cantidad}
+                for usuario_id, lineas, _ in lote
+                for producto_id, cantidad in lineas.items()
+                if producto_id in existentes
+            ]
+            borrar = CarritoItem.usuario_id.in_(ids)
+            if filas:
+                conservar = [(fila['usuario_id'], fila['producto_id']) for fila in filas]
+                borrar = borrar & tuple_(CarritoItem.usuario_id, CarritoItem.producto_id).not_in(conservar)
+            db.session.execute(delete(CarritoItem).where(borrar).execution_options(synchronize_session=False))
+            if filas:
+                fijar_lineas_carrito(filas)
+            db.session.commit()
+
+            for usuario_id, _, version in lote:
+                self._marcar_limpio(usuario_id, version)
+        return len(sucios)
+
+
+class CarritoMemoria(_CarritoDiferido):
+    """
+    Carritos en un dict del proceso (LRU de CARRITO_MAX_ENTRADAS carritos
+    limpios). Solo sirve con un único proceso: con varios workers cada uno
+    tendría su propia copia del carrito del usuario.
+    """
+
+    def __init__(self, max_entradas, lote):
+        super().__init__(lote)
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()   # usuario_id -> [lineas, version, sucio]
+        self._lock = threading.Lock()
+
+    def _leer(self, usuario_id):
+        with self._lock:
+            entrada = self._datos.get(usuario_id)
+            if entrada is None:
+                return None
+            self._datos.move_to_end(usuario_id)
+            return dict(entrada[0])
+
+    def _guardar_limpio(self, usuario_id, lineas):
+        with self._lock:
+            if usuario_id not in self._datos:
+                self._datos[usuario_id] = [dict(lineas), 0, False]
+            self._desalojar()
+
+    def _desalojar(self):
+        # Los carritos sucios no se desalojan: esperan a la próxima persistencia
+        sobrantes = len(self._datos) - self.max_entradas
+        if sobrantes <= 0:
+            return
+        limpios = []
+        for usuario_id, entrada in self._datos.items():
+            if len(limpios) >= sobrantes:
+                break
+            if not entrada[2]:
+                limpios.append(usuario_id)
+        for usuario_id in limpios:
+            del self._datos[usuario_id]
+
+    def _cambiar_si_existe(self, usuario_id, funcion):
+        with self._lock:
+            entrada = self._datos.get(usuario_id)
+            if entrada is None:
+                return False
+            funcion(entrada[0])
+            entrada[1] += 1
+            entrada[2] = True
+            self._datos.move_to_end(usuario_id)
+            return True
+
+    def _sucios(self, usuarios=None):
+        with self._lock:
+            return [
+                (usuario_id, dict(lineas), version)
+                for usuario_id, (lineas, version, sucio) in self._datos.items()
+                if sucio and (usuarios is None or usuario_id in usuarios)
+            ]
+
+    def _marcar_limpio(self, usuario_id, version):
+        with self._lock:
+            entrada = self._datos.get(usuario_id)
+            if entrada is not None and entrada[1] == version:
+                entrada[2] = False
+            self._desalojar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._datos),
+                'sucios': sum(1 for entrada in self._datos.values() if entrada[2]),
+            }
+
+
+class CarritoSQLite(_CarritoDiferido):
+    """
+    Carritos en un archivo SQLite local (WAL) que comparten todos los workers
+    de la máquina. Con varias máquinas hace falta el backend 'bd'.
+    """
+
+    def __init__(self, ruta, max_entradas, lote):
+        super().__init__(lote)
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self._local = threading.local()
+        self._conexion().execute(
+            'CREATE TABLE IF NOT EXISTS carritos ('
+            'usuario_id INTEGER PRIMARY KEY, lineas TEXT NOT NULL, version INTEGER NOT NULL, '
+            'sucio INTEGER NOT NULL, acceso REAL NOT NULL)'
+        )
+        self._conexion().execute('CREATE INDEX IF NOT EXISTS ix_carritos_sucio ON carritos (sucio)')
+
+    def _conexion(self):
+        # Una conexión por hilo y por proceso (los workers se crean con fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _decodificar(texto):
+        return {producto_id: cantidad for producto_id, cantidad in json.loads(texto)}
+
+    @staticmethod
+    def _codificar(lineas):
+        return json.dumps(list(lineas.items()))
+
+    def _leer(self, usuario_id):
+        fila = self._conexion().execute(
+            'SELECT lineas FROM carritos WHERE usuario_id = ?', (usuario_id,)
+        ).fetchone()
+        return None if fila is None else self._decodificar(fila[0])
+
+    def _guardar_limpio(self, usuario_id, lineas):
+        conn = self._conexion()
+        conn.execute(
+            'INSERT OR IGNORE INTO carritos (usuario_id, lineas, version, sucio, acceso) VALUES (?, ?, 0, 0, ?)',
+            (usuario_id, self._codificar(lineas), time.time()),
+        )
+        # Desaloja los carritos limpios menos usados por encima del máximo
+        conn.execute(
+            'DELETE FROM carritos WHERE usuario_id IN ('
+            'SELECT usuario_id FROM carritos WHERE sucio = 0 ORDER BY acceso DESC LIMIT -1 OFFSET ?)',
+            (self.max_entradas,),
+        )
+
+    def _cambiar_si_existe(self, usuario_id, funcion):
+        conn = self._conexion()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            fila = conn.execute('SELECT lineas FROM carritos WHERE usuario_id = ?', (usuario_id,)).fetchone()
+            if fila is None:
+                conn.execute('ROLLBACK')
+                return False
+            lineas = self._decodificar(fila[0])
+            funcion(lineas)
+            conn.execute(
+                'UPDATE carritos SET lineas = ?, version = version + 1, sucio = 1, acceso = ? WHERE usuario_id = ?',
+                (self._codificar(lineas), time.time(), usuario_id),
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _sucios(self, usuarios=None):
+        filas = self._conexion().execute(
+            'SELECT usuario_id, lineas, version FROM carritos WHERE sucio = 1'
+        ).fetchall()
+        return [
+            (usuario_id, self._decodificar(lineas), version)
+            for usuario_id, lineas, version in filas
+            if usuarios is None or usuario_id in usuarios
+        ]
+
+    def _marcar_limpio(self, usuario_id, version):
+        self._conexion().execute(
+            'UPDATE carritos SET sucio = 0 WHERE usuario_id = ? AND version = ?', (usuario_id, version)
+        )
+
+    def estadisticas(self):
+        entradas, sucios = self._conexion().execute(
+            'SELECT COUNT(*), COALESCE(SUM(sucio), 0) FROM carritos'
+        ).fetchone()
+        return {'entradas': entradas, 'sucios': sucios}
+
+
+# ---------- SERVICIO ----------
+
+class AlmacenCarrito:
+    """
+    Punto único de acceso al carrito para las rutas y la cola de pagos.
+    CARRITO_BACKEND elige dónde vive: 'bd' (carrito_items, una escritura por
+    operación), 'memoria' (un solo proceso) o 'sqlite' (compartido entre los
+    workers de una máquina). Los dos últimos persisten en carrito_items en
+    segundo plano, antes del checkout y al apagar el proceso.
+    """
+
+    OPERACIONES = ('valorar', 'sumar', 'fijar', 'quitar', 'vaciar')
+
+    def __init__(self, app=None):
+        self.backend = None
+        self._tarea = TareaPeriodica('persistir-carritos', self._periodica)
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(self.OPERACIONES + ('persistidos',), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        tipo = app.config['CARRITO_BACKEND']
+        max_entradas = app.config['CARRITO_MAX_ENTRADAS']
+        lote = app.config['CARRITO_PERSISTIR_LOTE']
+        if tipo == 'bd':
+            self.backend = CarritoBD()
+        elif tipo == 'memoria':
+            self.backend = CarritoMemoria(max_entradas, lote)
+        elif tipo == 'sqlite':
+            self.backend = CarritoSQLite(app.config['CARRITO_RUTA'], max_entradas, lote)
+        else:
+            raise ValueError(f'Backend de carrito desconocido: {tipo}')
+
+        if self.backend.diferido:
+            self._tarea.init_app(app, app.config['CARRITO_PERSISTIR_INTERVALO'])
+            atexit.register(self._al_salir, app)
+            if not event.contains(db.session, 'after_commit', _vaciar_tras_commit):
+                event.listen(db.session, 'after_commit', _vaciar_tras_commit)
+                event.listen(db.session, 'after_soft_rollback', _descartar_vaciados)
+        app.extensions['almacen_carrito'] = self
+
+    def _contar(self, operacion, cantidad=1):
+        with self._lock:
+            self._contadores[operacion] += cantidad
+
+    def valorar(self, usuario_id):
+        self._contar('valorar')
+        return self.backend.valorar(usuario_id)
+
+    def producto_y_cantidad(self, usuario_id, producto_id):
+        """(producto, cantidad en el carrito) o None si el producto no existe."""
+        return self.backend.producto_y_cantidad(usuario_id, producto_id)
+
+    def cantidad(self, usuario_id, producto_id):
+        return self.backend.cantidad(usuario_id, producto_id)
+
+    def sumar(self, usuario_id, producto_id, cantidad):
+        self._contar('sumar')
+        self.backend.sumar(usuario_id, producto_id, cantidad)
+
+    def fijar(self, usuario_id, producto_id, cantidad):
+        self._contar('fijar')
+        self.backend.fijar(usuario_id, producto_id, cantidad)
+
+    def quitar(self, usuario_id, producto_id):
+        self._contar('quitar')
+        self.backend.quitar(usuario_id, producto_id)
+
+    def vaciar(self, usuario_id):
+        self._contar('vaciar')
+        self.backend.vaciar(usuario_id)
+
+    def persistir(self, usuarios=None):
+        """Escribe en carrito_items los carritos pendientes; no hace nada con 'bd'."""
+        escritos = self.backend.persistir(usuarios)
+        self._contar('persistidos', escritos)
+        return escritos
+
+    def _periodica(self):
+        escritos = self.persistir()
+        if escritos:
+            current_app.logger.debug('Carritos persistidos: %s', escritos)
+
+    def _al_salir(self, app):
+        with app.app_context():
+            try:
+                self.persistir()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('No se pudieron persistir los carritos al salir')
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._contadores)
+        datos.update(self.backend.estadisticas())
+        datos['backend'] = type(self.backend).__name__
+        return datos
+
+
+almacen_carrito = AlmacenCarrito()
+
+
+# ---------- VACIADO TRAS EL COMMIT ----------
+
+def _vaciar_tras_commit(session):
+    for usuario_id in session.info.pop('carritos_vaciados', ()):
+        almacen_carrito.backend.vaciar_confirmado(usuario_id)
+
+
+def _descartar_vaciados(session, previous_transaction):
+    session.info.pop('carritos_vaciados', None)
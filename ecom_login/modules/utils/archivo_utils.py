@@ -0,0 +1,219 @@
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select, tuple_
+from ...models import (
+    db, Pedido, DetallePedido, MetodoPago,
+    PedidoArchivado, DetallePedidoArchivado, MetodoPagoArchivado,
+)
+from .consultas_utils import carga_detalle_pedido, carga_pedido_archivado
+from .tareas_utils import TareaPeriodica
+from .ventas_utils import DeltasVentas
+
+
+# Estados finales: un pedido así ya no cambia y puede salir de las tablas vivas
+ESTADOS_ARCHIVABLES = ('Entregado', 'Cancelado')
+
+COLUMNAS_PEDIDO = ('id', 'usuario_id', 'fecha', 'total', 'estado')
+COLUMNAS_DETALLE = ('id', 'pedido_id', 'producto_id', 'cantidad', 'precio', 'subtotal')
+COLUMNAS_PAGO = (
+    'id', 'pedido_id', 'tipo_pago', 'estado_pago', 'numero_tarjeta', 'nombre_titular', 'banco',
+    'tipo_persona', 'tipo_documento', 'numero_documento', 'fecha_pago', 'referencia', 'mensaje',
+)
+
+
+# ---------- MOVER PEDIDOS AL ARCHIVO ----------
+
+def _copiar(origen, destino, columnas, condicion):
+    """INSERT INTO destino (...) SELECT ... FROM origen WHERE condicion, sin pasar por Python."""
+    return db.session.execute(
+        insert(destino).from_select(
+            list(columnas),
+            select(*(getattr(origen, columna) for columna in columnas)).where(condicion),
+        )
+    ).rowcount
+
+
+def archivar_lote(limite, tamano):
+    """
+    Mueve hasta `tamano` pedidos entregados o cancelados con fecha anterior a
+    `limite`, con sus líneas e intentos de pago, a las tablas de archivo en
+    una transacción corta. Devuelve las filas movidas por tabla.
+
+    Los resúmenes de ventas no cambian: el pedido ya está en un estado final
+    y sigue contando (reconstruir lee también el archivo). Solo se suman a
+    pedidos_por_estado.archivados, así el listado de admin cuenta los vivos.
+    """
+    condiciones = (Pedido.estado.in_(ESTADOS_ARCHIVABLES), Pedido.fecha < limite)
+    ids = db.session.scalars(
+        select(Pedido.id).where(*condiciones)
+        .order_by(Pedido.fecha)
+        .limit(tamano)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.session.rollback()
+        return {'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0}
+
+    # Se repiten las condiciones por si el pedido cambió desde la selección
+    # (SQLite); lo que sigue se basa en los pedidos que sí se copiaron.
+    ahora = datetime.utcnow()
+    pedidos = db.session.execute(
+        insert(PedidoArchivado).from_select(
+            list(COLUMNAS_PEDIDO) + ['archivado_en'],
+            select(*(getattr(Pedido, columna) for columna in COLUMNAS_PEDIDO), literal(ahora))
+            .where(Pedido.id.in_(ids), *condiciones),
+        )
+    ).rowcount
+    copiados = select(PedidoArchivado.id).where(PedidoArchivado.id.in_(ids))
+    detalles = _copiar(DetallePedido, DetallePedidoArchivado, COLUMNAS_DETALLE, DetallePedido.pedido_id.in_(copiados))
+    metodos = _copiar(MetodoPago, MetodoPagoArchivado, COLUMNAS_PAGO, MetodoPago.pedido_id.in_(copiados))
+
+    deltas = DeltasVentas()
+    deltas.archivados.update(db.session.execute(
+        select(PedidoArchivado.estado, func.count()).where(PedidoArchivado.id.in_(ids)).group_by(PedidoArchivado.estado)
+    ).all())
+    deltas.aplicar(db.session.connection())
+
+    for modelo, columna in ((MetodoPago, MetodoPago.pedido_id), (DetallePedido, DetallePedido.pedido_id), (Pedido, Pedido.id)):
+        db.session.execute(
+            delete(modelo).where(columna.in_(copiados))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return {'pedidos': pedidos, 'detalles_pedido': detalles, 'metodos_pago': metodos}
+
+
+class ArchivoPedidos:
+    """
+    Mueve al archivo los pedidos entregados o cancelados hace más de
+    PEDIDOS_ARCHIVO_DIAS, de a PEDIDOS_ARCHIVO_LOTE por transacción, cada
+    PEDIDOS_ARCHIVO_INTERVALO segundos en un hilo de cada worker (0 = solo
+    con `flask archivar-pedidos`). Así pedidos, detalles_pedido y
+    metodos_pago (y sus índices) quedan del tamaño de la actividad reciente.
+    """
+
+    def __init__(self, app=None):
+        self.antiguedad = timedelta(days=180)
+        self.lote = 500
+        self._tarea = TareaPeriodica('archivo-pedidos', self._periodica)
+        self._lock = threading.Lock()
+        self._contadores = {
+            'ejecuciones': 0, 'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0, 'lecturas': 0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.antiguedad = timedelta(days=app.config['PEDIDOS_ARCHIVO_DIAS'])
+        self.lote = app.config['PEDIDOS_ARCHIVO_LOTE']
+        self._tarea.init_app(app, app.config['PEDIDOS_ARCHIVO_INTERVALO'])
+        app.extensions['archivo_pedidos'] = self
+
+    def archivar(self, max_lotes=None):
+        """Archiva lote a lote hasta que no queden pedidos viejos. Devuelve el total movido."""
+        limite = datetime.utcnow() - self.antiguedad
+        total = {'lotes': 0, 'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0}
+        while max_lotes is None or total['lotes'] < max_lotes:
+            movido = archivar_lote(limite, self.lote)
+            if not movido['pedidos']:
+                break
+            total['lotes'] += 1
+            for tabla, filas in movido.items():
+                total[tabla] += filas
+            if movido['pedidos'] < self.lote:
+                break
+
+        with self._lock:
+            self._contadores['ejecuciones'] += 1
+            for tabla in ('pedidos', 'detalles_pedido', 'metodos_pago'):
+                self._contadores[tabla] += total[tabla]
+        return total
+
+    def contar_lectura(self):
+        with self._lock:
+            self._contadores['lecturas'] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def _periodica(self):
+        total = self.archivar()
+        if total['pedidos']:
+            current_app.logger.info('Pedidos archivados: %s', total)
+
+
+archivo_pedidos = ArchivoPedidos()
+
+
+# ---------- LECTURAS ----------
+
+def buscar_pedido(pedido_id, usuario_id=None, con_usuario=False):
+    """
+    Pedido con sus líneas para las páginas de detalle: primero en las tablas
+    vivas y, solo si no está ahí, en el archivo. None si no existe (o si no
+    es del usuario indicado).
+    """
+    filtros = {'id': pedido_id}
+    if usuario_id is not None:
+        filtros['usuario_id'] = usuario_id
+    pedido = Pedido.query.options(*carga_detalle_pedido(con_usuario=con_usuario)).filter_by(**filtros).first()
+    if pedido is not None:
+        return pedido
+
+    archivo_pedidos.contar_lectura()
+    return PedidoArchivado.query.options(*carga_pedido_archivado(con_usuario=con_usuario)).filter_by(**filtros).first()
+
+
+def _leer_cursor(cursor):
+    """'fecha_id' -> (fecha, id); None si no es válido."""
+    try:
+        fecha, pedido_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(fecha), int(pedido_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _cursor(pedido):
+    return f'{pedido.fecha.isoformat()}_{pedido.id}'
+
+
+def _pagina(modelo, usuario_id, cursor, limite):
+    query = modelo.query.filter(modelo.usuario_id == usuario_id)
+    if cursor:
+        query = query.filter(tuple_(modelo.fecha, modelo.id) < cursor)
+    return query.order_by(modelo.fecha.desc(), modelo.id.desc()).limit(limite).all()
+
+
+def pagina_mis_pedidos(usuario_id, despues=None, en_archivo=False, por_pagina=None):
+    """
+    Página de mis_pedidos, del más reciente al más viejo, por cursor sobre
+    (fecha, id). Recorre primero los pedidos vivos y, cuando se acaban,
+    sigue con los archivados: el archivo solo se consulta en la página que
+    llega hasta allí. Devuelve (pedidos, argumentos de la página siguiente
+    o None).
+    """
+    por_pagina = por_pagina or current_app.config['PEDIDOS_POR_PAGINA']
+    cursor = _leer_cursor(despues) if despues else None
+
+    pedidos = []
+    if not en_archivo:
+        pedidos = _pagina(Pedido, usuario_id, cursor, por_pagina + 1)
+        if len(pedidos) > por_pagina:
+            pedidos = pedidos[:por_pagina]
+            return pedidos, {'despues': _cursor(pedidos[-1])}
+        # Se acabaron los vivos: el archivo se recorre desde su pedido más reciente
+        cursor = None
+
+    faltan = por_pagina - len(pedidos)
+    archivo_pedidos.contar_lectura()
+    archivados = _pagina(PedidoArchivado, usuario_id, cursor, faltan + 1)
+    pedidos += archivados[:faltan]
+    if len(archivados) <= faltan:
+        return pedidos, None
+    siguiente = {'archivo': 1}
+    if faltan:
+        siguiente['despues'] = _cursor(archivados[faltan - 1])
+    return pedidos, siguiente
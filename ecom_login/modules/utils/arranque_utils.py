@@ -0,0 +1,24 @@
+from ...models import db
+from .catalogo_utils import obtener_pagina_catalogo, renderizar_tarjetas
+
+
+# ---------- PRECALENTAMIENTO ----------
+
+def precalentar(app):
+    """
+    Compila todas las plantillas y llena la caché con la primera página del
+    catálogo. Con `gunicorn --preload` se llama en el proceso padre, así los
+    workers nacen por fork con todo esto ya en memoria.
+    """
+    plantillas = 0
+    for nombre in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(nombre)
+        plantillas += 1
+
+    with app.test_request_context('/'):
+        pagina = obtener_pagina_catalogo()
+        renderizar_tarjetas(pagina.productos)
+        # No dejar conexiones abiertas que los workers heredarían al hacer fork
+        db.engine.dispose()
+
+    return {'plantillas': plantillas, 'productos': len(pagina.productos)}
@@ -0,0 +1,244 @@
+import re
+
+from flask import current_app
+from sqlalchemy import event, text
+from ...models import db, Producto
+from .cache_utils import cache_catalogo
+from .catalogo_utils import FilaProducto
+
+
+# Palabras que se toman de la consulta; el resto se ignora
+MAX_TERMINOS = 8
+# Tope de resultados por página que puede pedir el cliente (?limite=)
+MAX_POR_PAGINA = 50
+
+
+# ---------- ÍNDICE DE TEXTO COMPLETO ----------
+# SQLite: tabla FTS5 de contenido externo sobre productos, sincronizada con
+# triggers. PostgreSQL: columna tsvector generada (nombre pesa más que la
+# descripción) con índice GIN. En ambos casos la base mantiene el índice al
+# día en cada INSERT/UPDATE/DELETE, también desde las rutas de productos.
+
+SENTENCIAS_INDICE = {
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            nombre, descripcion,
+            content='productos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts (rowid, nombre, descripcion)
+            VALUES (new.id, new.nombre, coalesce(new.descripcion, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+            VALUES ('delete', old.id, old.nombre, coalesce(old.descripcion, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, descripcion ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+            VALUES ('delete', old.id, old.nombre, coalesce(old.descripcion, ''));
+            INSERT INTO productos_fts (rowid, nombre, descripcion)
+            VALUES (new.id, new.nombre, coalesce(new.descripcion, ''));
+        END
+        """,
+        # Indexar lo que ya hubiera en productos
+        "INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        # Configuración 'simple' que además quita los acentos, como
+        # remove_diacritics en SQLite: "dragon" encuentra "Dragón"
+        'CREATE EXTENSION IF NOT EXISTS unaccent',
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'productos_busqueda') THEN
+                CREATE TEXT SEARCH CONFIGURATION productos_busqueda (COPY = simple);
+                ALTER TEXT SEARCH CONFIGURATION productos_busqueda
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+            END IF;
+        END $$
+        """,
+        """
+        ALTER TABLE productos ADD COLUMN IF NOT EXISTS busqueda tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('productos_busqueda', coalesce(nombre, '')), 'A') ||
+            setweight(to_tsvector('productos_busqueda', coalesce(descripcion, '')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX IF NOT EXISTS ix_productos_busqueda ON productos USING GIN (busqueda)',
+    ],
+}
+
+SENTENCIAS_BORRADO = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS productos_fts_au',
+        'DROP TRIGGER IF EXISTS productos_fts_ad',
+        'DROP TRIGGER IF EXISTS productos_fts_ai',
+        'DROP TABLE IF EXISTS productos_fts',
+    ],
+    'postgresql': [
+        'DROP INDEX IF EXISTS ix_productos_busqueda',
+        'ALTER TABLE productos DROP COLUMN IF EXISTS busqueda',
+        'DROP TEXT SEARCH CONFIGURATION IF EXISTS productos_busqueda',
+    ],
+}
+
+
+def crear_indice_busqueda(conexion):
+    """Crea (o completa) el índice de búsqueda. Es idempotente."""
+    for sentencia in SENTENCIAS_INDICE.get(conexion.dialect.name, []):
+        conexion.execute(text(sentencia))
+
+
+def borrar_indice_busqueda(conexion):
+    for sentencia in SENTENCIAS_BORRADO.get(conexion.dialect.name, []):
+        conexion.execute(text(sentencia))
+
+
+# db.create_all() / drop_all() también crean y borran el índice
+@event.listens_for(Producto.__table__, 'after_create')
+def _crear_tras_tabla(tabla, conexion, **kw):
+    crear_indice_busqueda(conexion)
+
+
+@event.listens_for(Producto.__table__, 'before_drop')
+def _borrar_antes_de_tabla(tabla, conexion, **kw):
+    borrar_indice_busqueda(conexion)
+
+
+# ---------- CONSULTA ----------
+
+def terminos_de_busqueda(texto):
+    """Palabras de la consulta en minúsculas; solo letras y dígitos."""
+    return re.findall(r'\w+', (texto or '').lower())[:MAX_TERMINOS]
+
+
+# Calcular bm25/ts_rank cuesta ~1 µs por coincidencia y un prefijo corto
+# ("dr") puede coincidir con decenas de miles de productos, así que por
+# defecto solo se ordenan por relevancia las BUSQUEDA_MAX_CANDIDATOS
+# coincidencias más recientes (la página de búsqueda lo avisa).
+# BUSQUEDA_MAX_PAGINAS páginas deben caber en el tope. Con 0 se ordenan
+# todas: ORDER BY ... LIMIT es un top-k que no ordena el resto.
+
+# SQLite: id del N-ésimo resultado más reciente; la búsqueda se limita a rowid >= corte.
+# En dos sentencias porque FTS5 no empuja el corte si va como subconsulta.
+SQL_CORTE_SQLITE = text("""
+    SELECT rowid FROM productos_fts WHERE productos_fts MATCH :consulta
+    ORDER BY rowid DESC LIMIT 1 OFFSET :candidatos - 1
+""")
+
+SQL_BUSQUEDA = {
+    'sqlite': text("""
+        SELECT p.id, p.nombre, p.descripcion, p.precio, p.stock, p.imagen, p.imagen_clave, p.imagen_ancho
+        FROM (
+            SELECT rowid, bm25(productos_fts, 10.0, 1.0) AS relevancia
+            FROM productos_fts
+            WHERE productos_fts MATCH :consulta AND rowid >= :corte
+            ORDER BY relevancia
+            LIMIT :limite OFFSET :desde
+        ) AS f
+        JOIN productos AS p ON p.id = f.rowid
+        ORDER BY f.relevancia, p.id
+    """),
+    'postgresql': text("""
+        WITH q AS (SELECT to_tsquery('productos_busqueda', :consulta) AS consulta)
+        SELECT p.id, p.nombre, p.descripcion, p.precio, p.stock, p.imagen, p.imagen_clave, p.imagen_ancho
+        FROM productos AS p, q
+        WHERE p.busqueda @@ q.consulta
+        ORDER BY ts_rank(p.busqueda, q.consulta) DESC, p.id
+        LIMIT :limite OFFSET :desde
+    """),
+}
+
+# PostgreSQL con BUSQUEDA_MAX_CANDIDATOS: solo las N coincidencias más recientes
+SQL_BUSQUEDA_RECIENTES_POSTGRESQL = text("""
+    WITH q AS (SELECT to_tsquery('productos_busqueda', :consulta) AS consulta),
+    candidatos AS (
+        SELECT p.id FROM productos AS p, q
+        WHERE p.busqueda @@ q.consulta
+        ORDER BY p.id DESC
+        LIMIT :candidatos
+    )
+    SELECT p.id, p.nombre, p.descripcion, p.precio, p.stock, p.imagen, p.imagen_clave, p.imagen_ancho
+    FROM candidatos JOIN productos AS p ON p.id = candidatos.id, q
+    ORDER BY ts_rank(p.busqueda, q.consulta) DESC, p.id
+    LIMIT :limite OFFSET :desde
+""")
+
+
+def expresion_de_busqueda(dialecto, terminos):
+    # Todas las palabras deben aparecer. La última se busca como prefijo para
+    # autocompletar ("figura dra" encuentra "Figura de dragón" mientras se
+    # escribe); las anteriores ya están completas y se buscan exactas, que
+    # recorre menos listas del índice.
+    *completos, ultimo = terminos
+    if dialecto == 'sqlite':
+        return ' '.join([f'"{termino}"' for termino in completos] + [f'"{ultimo}"*'])
+    if dialecto == 'postgresql':
+        return ' & '.join(completos + [f'{ultimo}:*'])
+    raise ValueError(f'Búsqueda no soportada en {dialecto}')
+
+
+class PaginaBusqueda:
+    """Página de resultados ordenados por relevancia."""
+
+    def __init__(self, consulta, productos, numero, hay_siguiente):
+        self.consulta = consulta
+        self.productos = productos
+        self.numero = numero
+        self.hay_anterior = numero > 1
+        self.hay_siguiente = hay_siguiente
+
+    def como_dict(self):
+        return {
+            'consulta': self.consulta,
+            'pagina': self.numero,
+            'hay_siguiente': self.hay_siguiente,
+            'productos': [producto._asdict() for producto in self.productos],
+        }
+
+
+def consultar_indice(terminos, pagina, por_pagina):
+    """Ejecuta la búsqueda sin caché. Devuelve una PaginaBusqueda."""
+    dialecto = db.session.get_bind().dialect.name
+    parametros = {
+        'consulta': expresion_de_busqueda(dialecto, terminos),
+        'candidatos': current_app.config['BUSQUEDA_MAX_CANDIDATOS'],
+        'limite': por_pagina + 1,
+        'desde': (pagina - 1) * por_pagina,
+    }
+    sql = SQL_BUSQUEDA[dialecto]
+    if dialecto == 'sqlite':
+        parametros['corte'] = 0
+        if parametros['candidatos']:
+            parametros['corte'] = db.session.scalar(SQL_CORTE_SQLITE, parametros) or 0
+    elif parametros['candidatos']:
+        sql = SQL_BUSQUEDA_RECIENTES_POSTGRESQL
+    filas = db.session.execute(sql, parametros).all()
+    productos = [FilaProducto(*fila) for fila in filas[:por_pagina]]
+    return PaginaBusqueda(' '.join(terminos), productos, pagina, len(filas) > por_pagina)
+
+
+def buscar_productos(texto, pagina=1, por_pagina=None):
+    """
+    Busca en nombre y descripción con el índice de texto completo.
+    Los resultados pasan por la caché del catálogo, así que una edición de
+    productos (invalidar_catalogo) también invalida las búsquedas.
+    """
+    por_pagina = max(1, min(por_pagina or current_app.config['PRODUCTOS_POR_PAGINA'], MAX_POR_PAGINA))
+    pagina = max(1, min(pagina, current_app.config['BUSQUEDA_MAX_PAGINAS']))
+    terminos = terminos_de_busqueda(texto)
+    consulta = ' '.join(terminos)
+    if not terminos:
+        return PaginaBusqueda(consulta, [], 1, False)
+
+    return cache_catalogo.obtener_o_calcular(
+        f'busqueda:{consulta}:{pagina}:{por_pagina}',
+        lambda: consultar_indice(terminos, pagina, por_pagina),
+    )
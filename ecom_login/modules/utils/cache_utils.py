@@ -0,0 +1,218 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from ...models import db
+
+
+_FALTA = object()
+
+
+# ---------- BACKENDS ----------
+
+class BackendMemoria:
+    """
+    Almacén dentro del proceso: LRU acotado con TTL.
+    Cada worker de gunicorn tiene el suyo, así que la versión no se comparte.
+    """
+
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        return self._version
+
+    def incrementar_version(self):
+        with self._lock:
+            self._version += 1
+            self._datos.clear()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return _FALTA
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return _FALTA
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def total_entradas(self):
+        return len(self._datos)
+
+
+class BackendSQLite:
+    """
+    Almacén compartido en un archivo SQLite local. Todos los workers de la
+    máquina ven la misma versión, así que una escritura en uno invalida a todos.
+    """
+
+    def __init__(self, ruta, max_entradas, ttl):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conexion() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS version (id INTEGER PRIMARY KEY CHECK (id = 1), valor INTEGER NOT NULL)'
+            )
+            conn.execute('INSERT OR IGNORE INTO version (id, valor) VALUES (1, 0)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entradas ('
+                'clave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL NOT NULL, acceso REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_entradas_acceso ON entradas (acceso)')
+
+    def _conexion(self):
+        # Una conexión por hilo y por proceso (los workers se crean con fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self):
+        return self._conexion().execute('SELECT valor FROM version WHERE id = 1').fetchone()[0]
+
+    def incrementar_version(self):
+        conn = self._conexion()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('UPDATE version SET valor = valor + 1 WHERE id = 1')
+            conn.execute('DELETE FROM entradas')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def obtener(self, clave):
+        conn = self._conexion()
+        ahora = time.time()
+        fila = conn.execute(
+            'SELECT valor, expira FROM entradas WHERE clave = ?', (clave,)
+        ).fetchone()
+        if fila is None:
+            return _FALTA
+        if fila[1] < ahora:
+            conn.execute('DELETE FROM entradas WHERE clave = ?', (clave,))
+            return _FALTA
+        conn.execute('UPDATE entradas SET acceso = ? WHERE clave = ?', (ahora, clave))
+        return pickle.loads(fila[0])
+
+    def guardar(self, clave, valor):
+        conn = self._conexion()
+        ahora = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO entradas (clave, valor, expira, acceso) VALUES (?, ?, ?, ?)',
+            (clave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), ahora + self.ttl, ahora),
+        )
+        conn.execute(
+            'DELETE FROM entradas WHERE clave IN ('
+            'SELECT clave FROM entradas ORDER BY acceso DESC LIMIT -1 OFFSET ?)',
+            (self.max_entradas,),
+        )
+
+    def total_entradas(self):
+        return self._conexion().execute('SELECT COUNT(*) FROM entradas').fetchone()[0]
+
+
+# ---------- CACHÉ DEL CATÁLOGO ----------
+
+class CacheCatalogo:
+    """
+    Caché de lectura para el catálogo con un contador global de versión.
+    Las claves llevan la versión, así que subirla invalida todo de una vez
+    y un valor calculado con datos viejos nunca vuelve a leerse.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        tipo = app.config['CATALOGO_CACHE_BACKEND']
+        max_entradas = app.config['CATALOGO_CACHE_MAX_ENTRADAS']
+        ttl = app.config['CATALOGO_CACHE_TTL']
+        if tipo == 'memoria':
+            self.backend = BackendMemoria(max_entradas, ttl)
+        elif tipo == 'sqlite':
+            self.backend = BackendSQLite(app.config['CATALOGO_CACHE_RUTA'], max_entradas, ttl)
+        else:
+            raise ValueError(f'Backend de caché desconocido: {tipo}')
+
+        if not event.contains(db.session, 'after_commit', _subir_version_tras_commit):
+            event.listen(db.session, 'after_commit', _subir_version_tras_commit)
+            event.listen(db.session, 'after_soft_rollback', _descartar_marca)
+        app.extensions['cache_catalogo'] = self
+
+    def obtener_o_calcular(self, clave, calcular):
+        clave = f'v{self.backend.version()}:{clave}'
+        valor = self.backend.obtener(clave)
+        if valor is not _FALTA:
+            with self._lock:
+                self.aciertos += 1
+            return valor
+
+        with self._lock:
+            self.fallos += 1
+        valor = calcular()
+        self.backend.guardar(clave, valor)
+        return valor
+
+    def invalidar(self):
+        self.backend.incrementar_version()
+
+    def estadisticas(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'version': self.backend.version(),
+            'entradas': self.backend.total_entradas(),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+        }
+
+
+cache_catalogo = CacheCatalogo()
+
+
+# ---------- INVALIDACIÓN ----------
+
+def invalidar_catalogo():
+    """
+    Marca el catálogo como modificado en la transacción actual.
+    La versión sube cuando la transacción se confirma, no antes.
+    """
+    db.session.info['catalogo_modificado'] = True
+
+
+def _subir_version_tras_commit(session):
+    if session.info.pop('catalogo_modificado', False):
+        cache_catalogo.invalidar()
+
+
+def _descartar_marca(session, previous_transaction):
+    session.info.pop('catalogo_modificado', None)
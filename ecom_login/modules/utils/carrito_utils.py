@@ -0,0 +1,163 @@
+from sqlalchemy import and_, case, func, select
+from ...models import db, Producto, CarritoItem
+
+
+# ---------- VALORACIÓN DEL CARRITO ----------
+
+class ItemCarrito:
+    """Producto del carrito con la cantidad pedida, sin importar dónde se guarda el carrito."""
+
+    __slots__ = ('producto_id', 'cantidad', 'producto')
+
+    def __init__(self, producto_id, cantidad, producto):
+        self.producto_id = producto_id
+        self.cantidad = cantidad
+        self.producto = producto
+
+
+class LineaCarrito:
+    """Ítem del carrito con su producto y la cantidad que el stock permite."""
+
+    __slots__ = ('item', 'cantidad_valida', 'subtotal')
+
+    def __init__(self, item, cantidad_valida, subtotal):
+        self.item = item
+        self.cantidad_valida = cantidad_valida
+        self.subtotal = subtotal
+
+    @property
+    def producto(self):
+        return self.item.producto
+
+    @property
+    def agotado(self):
+        return self.cantidad_valida <= 0
+
+    @property
+    def ajustado(self):
+        return 0 < self.cantidad_valida < self.item.cantidad
+
+
+class ValoracionCarrito:
+    """Resultado de valorar el carrito completo de un usuario."""
+
+    def __init__(self, lineas, total):
+        self.lineas = lineas
+        self.total = total
+
+    @property
+    def agotados(self):
+        return [linea for linea in self.lineas if linea.agotado]
+
+    @property
+    def ajustados(self):
+        return [linea for linea in self.lineas if linea.ajustado]
+
+    @property
+    def validos(self):
+        return [linea for linea in self.lineas if not linea.agotado]
+
+
+def valorar_carrito(usuario_id):
+    """
+    Carga el carrito unido a sus productos en una sola consulta. La cantidad
+    recortada al stock, el subtotal y el total (SUM ... OVER ()) se calculan
+    en SQL, así un carrito de 50 líneas cuesta un solo viaje a la base de datos.
+    """
+    cantidad_valida = case(
+        (Producto.stock <= 0, 0),
+        (CarritoItem.cantidad > Producto.stock, Producto.stock),
+        else_=CarritoItem.cantidad,
+    )
+    subtotal = Producto.precio * cantidad_valida
+    consulta = (
+        select(CarritoItem.producto_id, CarritoItem.cantidad, Producto, cantidad_valida, subtotal, func.sum(subtotal).over())
+        .join(CarritoItem.producto)
+        .where(CarritoItem.usuario_id == usuario_id)
+        .order_by(CarritoItem.id)
+    )
+    filas = db.session.execute(consulta).all()
+
+    lineas = [
+        LineaCarrito(ItemCarrito(producto_id, cantidad, producto), valida, sub or 0.0)
+        for producto_id, cantidad, producto, valida, sub, _ in filas
+    ]
+    total = (filas[0][5] or 0.0) if filas else 0.0
+    return ValoracionCarrito(lineas, total)
+
+
+def valorar_cantidades(cantidades):
+    """
+    Igual que valorar_carrito para un carrito que no está en carrito_items:
+    `cantidades` es {producto_id: cantidad} en el orden en que se agregaron.
+    Una consulta por los productos; los que ya no existen se descartan.
+    """
+    if not cantidades:
+        return ValoracionCarrito([], 0.0)
+    productos = {
+        producto.id: producto
+        for producto in db.session.scalars(select(Producto).where(Producto.id.in_(cantidades)))
+    }
+
+    lineas = []
+    total = 0.0
+    for producto_id, cantidad in cantidades.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            continue
+        valida = max(min(cantidad, producto.stock), 0)
+        subtotal = producto.precio * valida
+        lineas.append(LineaCarrito(ItemCarrito(producto_id, cantidad, producto), valida, subtotal))
+        total += subtotal
+    return ValoracionCarrito(lineas, total)
+
+
+def linea_para_agregar(usuario_id, producto_id):
+    """Producto y (si existe) su ítem en el carrito del usuario, en una consulta."""
+    consulta = (
+        select(Producto, CarritoItem)
+        .outerjoin(
+            CarritoItem,
+            and_(CarritoItem.producto_id == Producto.id, CarritoItem.usuario_id == usuario_id),
+        )
+        .where(Producto.id == producto_id)
+    )
+    return db.session.execute(consulta).first()
+
+
+def _insert_carrito():
+    """INSERT de carrito_items con ON CONFLICT del dialecto actual."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(CarritoItem)
+
+
+def sumar_al_carrito(usuario_id, producto_id, cantidad):
+    """
+    Upsert sobre el índice único (usuario_id, producto_id): inserta la línea o,
+    si otra petición la creó entre tanto, suma la cantidad a la existente.
+    """
+    sentencia = _insert_carrito().values(
+        usuario_id=usuario_id, producto_id=producto_id, cantidad=cantidad
+    )
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=[CarritoItem.usuario_id, CarritoItem.producto_id],
+        set_={'cantidad': CarritoItem.cantidad + sentencia.excluded.cantidad},
+    )
+    db.session.execute(sentencia)
+
+
+def fijar_lineas_carrito(filas):
+    """
+    Upsert de varias líneas ({'usuario_id', 'producto_id', 'cantidad'}) que
+    deja la cantidad indicada aunque otro proceso haya escrito la línea entre
+    tanto. Un executemany.
+    """
+    sentencia = _insert_carrito()
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=[CarritoItem.usuario_id, CarritoItem.producto_id],
+        set_={'cantidad': sentencia.excluded.cantidad},
+    )
+    db.session.execute(sentencia, filas)
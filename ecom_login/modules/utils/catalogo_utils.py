@@ -0,0 +1,84 @@
+from collections import namedtuple
+from flask import current_app, render_template
+from markupsafe import Markup
+from ...models import Producto
+from .cache_utils import cache_catalogo
+
+
+# Copia ligera de un Producto para guardar en caché (sin sesión de SQLAlchemy)
+FilaProducto = namedtuple('FilaProducto', 'id nombre descripcion precio stock imagen imagen_clave imagen_ancho')
+
+
+# ---------- PAGINACIÓN POR CURSOR (KEYSET) ----------
+
+class PaginaCatalogo:
+    """Página de productos obtenida con un cursor sobre Producto.id."""
+
+    def __init__(self, productos, hay_anterior, hay_siguiente):
+        self.productos = productos
+        self.hay_anterior = hay_anterior and bool(productos)
+        self.hay_siguiente = hay_siguiente and bool(productos)
+
+    @property
+    def cursor_anterior(self):
+        return self.productos[0].id if self.productos else None
+
+    @property
+    def cursor_siguiente(self):
+        return self.productos[-1].id if self.productos else None
+
+
+def paginar_productos(despues_de=None, antes_de=None, por_pagina=None):
+    """
+    Devuelve una página de productos ordenada por id usando WHERE id > / id <
+    en lugar de OFFSET, así una página profunda cuesta lo mismo que la primera.
+    Se pide un registro extra para saber si hay más resultados en esa dirección.
+    """
+    por_pagina = por_pagina or current_app.config['PRODUCTOS_POR_PAGINA']
+
+    if antes_de is not None:
+        filas = (
+            Producto.query.filter(Producto.id < antes_de)
+            .order_by(Producto.id.desc())
+            .limit(por_pagina + 1)
+            .all()
+        )
+        if filas:
+            productos = list(reversed(filas[:por_pagina]))
+            return PaginaCatalogo(productos, len(filas) > por_pagina, True)
+        # Cursor fuera de rango: volver a la primera página
+        despues_de = None
+
+    query = Producto.query
+    if despues_de is not None:
+        query = query.filter(Producto.id > despues_de)
+    filas = query.order_by(Producto.id.asc()).limit(por_pagina + 1).all()
+    return PaginaCatalogo(filas[:por_pagina], despues_de is not None, len(filas) > por_pagina)
+
+
+# ---------- CATÁLOGO CACHEADO ----------
+
+def obtener_pagina_catalogo(despues_de=None, antes_de=None):
+    """Página del catálogo leída a través de la caché versionada."""
+    def calcular():
+        pagina = paginar_productos(despues_de=despues_de, antes_de=antes_de)
+        pagina.productos = [
+            FilaProducto(p.id, p.nombre, p.descripcion, p.precio, p.stock, p.imagen, p.imagen_clave, p.imagen_ancho)
+            for p in pagina.productos
+        ]
+        return pagina
+
+    clave = f'pagina:{despues_de}:{antes_de}:{current_app.config["PRODUCTOS_POR_PAGINA"]}'
+    return cache_catalogo.obtener_o_calcular(clave, calcular)
+
+
+def renderizar_tarjetas(productos):
+    """Devuelve {id: html} con la tarjeta de cada producto ya renderizada."""
+    tarjetas = {}
+    for producto in productos:
+        html = cache_catalogo.obtener_o_calcular(
+            f'tarjeta:{producto.id}',
+            lambda: render_template('user/producto_card.html', producto=producto),
+        )
+        tarjetas[producto.id] = Markup(html)
+    return tarjetas
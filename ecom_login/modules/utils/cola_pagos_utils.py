@@ -0,0 +1,396 @@
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import import_string
+from ...models import db, Pedido, DetallePedido, MetodoPago
+from .almacen_carrito_utils import almacen_carrito
+from .cache_utils import invalidar_catalogo
+from .stock_utils import reservar_stock, liberar_stock
+
+
+# Estados de un intento (MetodoPago.estado_pago)
+EN_COLA = 'Pendiente'
+PROCESANDO = 'Procesando'
+VERIFICANDO = 'Verificando'   # interrumpido y la pasarela aún no da una respuesta definitiva
+APROBADO = 'Aprobado'
+RECHAZADO = 'Rechazado'
+REEMBOLSAR = 'Reembolsar'     # cobro aprobado de un pedido que se canceló mientras tanto
+ESTADOS_FINALES = (APROBADO, RECHAZADO, REEMBOLSAR)
+# Intentos que retienen el pedido: ni se reutiliza ni se limpia
+INTENTOS_VIVOS = (EN_COLA, PROCESANDO, VERIFICANDO, APROBADO)
+
+MENSAJE_INTERRUMPIDO = 'El pago se interrumpió antes de completarse. Inténtalo de nuevo.'
+MENSAJE_VERIFICANDO = 'Estamos confirmando el pago con la pasarela.'
+MENSAJE_REEMBOLSAR = 'El pedido se canceló durante el cobro: el pago se reembolsará.'
+
+ResultadoCobro = namedtuple('ResultadoCobro', 'aprobado referencia mensaje')
+Cobro = namedtuple('Cobro', 'clave tipo_pago monto')
+
+
+def nueva_clave():
+    """Clave de idempotencia para un formulario de pago (va en un campo oculto)."""
+    return uuid.uuid4().hex
+
+
+# ---------- PASARELAS ----------
+
+class Pasarela:
+    """
+    Interfaz de una pasarela de pagos. cobrar() debe ser idempotente por
+    clave: repetirlo con la misma clave devuelve el resultado del primer
+    cobro sin cobrar otra vez. consultar() devuelve ese resultado, o None si
+    no tiene una respuesta definitiva (no conoce la clave o el cobro sigue
+    en curso). Si la pasarela puede asegurar que el cobro no existe debe
+    devolver un ResultadoCobro rechazado: None nunca se da por rechazo.
+    """
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls()
+
+    def cobrar(self, clave, monto, tipo_pago, datos):
+        raise NotImplementedError
+
+    def consultar(self, clave):
+        raise NotImplementedError
+
+
+class PasarelaSimulada(Pasarela):
+    """
+    Pasarela en el mismo proceso, para desarrollo y pruebas. Aprueba todo
+    salvo la tarjeta de prueba 4000000000000002 y los documentos PSE que
+    terminan en 000. Cada cobro tarda PAGOS_LATENCIA_SIMULADA segundos.
+    """
+
+    TARJETA_RECHAZADA = '4000000000000002'
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.cobros = {}
+        self.cobros_realizados = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls(config['PAGOS_LATENCIA_SIMULADA'])
+
+    def cobrar(self, clave, monto, tipo_pago, datos):
+        with self._lock:
+            if clave in self.cobros:
+                return self.cobros[clave]
+        time.sleep(self.latencia)
+
+        if tipo_pago == 'tarjeta' and datos.get('numero_tarjeta') == self.TARJETA_RECHAZADA:
+            resultado = ResultadoCobro(False, None, 'La tarjeta fue rechazada por el banco emisor.')
+        elif tipo_pago == 'pse' and str(datos.get('numero_documento', '')).endswith('000'):
+            resultado = ResultadoCobro(False, None, 'El banco rechazó la transacción PSE.')
+        else:
+            resultado = ResultadoCobro(True, f'SIM-{uuid.uuid4().hex[:12]}', None)
+
+        with self._lock:
+            # Dos cobros simultáneos con la misma clave: vale el primero
+            guardado = self.cobros.setdefault(clave, resultado)
+            if guardado is resultado:
+                self.cobros_realizados += 1
+        return guardado
+
+    def consultar(self, clave):
+        with self._lock:
+            return self.cobros.get(clave)
+
+
+# Nombres cortos para PAGOS_PASARELA; también acepta 'paquete.modulo:Clase'
+PASARELAS = {
+    'simulada': PasarelaSimulada,
+}
+
+
+def crear_pasarela(config):
+    nombre = config['PAGOS_PASARELA']
+    clase = PASARELAS.get(nombre) or import_string(nombre)
+    return clase.desde_config(config)
+
+
+# ---------- TRANSICIONES ----------
+# Cada cambio de estado es un UPDATE condicionado al estado anterior, así
+# dos workers (o un worker y la recuperación) nunca aplican el mismo paso
+# dos veces: el stock se descuenta solo al pasar de EN_COLA a PROCESANDO y
+# se devuelve solo al pasar de PROCESANDO (o VERIFICANDO) a RECHAZADO o REEMBOLSAR.
+
+def _transicion(metodo_id, desde, hacia, **valores):
+    desde = (desde,) if isinstance(desde, str) else desde
+    resultado = db.session.execute(
+        update(MetodoPago)
+        .where(MetodoPago.id == metodo_id, MetodoPago.estado_pago.in_(desde))
+        .values(estado_pago=hacia, actualizado_en=datetime.utcnow(), **valores)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+
+def _lineas(pedido_id):
+    return db.session.execute(
+        select(DetallePedido.producto_id, DetallePedido.cantidad).where(DetallePedido.pedido_id == pedido_id)
+    ).all()
+
+
+def _rechazar_en_cola(metodo_id, mensaje):
+    _transicion(metodo_id, EN_COLA, RECHAZADO, mensaje=mensaje[:200])
+    db.session.commit()
+
+
+def reclamar(metodo_id):
+    """
+    Pasa el intento a PROCESANDO y reserva el stock del pedido en la misma
+    transacción. Devuelve el Cobro a enviar a la pasarela, o None si otro
+    worker ya lo tomó o el intento se rechazó sin cobrar.
+    """
+    fila = db.session.execute(
+        select(MetodoPago.pedido_id, MetodoPago.clave_idempotencia, MetodoPago.tipo_pago)
+        .where(MetodoPago.id == metodo_id)
+    ).one_or_none()
+    if fila is None:
+        return None
+
+    # En PostgreSQL se bloquea el pedido: dos intentos del mismo pedido se reclaman de a uno
+    pedido = db.session.execute(
+        select(Pedido.estado, Pedido.total).where(Pedido.id == fila.pedido_id).with_for_update()
+    ).one()
+    if not _transicion(metodo_id, EN_COLA, PROCESANDO):
+        db.session.rollback()
+        return None
+
+    otro = db.session.scalar(
+        select(MetodoPago.id).where(
+            MetodoPago.pedido_id == fila.pedido_id,
+            MetodoPago.id != metodo_id,
+            MetodoPago.estado_pago.in_((PROCESANDO, VERIFICANDO, APROBADO)),
+        ).limit(1)
+    )
+    if otro is not None or pedido.estado != 'Pendiente de Pago':
+        db.session.rollback()
+        _rechazar_en_cola(metodo_id, 'Este pedido ya no está pendiente de pago.')
+        return None
+
+    # reservar_stock deshace la transacción (y el reclamo) si algo no alcanza
+    faltantes = reservar_stock(_lineas(fila.pedido_id))
+    if faltantes:
+        nombres = ', '.join(faltante.nombre for faltante in faltantes)
+        _rechazar_en_cola(metodo_id, f'No hay suficiente stock de: {nombres}.')
+        return None
+
+    invalidar_catalogo()
+    db.session.commit()
+    return Cobro(fila.clave_idempotencia, fila.tipo_pago, pedido.total)
+
+
+def finalizar(metodo_id, resultado):
+    """
+    Aplica el resultado de la pasarela a un intento en PROCESANDO o
+    VERIFICANDO: aprobado confirma el pedido y vacía el carrito; rechazado
+    devuelve el stock. El pedido se bloquea y solo se confirma si sigue
+    'Pendiente de Pago': si un admin lo canceló durante el cobro, el
+    intento queda en REEMBOLSAR y se devuelve el stock reservado.
+    Devuelve False si el intento ya no estaba en curso.
+    """
+    pedido_id = db.session.scalar(select(MetodoPago.pedido_id).where(MetodoPago.id == metodo_id))
+    # Mismo orden de bloqueo que reclamar(): primero el pedido, después el intento
+    pedido = db.session.execute(select(Pedido).where(Pedido.id == pedido_id).with_for_update()).scalar_one()
+
+    ahora = datetime.utcnow()
+    en_curso = (PROCESANDO, VERIFICANDO)
+    confirmar = resultado.aprobado and pedido.estado == 'Pendiente de Pago'
+    if confirmar:
+        cambio = _transicion(metodo_id, en_curso, APROBADO, referencia=resultado.referencia, fecha_pago=ahora,
+                             mensaje=None)
+    elif resultado.aprobado:
+        cambio = _transicion(metodo_id, en_curso, REEMBOLSAR, referencia=resultado.referencia, fecha_pago=ahora,
+                             mensaje=MENSAJE_REEMBOLSAR)
+    else:
+        cambio = _transicion(metodo_id, en_curso, RECHAZADO, mensaje=(resultado.mensaje or '')[:200])
+    if not cambio:
+        db.session.rollback()
+        return False
+
+    if confirmar:
+        pedido.estado = 'Confirmado'
+        almacen_carrito.vaciar(pedido.usuario_id)
+    else:
+        liberar_stock(_lineas(pedido.id))
+        invalidar_catalogo()
+        if resultado.aprobado:
+            current_app.logger.warning(
+                'Pago %s aprobado (referencia %s) para el pedido %s en estado %s: reembolsar',
+                metodo_id, resultado.referencia, pedido.id, pedido.estado,
+            )
+    db.session.commit()
+    return True
+
+
+def ultimo_intento(pedido_id):
+    """Intento de pago más reciente del pedido (el que muestra la confirmación)."""
+    return (
+        MetodoPago.query.filter_by(pedido_id=pedido_id)
+        .order_by(MetodoPago.id.desc())
+        .first()
+    )
+
+
+# ---------- SERVICIO ----------
+
+class ColaPagos:
+    """
+    Cola de pagos. La ruta guarda el intento como MetodoPago EN_COLA y
+    responde enseguida; un pool de PAGOS_HILOS hilos lo cobra en la pasarela
+    y la página de confirmación consulta el estado hasta que termina. Los
+    datos de la tarjeta solo viven en memoria hasta el cobro: nunca se
+    guardan. Con PAGOS_HILOS = 0 se cobra dentro de la petición (desarrollo).
+    """
+
+    def __init__(self, app=None):
+        self.hilos = 0
+        self.timeout = 120
+        self.pasarela = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._contadores = {'encolados': 0, 'reintentos': 0, 'aprobados': 0, 'rechazados': 0, 'errores': 0}
+        self._en_curso = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.hilos = app.config['PAGOS_HILOS']
+        self.timeout = app.config['PAGOS_TIMEOUT']
+        self.pasarela = crear_pasarela(app.config)
+        app.extensions['cola_pagos'] = self
+
+    def _obtener_pool(self):
+        # Como en ServicioHash: el pool se crea en el worker que lo usa
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='pagos')
+                self._pid = os.getpid()
+            return self._pool
+
+    def _contar(self, nombre, cantidad=1):
+        with self._lock:
+            self._contadores[nombre] += cantidad
+
+    def estadisticas(self):
+        with self._lock:
+            return {**self._contadores, 'en_curso': self._en_curso}
+
+    def encolar(self, pedido, tipo_pago, clave, datos_publicos, datos_cobro):
+        """
+        Guarda el intento y lo manda a cobrar sin esperar a la pasarela.
+        Si ya hay un intento con la misma clave, o uno en curso o aprobado
+        para el pedido, lo devuelve sin crear otro ni cobrar de nuevo.
+        """
+        clave = clave[:64]
+        previo = (
+            MetodoPago.query.filter(
+                MetodoPago.pedido_id == pedido.id,
+                or_(MetodoPago.clave_idempotencia == clave,
+                    MetodoPago.estado_pago.in_(INTENTOS_VIVOS)),
+            )
+            .order_by(MetodoPago.id.desc())
+            .first()
+        )
+        if previo is not None:
+            self._contar('reintentos')
+            return previo
+
+        metodo = MetodoPago(
+            pedido_id=pedido.id, tipo_pago=tipo_pago, estado_pago=EN_COLA,
+            clave_idempotencia=clave, **datos_publicos,
+        )
+        db.session.add(metodo)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # El mismo formulario llegó dos veces a la vez: vale el primero
+            db.session.rollback()
+            self._contar('reintentos')
+            return MetodoPago.query.filter_by(clave_idempotencia=clave).one()
+
+        self._contar('encolados')
+        if self.hilos:
+            with self._lock:
+                self._en_curso += 1
+            self._obtener_pool().submit(self._procesar_en_hilo, current_app._get_current_object(), metodo.id, datos_cobro)
+        else:
+            self.procesar(metodo.id, datos_cobro)
+        return metodo
+
+    def _procesar_en_hilo(self, app, metodo_id, datos_cobro):
+        try:
+            with app.app_context():
+                try:
+                    self.procesar(metodo_id, datos_cobro)
+                except Exception:
+                    db.session.rollback()
+                    self._contar('errores')
+                    app.logger.exception('Error procesando el pago %s', metodo_id)
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+
+    def procesar(self, metodo_id, datos_cobro):
+        cobro = reclamar(metodo_id)
+        if cobro is None:
+            return
+        # Sin transacción abierta mientras se espera a la pasarela. Si cobrar()
+        # falla, el intento queda en PROCESANDO y recuperar() lo resuelve con la clave.
+        resultado = self.pasarela.cobrar(cobro.clave, cobro.monto, cobro.tipo_pago, datos_cobro)
+        if finalizar(metodo_id, resultado):
+            self._contar('aprobados' if resultado.aprobado else 'rechazados')
+
+    def recuperar(self, pedido_id=None):
+        """
+        Resuelve los intentos sin terminar hace más de PAGOS_TIMEOUT segundos
+        (el proceso que los tenía murió o la pasarela falló): se pregunta a la
+        pasarela por la clave y se aplica su respuesta. Sin respuesta
+        definitiva el intento pasa a VERIFICANDO con el stock reservado y se
+        vuelve a preguntar cada PAGOS_TIMEOUT segundos: un cobro que la
+        pasarela aún no contestó nunca se da por rechazado. Devuelve cuántos
+        resolvió o pasaron a verificación.
+        """
+        limite = datetime.utcnow() - timedelta(seconds=self.timeout)
+        consulta = select(MetodoPago.id, MetodoPago.estado_pago, MetodoPago.clave_idempotencia).where(
+            MetodoPago.estado_pago.in_((EN_COLA, PROCESANDO, VERIFICANDO)),
+            MetodoPago.actualizado_en < limite,
+        )
+        if pedido_id is not None:
+            consulta = consulta.where(MetodoPago.pedido_id == pedido_id)
+
+        resueltos = 0
+        for metodo_id, estado, clave in db.session.execute(consulta).all():
+            if estado == EN_COLA:
+                # Nunca se reclamó, así que no se cobró ni se reservó stock
+                resueltos += _transicion(metodo_id, EN_COLA, RECHAZADO, mensaje=MENSAJE_INTERRUMPIDO)
+                db.session.commit()
+                continue
+            resultado = clave and self.pasarela.consultar(clave)
+            if resultado:
+                resueltos += finalizar(metodo_id, resultado)
+                continue
+            # Sin respuesta todavía: se marca (o se renueva la marca) para volver a preguntar
+            cambio = _transicion(metodo_id, estado, VERIFICANDO, mensaje=MENSAJE_VERIFICANDO)
+            db.session.commit()
+            if estado == PROCESANDO:
+                resueltos += cambio
+                current_app.logger.warning('Pago %s sin respuesta de la pasarela: queda en verificación', metodo_id)
+        return resueltos
+
+
+cola_pagos = ColaPagos()
+
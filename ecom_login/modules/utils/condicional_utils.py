@@ -0,0 +1,146 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+from flask import after_this_request, current_app, g, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+from ...models import (
+    db, Producto, Pedido, DetallePedido, PedidoArchivado, DetallePedidoArchivado,
+)
+
+
+# ---------- VALIDADORES ----------
+# Cada uno es una consulta agregada sobre columnas indexadas: mucho más barata
+# que la consulta principal de la ruta más el render de la plantilla.
+
+def version_catalogo():
+    """(último cambio, cantidad) de productos: cubre altas, cambios, stock y bajas."""
+    return tuple(db.session.execute(select(func.max(Producto.actualizado_en), func.count(Producto.id))).one())
+
+
+def version_mis_pedidos(usuario_id):
+    """(último cambio, cantidad) de los pedidos vivos del usuario; archivar o borrar cambia la cantidad."""
+    return tuple(db.session.execute(
+        select(func.max(Pedido.actualizado_en), func.count(Pedido.id)).where(Pedido.usuario_id == usuario_id)
+    ).one())
+
+
+def version_pedido(pedido_id, usuario_id):
+    """
+    Último cambio del pedido o de alguno de sus productos (la página muestra
+    nombre y precio actuales); None si el pedido no existe o no es del usuario.
+    """
+    for modelo, detalle, marca in (
+        (Pedido, DetallePedido, Pedido.actualizado_en),
+        (PedidoArchivado, DetallePedidoArchivado, PedidoArchivado.archivado_en),
+    ):
+        productos = (
+            select(func.max(Producto.actualizado_en))
+            .join(detalle, detalle.producto_id == Producto.id)
+            .where(detalle.pedido_id == pedido_id)
+            .scalar_subquery()
+        )
+        fila = db.session.execute(
+            select(marca, productos).where(modelo.id == pedido_id, modelo.usuario_id == usuario_id)
+        ).first()
+        if fila is not None:
+            return max((fecha for fecha in fila if fecha is not None), default=datetime.min)
+    return None
+
+
+# ---------- RESPUESTA 304 ----------
+
+def _version_despliegue(app):
+    """Huella de plantillas y estáticos: un despliegue nuevo invalida todos los ETag."""
+    huella = hashlib.sha1()
+    for carpeta in (app.template_folder and os.path.join(app.root_path, app.template_folder), app.static_folder):
+        if not carpeta:
+            continue
+        for raiz, _, archivos in sorted(os.walk(carpeta)):
+            for nombre in sorted(archivos):
+                estado = os.stat(os.path.join(raiz, nombre))
+                huella.update(f'{raiz}/{nombre}:{estado.st_size}:{estado.st_mtime_ns}'.encode())
+    return huella.hexdigest()[:12]
+
+
+class GetCondicional:
+    """
+    ETag y Last-Modified para páginas HTML que dependen del usuario. La ruta
+    calcula su validador con una consulta barata y llama a no_modificado():
+    si el navegador ya tiene esa versión se responde 304 sin ejecutar la
+    consulta principal ni renderizar la plantilla. Los aciertos se cuentan
+    por ruta en las métricas de peticiones (ecom_get_condicional_total).
+    """
+
+    def __init__(self, app=None):
+        self.despliegue = ''
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.despliegue = _version_despliegue(app)
+        app.extensions['get_condicional'] = self
+
+    def _etag(self, partes):
+        # Todo lo del usuario que muestran las páginas (nav, pedidos): cambiar
+        # el nombre o el correo en ajustes cambia el ETag
+        usuario = None
+        if current_user.is_authenticated:
+            usuario = (current_user.id, current_user.rol, current_user.nombre, current_user.correo)
+        clave = repr((self.despliegue, usuario, request.full_path, partes))
+        return hashlib.sha1(clave.encode()).hexdigest()
+
+    def no_modificado(self, *partes, modificado=None):
+        """
+        Respuesta 304 si el If-None-Match (o, sin él, el If-Modified-Since)
+        del navegador coincide con `partes`; si no, None y la respuesta
+        completa de la ruta sale con los mismos validadores. `modificado` es
+        opcional y solo se pasa cuando esa fecha por sí sola cubre todos los
+        cambios de la página (las bajas no cambian un MAX()).
+        """
+        # Una página con mensajes flash se muestra una sola vez: no se valida ni se guarda
+        if session.get('_flashes'):
+            return None
+
+        etag = self._etag(partes)
+        if modificado is not None:
+            # Last-Modified va en segundos enteros: solo se envía cuando ese
+            # segundo ya terminó, así un cambio posterior no puede quedar
+            # dentro del mismo segundo y pasar por no modificado.
+            if datetime.utcnow() - modificado < timedelta(seconds=1):
+                modificado = None
+            else:
+                modificado = modificado.replace(microsecond=0, tzinfo=timezone.utc)
+
+        if request.if_none_match:
+            coincide = request.if_none_match.contains(etag)
+        else:
+            coincide = bool(modificado and request.if_modified_since and modificado <= request.if_modified_since)
+        if 'metricas' in g:
+            g.metricas['condicional'] = coincide
+
+        if coincide:
+            respuesta = current_app.response_class(status=304)
+            return self._validadores(respuesta, etag, modificado)
+
+        @after_this_request
+        def agregar_validadores(respuesta):
+            if respuesta.status_code == 200:
+                self._validadores(respuesta, etag, modificado)
+            return respuesta
+        return None
+
+    @staticmethod
+    def _validadores(respuesta, etag, modificado):
+        respuesta.set_etag(etag)
+        if modificado is not None:
+            respuesta.last_modified = modificado
+        # Privada (depende de la sesión) y siempre revalidada con el servidor
+        respuesta.cache_control.private = True
+        respuesta.cache_control.no_cache = True
+        respuesta.vary.add('Cookie')
+        return respuesta
+
+
+get_condicional = GetCondicional()
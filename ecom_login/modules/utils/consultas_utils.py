@@ -0,0 +1,64 @@
+from flask import current_app
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from ...models import Pedido, DetallePedido, PedidoArchivado, DetallePedidoArchivado
+
+
+# ---------- ESTRATEGIAS DE CARGA POR RUTA ----------
+# Cada ruta declara qué relaciones va a usar su plantilla. Con CARGA_ESTRICTA
+# activo, cualquier otra relación que se toque lanza error en vez de hacer
+# una consulta extra por fila.
+
+def _estricto():
+    return current_app.config['CARGA_ESTRICTA']
+
+
+def carga_listado_pedidos():
+    """admin_pedidos: el cliente de cada pedido llega en el mismo SELECT."""
+    usuario = joinedload(Pedido.usuario)
+    opciones = [usuario]
+    if _estricto():
+        opciones += [raiseload('*'), usuario.raiseload('*')]
+    return opciones
+
+
+def carga_detalle_pedido(con_usuario=False, con_pago=False):
+    """
+    detalle_pedido, admin_detalle_pedido y confirmacion_pago: las líneas del
+    pedido con su producto en una sola consulta adicional (selectin + join).
+    """
+    detalles = selectinload(Pedido.detalles)
+    producto = detalles.joinedload(DetallePedido.producto)
+    opciones = [producto]
+    cerrar = [detalles, producto]
+
+    if con_usuario:
+        usuario = joinedload(Pedido.usuario)
+        opciones.append(usuario)
+        cerrar.append(usuario)
+    if con_pago:
+        pago = selectinload(Pedido.metodo_pago)
+        opciones.append(pago)
+        cerrar.append(pago)
+
+    if _estricto():
+        opciones.append(raiseload('*'))
+        opciones += [opcion.raiseload('*') for opcion in cerrar]
+    return opciones
+
+
+def carga_pedido_archivado(con_usuario=False):
+    """Lo mismo que carga_detalle_pedido para un pedido del archivo."""
+    detalles = selectinload(PedidoArchivado.detalles)
+    producto = detalles.joinedload(DetallePedidoArchivado.producto)
+    opciones = [producto]
+    cerrar = [detalles, producto]
+
+    if con_usuario:
+        usuario = joinedload(PedidoArchivado.usuario)
+        opciones.append(usuario)
+        cerrar.append(usuario)
+
+    if _estricto():
+        opciones.append(raiseload('*'))
+        opciones += [opcion.raiseload('*') for opcion in cerrar]
+    return opciones
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # sin el paquete Brotli solo se generan las variantes .gz
+    brotli = None
+
+
+# Los archivos compilados quedan dentro de la carpeta static, así la ruta
+# /static/ de Flask los sigue sirviendo aunque no haya manifiesto.
+DIRECTORIO = 'dist'
+MANIFIESTO = 'manifiesto.json'
+
+# Solo vale la pena comprimir texto; imágenes y fuentes ya vienen comprimidas
+COMPRIMIBLES = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico'}
+MINIMO_COMPRIMIR = 256
+
+# Codificaciones en orden de preferencia: (Accept-Encoding, extensión)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+_URL_CSS = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+# ---------- COMPILACIÓN ----------
+
+def _huella(datos):
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+
+def _nombre_versionado(ruta, datos):
+    """'css/style.css' -> 'dist/css/style.3f2a9c01b7de.css'"""
+    base, extension = posixpath.splitext(ruta)
+    return posixpath.join(DIRECTORIO, f'{base}.{_huella(datos)}{extension}')
+
+
+def _reescribir_css(ruta, texto, manifiesto):
+    """Cambia los url(...) relativos de una hoja de estilos por los nombres versionados."""
+    carpeta = posixpath.dirname(ruta)
+
+    def reemplazar(coincidencia):
+        comillas, url = coincidencia.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return coincidencia.group(0)
+        ruta_url = re.split(r'[?#]', url, maxsplit=1)[0]
+        sufijo = url[len(ruta_url):]
+        destino = manifiesto.get(posixpath.normpath(posixpath.join(carpeta, ruta_url)))
+        if destino is None:
+            return coincidencia.group(0)
+        # La hoja versionada vive en dist/<carpeta>: la URL se calcula desde ahí
+        relativa = posixpath.relpath(destino['ruta'], posixpath.join(DIRECTORIO, carpeta))
+        return f'url({comillas}{relativa}{sufijo}{comillas})'
+
+    return _URL_CSS.sub(reemplazar, texto)
+
+
+def _comprimir(ruta_destino, datos):
+    """Escribe las variantes .br/.gz que ahorren al menos un 10 %. Devuelve {extensión: bytes}."""
+    variantes = {}
+    candidatos = [('.gz', lambda: gzip.compress(datos, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidatos.insert(0, ('.br', lambda: brotli.compress(datos, quality=11)))
+    for extension, comprimir in candidatos:
+        comprimido = comprimir()
+        if len(comprimido) < len(datos) * 0.9:
+            with open(ruta_destino + extension, 'wb') as archivo:
+                archivo.write(comprimido)
+            variantes[extension] = len(comprimido)
+    return variantes
+
+
+def compilar_estaticos(carpeta):
+    """
+    Copia cada archivo de `carpeta` (la carpeta static) a dist/ con el hash
+    de su contenido en el nombre, escribe junto a los de texto sus variantes
+    gzip y brotli y deja en dist/manifiesto.json la correspondencia
+    'css/style.css' -> 'dist/css/style.<hash>.css'. Las hojas de estilos se
+    procesan al final para apuntar sus url(...) a los nombres versionados.
+    Devuelve el manifiesto.
+    """
+    destino_raiz = os.path.join(carpeta, DIRECTORIO)
+    shutil.rmtree(destino_raiz, ignore_errors=True)
+
+    rutas = []
+    for raiz, directorios, archivos in os.walk(carpeta):
+        if raiz == carpeta and DIRECTORIO in directorios:
+            directorios.remove(DIRECTORIO)
+        for nombre in archivos:
+            rutas.append(os.path.relpath(os.path.join(raiz, nombre), carpeta).replace(os.sep, '/'))
+    rutas.sort(key=lambda ruta: (ruta.endswith('.css'), ruta))
+
+    manifiesto = {}
+    for ruta in rutas:
+        with open(os.path.join(carpeta, ruta), 'rb') as archivo:
+            datos = archivo.read()
+        if ruta.endswith('.css'):
+            datos = _reescribir_css(ruta, datos.decode('utf-8'), manifiesto).encode('utf-8')
+
+        versionado = _nombre_versionado(ruta, datos)
+        ruta_destino = os.path.join(carpeta, versionado)
+        os.makedirs(os.path.dirname(ruta_destino), exist_ok=True)
+        with open(ruta_destino, 'wb') as archivo:
+            archivo.write(datos)
+
+        variantes = {}
+        if posixpath.splitext(ruta)[1].lower() in COMPRIMIBLES and len(datos) >= MINIMO_COMPRIMIR:
+            variantes = _comprimir(ruta_destino, datos)
+        manifiesto[ruta] = {'ruta': versionado, 'bytes': len(datos), 'variantes': variantes}
+
+    with open(os.path.join(destino_raiz, MANIFIESTO), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=1, sort_keys=True)
+    return manifiesto
+
+
+# ---------- URLS Y SERVICIO ----------
+
+class Estaticos:
+    """
+    Sirve los estáticos compilados con `flask compilar-estaticos`:
+    url_for('static', filename='css/style.css') devuelve el nombre con hash
+    y la ruta /static/ entrega la variante .br o .gz que acepte el
+    navegador, con caché de un año marcada immutable (un cambio de contenido
+    es otra URL). Sin manifiesto, o para archivos modificados después de
+    compilar, todo sigue como siempre: nombre plano y sin comprimir.
+    """
+
+    def __init__(self, app=None):
+        self.urls = {}
+        self.versionados = {}
+        self.max_age = 365 * 24 * 3600
+        self._servir_original = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.has_static_folder or not app.config['ESTATICOS_VERSIONADOS']:
+            return
+        self.max_age = app.config['ESTATICOS_MAX_AGE']
+        self.cargar(app)
+        self._servir_original = app.view_functions['static']
+        app.view_functions['static'] = self.servir
+        app.url_defaults(self._versionar)
+        app.extensions['estaticos'] = self
+
+    def cargar(self, app):
+        """Lee el manifiesto; descarta las entradas cuyo original cambió después de compilar."""
+        ruta_manifiesto = os.path.join(app.static_folder, DIRECTORIO, MANIFIESTO)
+        try:
+            with open(ruta_manifiesto, encoding='utf-8') as archivo:
+                manifiesto = json.load(archivo)
+            compilado = os.path.getmtime(ruta_manifiesto)
+        except FileNotFoundError:
+            manifiesto, compilado = {}, 0
+
+        urls, versionados, viejos = {}, {}, []
+        for ruta, entrada in manifiesto.items():
+            original = os.path.join(app.static_folder, ruta)
+            if not os.path.exists(original) or os.path.getmtime(original) > compilado:
+                viejos.append(ruta)
+                continue
+            urls[ruta] = entrada['ruta']
+            versionados[entrada['ruta']] = (ruta, entrada['variantes'])
+        if viejos:
+            app.logger.warning(
+                'Estáticos modificados después de compilar (se sirven sin versionar): %s. '
+                'Ejecutar `flask compilar-estaticos`.', ', '.join(sorted(viejos))
+            )
+        self.urls, self.versionados = urls, versionados
+
+    def _versionar(self, endpoint, valores):
+        if endpoint == 'static':
+            versionado = self.urls.get(valores.get('filename'))
+            if versionado is not None:
+                valores['filename'] = versionado
+
+    def servir(self, filename):
+        entrada = self.versionados.get(filename)
+        if entrada is None:
+            return self._servir_original(filename=filename)
+
+        original, variantes = entrada
+        mimetype = mimetypes.guess_type(original)[0] or 'application/octet-stream'
+        codificacion, nombre = None, filename
+        for aceptada, extension in CODIFICACIONES:
+            if extension in variantes and request.accept_encodings[aceptada]:
+                codificacion, nombre = aceptada, filename + extension
+                break
+
+        respuesta = send_from_directory(current_app.static_folder, nombre, mimetype=mimetype, max_age=self.max_age)
+        if codificacion:
+            respuesta.headers['Content-Encoding'] = codificacion
+        respuesta.vary.add('Accept-Encoding')
+        respuesta.cache_control.public = True
+        respuesta.cache_control.immutable = True
+        return respuesta
+
+
+estaticos = Estaticos()
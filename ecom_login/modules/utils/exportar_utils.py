@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import select
+from ...models import db, Pedido, DetallePedido, MetodoPago, Producto, Usuario
+
+
+# Una fila por línea de pedido, con los datos del pedido y de su pago repetidos.
+# Los números de tarjeta y documento no se exportan.
+COLUMNAS = [
+    ('pedido_id', Pedido.id),
+    ('fecha', Pedido.fecha),
+    ('estado', Pedido.estado),
+    ('total', Pedido.total),
+    ('cliente', Usuario.correo),
+    ('linea_id', DetallePedido.id),
+    ('producto_id', DetallePedido.producto_id),
+    ('producto', Producto.nombre),
+    ('cantidad', DetallePedido.cantidad),
+    ('precio', DetallePedido.precio),
+    ('subtotal', DetallePedido.subtotal),
+    ('tipo_pago', MetodoPago.tipo_pago),
+    ('estado_pago', MetodoPago.estado_pago),
+    ('banco', MetodoPago.banco),
+    ('fecha_pago', MetodoPago.fecha_pago),
+]
+ENCABEZADOS = [nombre for nombre, _ in COLUMNAS]
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def consulta_exportacion(filtros):
+    """SELECT de las líneas de pedido filtradas, en orden de pedido y línea."""
+    return (
+        select(*(columna.label(nombre) for nombre, columna in COLUMNAS))
+        .select_from(DetallePedido)
+        .join(Pedido, Pedido.id == DetallePedido.pedido_id)
+        .join(Usuario, Usuario.id == Pedido.usuario_id)
+        .outerjoin(Producto, Producto.id == DetallePedido.producto_id)
+        .outerjoin(MetodoPago, MetodoPago.pedido_id == Pedido.id)
+        .where(*filtros.condiciones())
+        .order_by(Pedido.id, DetallePedido.id)
+    )
+
+
+def filas_exportacion(filtros):
+    """
+    Itera las filas con un cursor del lado del servidor (yield_per): en
+    PostgreSQL se piden de a EXPORTAR_LOTE filas, así que la memoria no
+    depende del tamaño de la exportación.
+    """
+    lote = current_app.config['EXPORTAR_LOTE']
+    resultado = db.session.execute(
+        consulta_exportacion(filtros).execution_options(yield_per=lote)
+    )
+    for particion in resultado.partitions():
+        yield particion
+
+
+def _texto(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def generar_csv(filtros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(ENCABEZADOS)
+    for particion in filas_exportacion(filtros):
+        escritor.writerows([[_texto(valor) for valor in fila] for fila in particion])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generar_jsonl(filtros):
+    for particion in filas_exportacion(filtros):
+        yield ''.join(
+            json.dumps(dict(zip(ENCABEZADOS, fila)), default=_texto, ensure_ascii=False) + '\n'
+            for fila in particion
+        )
+
+
+GENERADORES = {
+    'csv': generar_csv,
+    'jsonl': generar_jsonl,
+}
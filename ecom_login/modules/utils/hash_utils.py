@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashSaturado(Exception):
+    """La cola de hashing está llena: se rechaza la petición en lugar de esperar."""
+
+
+# Funciones que corren en los procesos del pool (deben poder importarse)
+def _hashear(contrasena, metodo):
+    return generate_password_hash(contrasena, method=metodo)
+
+
+def _verificar(hash_guardado, contrasena):
+    return check_password_hash(hash_guardado, contrasena)
+
+
+# ---------- SERVICIO DE HASHING ----------
+
+class ServicioHash:
+    """
+    Hashing de contraseñas con algoritmo y costo configurables, ejecutado en
+    un pool de procesos acotado. Como mucho HASH_COLA_MAX operaciones por
+    worker pueden estar en curso o esperando; la siguiente se rechaza al
+    instante con HashSaturado. El límite cuenta hilos de la petición, así que
+    solo tiene efecto con workers de varios hilos (gthread en
+    gunicorn.conf.py): una ráfaga de logins ocupa a lo sumo HASH_COLA_MAX
+    hilos de cada worker y los demás siguen sirviendo el resto de rutas.
+    Con HASH_PROCESOS = 0 se hashea en el mismo hilo (desarrollo).
+    """
+
+    def __init__(self, app=None):
+        self.metodo = 'scrypt'
+        self.procesos = 0
+        self._cupos = None
+        self._pool = None
+        self._pid = None
+        self._metodo_efectivo = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.metodo = app.config['HASH_METODO']
+        self.procesos = app.config['HASH_PROCESOS']
+        self._cupos = threading.BoundedSemaphore(app.config['HASH_COLA_MAX'])
+        self._metodo_efectivo = None
+        app.extensions['servicio_hash'] = self
+
+    def _obtener_pool(self):
+        # El pool se crea en el worker que lo usa, nunca en el padre de gunicorn
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def _ejecutar(self, funcion, *args):
+        if not self.procesos:
+            return funcion(*args)
+        if not self._cupos.acquire(blocking=False):
+            raise HashSaturado()
+        try:
+            return self._obtener_pool().submit(funcion, *args).result()
+        finally:
+            self._cupos.release()
+
+    def hashear(self, contrasena):
+        return self._ejecutar(_hashear, contrasena, self.metodo)
+
+    def verificar(self, hash_guardado, contrasena):
+        """Devuelve (es_valida, necesita_rehash)."""
+        valida = self._ejecutar(_verificar, hash_guardado, contrasena)
+        return valida, valida and self.necesita_rehash(hash_guardado)
+
+    def necesita_rehash(self, hash_guardado):
+        """True si el hash se generó con otro algoritmo o costo que el configurado."""
+        if self._metodo_efectivo is None:
+            # 'pbkdf2:sha256' y 'pbkdf2:sha256:1000000' son el mismo método:
+            # se normaliza con el prefijo de un hash real
+            self._metodo_efectivo = self._ejecutar(_hashear, '', self.metodo).split('$', 1)[0]
+        return hash_guardado.split('$', 1)[0] != self._metodo_efectivo
+
+
+servicio_hash = ServicioHash()
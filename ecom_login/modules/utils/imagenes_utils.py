@@ -0,0 +1,287 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import urllib.request
+
+from flask import current_app, url_for
+from sqlalchemy import select, update
+from ...models import db, Producto
+from .cache_utils import invalidar_catalogo
+from .tareas_utils import TareaPeriodica
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # sin Pillow las imágenes se muestran como antes, sin miniaturas
+    Image = None
+
+
+# formato en la URL -> (formato de Pillow, tipo MIME)
+FORMATOS = {'webp': ('WEBP', 'image/webp'), 'jpg': ('JPEG', 'image/jpeg')}
+
+_CLAVE = re.compile(r'^[0-9a-f]{32}$')
+
+
+# ---------- LECTURA DE LA IMAGEN ORIGINAL ----------
+
+def leer_original(imagen, max_bytes, timeout):
+    """
+    Bytes de la imagen de un producto: una URL http(s) o una ruta dentro de
+    la carpeta static ('img/x.png' o '/static/img/x.png'). ValueError si no
+    se puede leer.
+    """
+    if imagen.startswith(('http://', 'https://')):
+        peticion = urllib.request.Request(imagen, headers={'User-Agent': 'ecom-login-imagenes'})
+        try:
+            with urllib.request.urlopen(peticion, timeout=timeout) as respuesta:
+                datos = respuesta.read(max_bytes + 1)
+        except (OSError, ValueError) as e:
+            raise ValueError(f'No se pudo descargar la imagen: {e}') from None
+    else:
+        carpeta = os.path.realpath(current_app.static_folder)
+        relativa = imagen.removeprefix(current_app.static_url_path + '/').lstrip('/')
+        ruta = os.path.realpath(os.path.join(carpeta, relativa))
+        if not ruta.startswith(carpeta + os.sep) or not os.path.isfile(ruta):
+            raise ValueError('La imagen debe ser una URL http(s) o un archivo de la carpeta static.')
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read(max_bytes + 1)
+
+    if len(datos) > max_bytes:
+        raise ValueError(f'La imagen supera los {max_bytes // (1024 * 1024)} MB.')
+    return datos
+
+
+def _abrir(datos):
+    """Imagen de Pillow ya rotada según EXIF; ValueError si no es una imagen válida."""
+    try:
+        imagen = Image.open(io.BytesIO(datos))
+        imagen.load()
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError('El archivo no es una imagen válida.') from None
+    return ImageOps.exif_transpose(imagen)
+
+
+# ---------- MINIATURAS ----------
+
+class ImagenesProductos:
+    """
+    Miniaturas de las imágenes de productos. Al crear o editar un producto
+    su imagen se descarga una vez, se guarda en IMAGENES_DIR bajo el hash de
+    su contenido y se generan variantes WebP y JPEG de IMAGENES_ANCHOS px de
+    ancho (nunca más anchas que el original). Las URLs llevan ese hash, así
+    que se sirven con caché de un año. Si falta una variante en el disco (otra
+    máquina, caché borrada, anchos nuevos) se genera al pedirla.
+    """
+
+    def __init__(self, app=None):
+        self.directorio = None
+        self.anchos = (320, 480, 640, 960)
+        self._tarea = TareaPeriodica('imagenes-productos', self._periodica)
+        self._lock = threading.Lock()
+        self._contadores = {'procesadas': 0, 'errores': 0, 'variantes': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directorio = app.config['IMAGENES_DIR']
+        self.anchos = tuple(sorted(app.config['IMAGENES_ANCHOS']))
+        self.calidad = app.config['IMAGENES_CALIDAD']
+        self.max_bytes = app.config['IMAGENES_MAX_BYTES']
+        self.timeout = app.config['IMAGENES_TIMEOUT']
+        self.max_age = app.config['IMAGENES_MAX_AGE']
+        self.lote = app.config['IMAGENES_LOTE']
+        self._tarea.init_app(app, app.config['IMAGENES_INTERVALO'])
+        app.add_template_global(self.srcset, 'imagen_srcset')
+        app.add_template_global(self.src, 'imagen_src')
+        app.extensions['imagenes_productos'] = self
+
+    @property
+    def disponible(self):
+        return Image is not None
+
+    def _ruta(self, clave, nombre):
+        return os.path.join(self.directorio, clave[:2], clave, nombre)
+
+    def anchos_de(self, ancho_original):
+        """Anchos de las variantes: los configurados menores que el original y, si cabe, el original."""
+        anchos = [ancho for ancho in self.anchos if ancho < ancho_original]
+        if ancho_original <= self.anchos[-1]:
+            anchos.append(ancho_original)
+        return anchos
+
+    def _escribir(self, ruta, escribir):
+        """Escritura atómica: nunca se sirve una variante a medio escribir."""
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                escribir(archivo)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    def _generar(self, imagen, clave, ancho, formato):
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        reducida = imagen.resize((ancho, alto), Image.Resampling.LANCZOS) if ancho != imagen.width else imagen
+        if formato == 'jpg' or reducida.mode not in ('RGB', 'RGBA'):
+            # JPEG no tiene transparencia: se aplana sobre blanco
+            if reducida.mode in ('RGBA', 'LA', 'P'):
+                fondo = Image.new('RGB', reducida.size, 'white')
+                fondo.paste(reducida.convert('RGBA'), mask=reducida.convert('RGBA').getchannel('A'))
+                reducida = fondo
+            else:
+                reducida = reducida.convert('RGB')
+        opciones = {'quality': self.calidad}
+        if formato == 'jpg':
+            opciones.update(optimize=True, progressive=True)
+        else:
+            opciones.update(method=4)
+        ruta = self._ruta(clave, f'{ancho}.{formato}')
+        self._escribir(ruta, lambda archivo: reducida.save(archivo, FORMATOS[formato][0], **opciones))
+        with self._lock:
+            self._contadores['variantes'] += 1
+        return ruta
+
+    def procesar(self, imagen):
+        """
+        Descarga `imagen`, la guarda bajo el hash de su contenido y genera
+        todas sus variantes. Devuelve {'imagen_clave', 'imagen_ancho'} para
+        guardar en el producto; ValueError si no se puede procesar.
+        """
+        datos = leer_original(imagen, self.max_bytes, self.timeout)
+        clave = hashlib.sha256(datos).hexdigest()[:32]
+        original = _abrir(datos)
+        for ancho in self.anchos_de(original.width):
+            for formato in FORMATOS:
+                if not os.path.exists(self._ruta(clave, f'{ancho}.{formato}')):
+                    self._generar(original, clave, ancho, formato)
+        ruta_original = self._ruta(clave, 'original')
+        if not os.path.exists(ruta_original):
+            self._escribir(ruta_original, lambda archivo: archivo.write(datos))
+        with self._lock:
+            self._contadores['procesadas'] += 1
+        return {'imagen_clave': clave, 'imagen_ancho': original.width}
+
+    def valores_para(self, imagen, anterior=None):
+        """
+        Columnas de miniatura para un producto nuevo o editado. Si la imagen
+        no cambió (y ya tiene miniaturas) se conservan las del producto; si no
+        se puede procesar se marca con clave '' y se devuelve el motivo para
+        avisar al admin.
+        """
+        if anterior is not None and anterior.imagen == imagen and anterior.imagen_clave:
+            return {}, None
+        if not imagen or not self.disponible:
+            return {'imagen_clave': None, 'imagen_ancho': None}, None
+        try:
+            return self.procesar(imagen), None
+        except ValueError as e:
+            with self._lock:
+                self._contadores['errores'] += 1
+            return {'imagen_clave': '', 'imagen_ancho': None}, str(e)
+
+    def variante(self, clave, ancho, formato):
+        """Ruta en disco de una variante, generándola si falta; None si no corresponde a ninguna."""
+        if not _CLAVE.match(clave) or formato not in FORMATOS or ancho > self.anchos[-1]:
+            return None
+        ruta = self._ruta(clave, f'{ancho}.{formato}')
+        if os.path.exists(ruta):
+            return ruta
+        if not self.disponible:
+            return None
+
+        datos = self._original(clave)
+        if datos is None:
+            return None
+        original = _abrir(datos)
+        if ancho not in self.anchos_de(original.width):
+            return None
+        return self._generar(original, clave, ancho, formato)
+
+    def _original(self, clave):
+        """Bytes de la imagen original: del disco o, en una máquina nueva, descargándola otra vez."""
+        ruta = self._ruta(clave, 'original')
+        if os.path.exists(ruta):
+            with open(ruta, 'rb') as archivo:
+                return archivo.read()
+        imagen = db.session.scalar(select(Producto.imagen).where(Producto.imagen_clave == clave).limit(1))
+        if not imagen:
+            return None
+        try:
+            datos = leer_original(imagen, self.max_bytes, self.timeout)
+        except ValueError:
+            return None
+        # La imagen en la URL pudo cambiar: solo vale si es la misma
+        if hashlib.sha256(datos).hexdigest()[:32] != clave:
+            return None
+        self._escribir(ruta, lambda archivo: archivo.write(datos))
+        return datos
+
+    # ---------- URLS PARA LAS PLANTILLAS ----------
+
+    def _url(self, producto, ancho, formato):
+        return url_for('tienda.imagen_producto', clave=producto.imagen_clave, ancho=ancho, formato=formato)
+
+    def srcset(self, producto, formato):
+        """'url 320w, url 480w, ...' para el atributo srcset."""
+        return ', '.join(
+            f'{self._url(producto, ancho, formato)} {ancho}w' for ancho in self.anchos_de(producto.imagen_ancho)
+        )
+
+    def src(self, producto, ancho, formato='jpg'):
+        """URL de la variante más chica que cubre `ancho` (o la más grande que haya)."""
+        anchos = self.anchos_de(producto.imagen_ancho)
+        elegido = next((a for a in anchos if a >= ancho), anchos[-1])
+        return self._url(producto, elegido, formato)
+
+    # ---------- IMÁGENES SIN PROCESAR ----------
+
+    def procesar_pendientes(self, max_lotes=None):
+        """
+        Genera las miniaturas de los productos con imagen y sin clave (los
+        importados o anteriores a las miniaturas), de a IMAGENES_LOTE por
+        transacción. Devuelve {'lotes', 'procesadas', 'errores'}.
+        """
+        total = {'lotes': 0, 'procesadas': 0, 'errores': 0}
+        if not self.disponible:
+            return total
+        ultimo = 0
+        while max_lotes is None or total['lotes'] < max_lotes:
+            pendientes = db.session.execute(
+                select(Producto.id, Producto.imagen)
+                .where(Producto.id > ultimo, Producto.imagen_clave.is_(None), Producto.imagen != '')
+                .order_by(Producto.id)
+                .limit(self.lote)
+            ).all()
+            # Las descargas van fuera de la transacción
+            db.session.rollback()
+            if not pendientes:
+                break
+            for producto_id, imagen in pendientes:
+                valores, error = self.valores_para(imagen)
+                total['errores' if error else 'procesadas'] += 1
+                # Solo si la imagen no cambió mientras tanto
+                db.session.execute(
+                    update(Producto).where(Producto.id == producto_id, Producto.imagen == imagen).values(**valores)
+                    .execution_options(synchronize_session=False)
+                )
+            invalidar_catalogo()
+            db.session.commit()
+            total['lotes'] += 1
+            ultimo = pendientes[-1].id
+        return total
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def _periodica(self):
+        total = self.procesar_pendientes()
+        if total['procesadas'] or total['errores']:
+            current_app.logger.info('Imágenes de productos procesadas: %s', total)
+
+
+imagenes_productos = ImagenesProductos()
@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+from ...models import db, Producto
+from .cache_utils import invalidar_catalogo
+from .productos_utils import validar_producto
+
+
+# Columnas que se leen del archivo; el resto se ignora
+CAMPOS_IMPORTACION = ('id', 'nombre', 'descripcion', 'precio', 'stock', 'imagen')
+
+EXTENSIONES = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Errores que se guardan en el informe; del resto solo se cuentan
+MAX_ERRORES_INFORME = 1000
+
+
+def formato_de_archivo(nombre, formato=None):
+    """'csv' o 'jsonl' según el formato pedido o la extensión; None si no se reconoce."""
+    if formato in EXTENSIONES.values():
+        return formato
+    return EXTENSIONES.get(os.path.splitext(nombre or '')[1].lower())
+
+
+# ---------- LECTURA ----------
+
+def leer_filas(flujo, formato):
+    """
+    Itera (linea, datos) sobre un archivo de texto. En CSV una celda vacía
+    cuenta como campo ausente, así una hoja de stock puede traer solo id y
+    stock. En JSON-lines datos es None si la línea no es un objeto.
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(flujo)
+        for fila in lector:
+            yield lector.line_num, {
+                campo.strip(): valor for campo, valor in fila.items()
+                if campo and valor not in (None, '')
+            }
+        return
+
+    for linea, texto in enumerate(flujo, 1):
+        if not texto.strip():
+            continue
+        try:
+            datos = json.loads(texto)
+        except ValueError:
+            datos = None
+        yield linea, datos if isinstance(datos, dict) else None
+
+
+# ---------- IMPORTACIÓN ----------
+
+class InformeImportacion:
+    """Resultado de una importación: contadores y errores por línea."""
+
+    def __init__(self):
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+        self.errores_omitidos = 0
+
+    @property
+    def total_errores(self):
+        return len(self.errores) + self.errores_omitidos
+
+    def error(self, linea, mensaje):
+        if len(self.errores) < MAX_ERRORES_INFORME:
+            self.errores.append((linea, mensaje))
+        else:
+            self.errores_omitidos += 1
+
+    def como_dict(self):
+        return {
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'total_errores': self.total_errores,
+            'errores': [{'linea': linea, 'error': mensaje} for linea, mensaje in self.errores],
+        }
+
+
+def _preparar(linea, datos, informe):
+    """(id, valores) de una fila válida; None (y el error anotado) si no lo es."""
+    if datos is None:
+        informe.error(linea, 'La línea no es un objeto JSON válido.')
+        return None
+    datos = {campo: valor for campo, valor in datos.items() if campo in CAMPOS_IMPORTACION}
+
+    producto_id = datos.pop('id', None)
+    if producto_id is not None:
+        try:
+            producto_id = int(producto_id)
+        except (TypeError, ValueError):
+            informe.error(linea, 'El id debe ser un número entero.')
+            return None
+
+    # Con id se actualizan solo las columnas presentes; sin id se crea el producto
+    try:
+        valores = validar_producto(datos, parcial=producto_id is not None)
+    except ValueError as e:
+        informe.error(linea, str(e))
+        return None
+    if not valores:
+        informe.error(linea, 'La fila no tiene campos para actualizar.')
+        return None
+    return producto_id, valores
+
+
+def _aplicar_lote(lote, informe):
+    nuevos = [valores for _, producto_id, valores in lote if producto_id is None]
+    cambios = [(linea, producto_id, valores) for linea, producto_id, valores in lote if producto_id is not None]
+
+    existentes = {}
+    if cambios:
+        existentes = dict(db.session.execute(
+            select(Producto.id, Producto.imagen).where(Producto.id.in_({producto_id for _, producto_id, _ in cambios}))
+        ).all())
+    actualizaciones = []
+    for linea, producto_id, valores in cambios:
+        if producto_id in existentes:
+            # Imagen nueva: sus miniaturas se generan después (flask procesar-imagenes)
+            if 'imagen' in valores and valores['imagen'] != existentes[producto_id]:
+                valores = {**valores, 'imagen_clave': None, 'imagen_ancho': None}
+            actualizaciones.append({'id': producto_id, **valores})
+        else:
+            informe.error(linea, f'El producto {producto_id} no existe.')
+
+    # Un INSERT y un UPDATE por clave primaria (executemany) por lote;
+    # el ORM agrupa las actualizaciones que traen las mismas columnas.
+    if nuevos:
+        db.session.execute(insert(Producto), nuevos)
+    if actualizaciones:
+        db.session.execute(update(Producto), actualizaciones)
+    informe.creados += len(nuevos)
+    informe.actualizados += len(actualizaciones)
+
+
+def importar_productos(filas, lote=None):
+    """
+    Valida e inserta/actualiza productos desde leer_filas() con las reglas de
+    validar_producto. Las filas inválidas se anotan en el informe y no se
+    escriben. Todo queda en la transacción de la sesión: no hace commit (el
+    llamador decide si confirmar o deshacer) y la caché del catálogo se
+    invalida una sola vez al confirmar.
+    """
+    lote = lote or current_app.config['IMPORTAR_LOTE']
+    informe = InformeImportacion()
+    pendientes = []
+    for linea, datos in filas:
+        preparada = _preparar(linea, datos, informe)
+        if preparada is None:
+            continue
+        pendientes.append((linea, *preparada))
+        if len(pendientes) >= lote:
+            _aplicar_lote(pendientes, informe)
+            pendientes = []
+    if pendientes:
+        _aplicar_lote(pendientes, informe)
+    # Los ids inexistentes se detectan al aplicar el lote: ordenar por línea
+    informe.errores.sort()
+
+    if informe.creados or informe.actualizados:
+        invalidar_catalogo()
+    return informe
@@ -0,0 +1,108 @@
+from sqlalchemy import func, select, text
+from ...models import db, Producto, Pedido, DetallePedido, MetodoPago, CarritoItem, PedidoArchivado, DetallePedidoArchivado
+
+
+# ---------- VERIFICACIÓN DE ÍNDICES CON EXPLAIN ----------
+# Cada consulta caliente con el índice que debería usar. Los valores de los
+# parámetros no importan: solo se pide el plan, no se ejecuta la consulta.
+
+CONSULTAS_CALIENTES = [
+    (
+        'agregar_carrito',
+        'uq_carrito_items_usuario_producto',
+        select(CarritoItem).where(CarritoItem.usuario_id == 1, CarritoItem.producto_id == 1),
+    ),
+    (
+        'version_catalogo',
+        'ix_productos_actualizado_en',
+        select(func.max(Producto.actualizado_en), func.count(Producto.id)),
+    ),
+    (
+        'mis_pedidos',
+        'ix_pedidos_usuario_fecha',
+        select(Pedido).where(Pedido.usuario_id == 1)
+        .order_by(Pedido.fecha.desc(), Pedido.id.desc()).limit(51),
+    ),
+    (
+        'mis_pedidos_archivo',
+        'ix_pedidos_archivados_usuario_fecha',
+        select(PedidoArchivado).where(PedidoArchivado.usuario_id == 1)
+        .order_by(PedidoArchivado.fecha.desc(), PedidoArchivado.id.desc()).limit(51),
+    ),
+    (
+        'admin_pedidos',
+        'ix_pedidos_fecha_id',
+        select(Pedido).order_by(Pedido.fecha.desc(), Pedido.id.desc()).limit(51),
+    ),
+    (
+        'admin_pedidos_estado',
+        'ix_pedidos_estado_fecha_id',
+        select(Pedido).where(Pedido.estado == 'Confirmado')
+        .order_by(Pedido.fecha.desc(), Pedido.id.desc()).limit(51),
+    ),
+    (
+        'admin_pedidos_total',
+        'ix_pedidos_total_id',
+        select(Pedido).order_by(Pedido.total.desc(), Pedido.id.desc()).limit(51),
+    ),
+    (
+        'admin_pedidos_estado_total',
+        'ix_pedidos_estado_total_id',
+        select(Pedido).where(Pedido.estado == 'Confirmado')
+        .order_by(Pedido.total.desc(), Pedido.id.desc()).limit(51),
+    ),
+    (
+        'detalle_pedido',
+        'ix_detalles_pedido_pedido_id',
+        select(DetallePedido).where(DetallePedido.pedido_id == 1),
+    ),
+    (
+        'detalle_pedido_archivo',
+        'ix_detalles_pedido_archivados_pedido_id',
+        select(DetallePedidoArchivado).where(DetallePedidoArchivado.pedido_id == 1),
+    ),
+    (
+        'confirmacion_pago',
+        'ix_metodos_pago_pedido_id',
+        select(MetodoPago).where(MetodoPago.pedido_id == 1),
+    ),
+    (
+        'pago_idempotencia',
+        'ux_metodos_pago_clave',
+        select(MetodoPago).where(MetodoPago.clave_idempotencia == 'x'),
+    ),
+    (
+        'recuperar_pagos',
+        'ix_metodos_pago_estado_actualizado',
+        select(MetodoPago.id).where(MetodoPago.estado_pago == 'Procesando', MetodoPago.actualizado_en < '2000-01-01'),
+    ),
+]
+
+
+def plan_de_consulta(conexion, consulta):
+    """Devuelve el plan de ejecución como texto (SQLite o PostgreSQL)."""
+    sql = str(consulta.compile(dialect=conexion.dialect, compile_kwargs={'literal_binds': True}))
+    if conexion.dialect.name == 'sqlite':
+        filas = conexion.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+        return '\n'.join(fila[-1] for fila in filas)
+    filas = conexion.execute(text(f'EXPLAIN {sql}')).all()
+    return '\n'.join(fila[0] for fila in filas)
+
+
+def verificar_indices():
+    """
+    Pide el plan de cada consulta caliente y comprueba que use su índice.
+    En PostgreSQL se desactiva el seq scan dentro de la transacción para que
+    unas tablas pequeñas (desarrollo) no oculten un índice que falta.
+    Devuelve una lista de (ruta, índice, usa_indice, plan).
+    """
+    resultados = []
+    with db.engine.connect() as conexion:
+        with conexion.begin() as transaccion:
+            if conexion.dialect.name == 'postgresql':
+                conexion.execute(text('SET LOCAL enable_seqscan = off'))
+            for ruta, indice, consulta in CONSULTAS_CALIENTES:
+                plan = plan_de_consulta(conexion, consulta)
+                resultados.append((ruta, indice, indice in plan, plan))
+            transaccion.rollback()
+    return resultados
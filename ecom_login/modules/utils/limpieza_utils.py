@@ -0,0 +1,121 @@
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, exists, select
+from ...models import db, Pedido, DetallePedido, MetodoPago
+from .cola_pagos_utils import cola_pagos, INTENTOS_VIVOS
+from .pedidos_utils import PENDIENTE_DE_PAGO
+from .tareas_utils import TareaPeriodica
+from .ventas_utils import DeltasVentas
+
+
+# ---------- LIMPIEZA DE PEDIDOS ABANDONADOS ----------
+
+def _abandonados(limite):
+    """Condiciones de un pedido abandonado: pendiente, viejo y sin intento de pago vivo."""
+    intento_vivo = exists().where(
+        MetodoPago.pedido_id == Pedido.id,
+        MetodoPago.estado_pago.in_(INTENTOS_VIVOS),
+    )
+    return (Pedido.estado == PENDIENTE_DE_PAGO, Pedido.fecha < limite, ~intento_vivo)
+
+
+def borrar_lote(limite, tamano):
+    """
+    Borra hasta `tamano` pedidos abandonados con sus líneas y sus intentos de
+    pago rechazados, en una transacción corta. Devuelve las filas borradas
+    por tabla. En PostgreSQL los pedidos se toman con SKIP LOCKED, así que
+    dos limpiadores (o un checkout que reutiliza el pedido) no se esperan.
+    """
+    condiciones = _abandonados(limite)
+    ids = db.session.scalars(
+        select(Pedido.id).where(*condiciones)
+        .order_by(Pedido.fecha)
+        .limit(tamano)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.session.rollback()
+        return {'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0}
+
+    # Se repiten las condiciones por si el pedido cambió desde la selección (SQLite)
+    vivos = select(Pedido.id).where(Pedido.id.in_(ids), *condiciones)
+    metodos = db.session.execute(
+        delete(MetodoPago).where(MetodoPago.pedido_id.in_(vivos))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    detalles = db.session.execute(
+        delete(DetallePedido).where(DetallePedido.pedido_id.in_(vivos))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    pedidos = db.session.execute(
+        delete(Pedido).where(Pedido.id.in_(ids), *condiciones)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # Borrado con Core: el resumen de pedidos por estado se ajusta a mano
+    deltas = DeltasVentas()
+    deltas.estados[PENDIENTE_DE_PAGO] -= pedidos
+    deltas.aplicar(db.session.connection())
+    db.session.commit()
+    return {'pedidos': pedidos, 'detalles_pedido': detalles, 'metodos_pago': metodos}
+
+
+class LimpiadorPedidos:
+    """
+    Borra los pedidos 'Pendiente de Pago' sin actividad hace más de
+    PEDIDOS_PENDIENTES_TTL_HORAS, de a PEDIDOS_LIMPIEZA_LOTE por transacción.
+    Por defecto solo corre con `flask limpiar-pedidos`, desde una única tarea
+    programada (cron); con PEDIDOS_LIMPIEZA_INTERVALO > 0 corre además cada
+    tantos segundos en un hilo de cada worker. Antes de limpiar resuelve los
+    pagos interrumpidos, que si no dejarían el pedido vivo.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = timedelta(hours=24)
+        self.lote = 500
+        self._tarea = TareaPeriodica('limpiador-pedidos', self._periodica)
+        self._lock = threading.Lock()
+        self._contadores = {'ejecuciones': 0, 'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = timedelta(hours=app.config['PEDIDOS_PENDIENTES_TTL_HORAS'])
+        self.lote = app.config['PEDIDOS_LIMPIEZA_LOTE']
+        self._tarea.init_app(app, app.config['PEDIDOS_LIMPIEZA_INTERVALO'])
+        app.extensions['limpiador_pedidos'] = self
+
+    def limpiar(self, max_lotes=None):
+        """Limpia lote a lote hasta que no queden abandonados. Devuelve el total borrado."""
+        limite = datetime.utcnow() - self.ttl
+        total = {'lotes': 0, 'pedidos': 0, 'detalles_pedido': 0, 'metodos_pago': 0}
+        while max_lotes is None or total['lotes'] < max_lotes:
+            borrado = borrar_lote(limite, self.lote)
+            if not borrado['pedidos']:
+                break
+            total['lotes'] += 1
+            for tabla, filas in borrado.items():
+                total[tabla] += filas
+            if borrado['pedidos'] < self.lote:
+                break
+
+        with self._lock:
+            self._contadores['ejecuciones'] += 1
+            for tabla in ('pedidos', 'detalles_pedido', 'metodos_pago'):
+                self._contadores[tabla] += total[tabla]
+        return total
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def _periodica(self):
+        cola_pagos.recuperar()
+        total = self.limpiar()
+        if total['pedidos']:
+            current_app.logger.info('Limpieza de pedidos abandonados: %s', total)
+
+
+limpiador_pedidos = LimpiadorPedidos()
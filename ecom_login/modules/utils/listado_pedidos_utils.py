@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+from ...models import db, Pedido, Usuario, PedidosPorEstado
+from .consultas_utils import carga_listado_pedidos
+
+
+ESTADOS_PEDIDO = ('Pendiente de Pago', 'Pendiente', 'Confirmado', 'Enviado', 'Entregado', 'Cancelado')
+
+# orden -> (columna, descendente). El id desempata y completa el cursor.
+ORDENES = {
+    'fecha_desc': (Pedido.fecha, True),
+    'fecha_asc': (Pedido.fecha, False),
+    'total_desc': (Pedido.total, True),
+    'total_asc': (Pedido.total, False),
+}
+ORDEN_POR_DEFECTO = 'fecha_desc'
+
+
+def _fecha(texto):
+    return datetime.strptime(texto, '%Y-%m-%d')
+
+
+# ---------- FILTROS ----------
+
+class FiltrosPedidos:
+    """Filtros y orden de admin_pedidos leídos de la query string."""
+
+    def __init__(self, estado=None, desde=None, hasta=None, correo=None,
+                 total_min=None, total_max=None, orden=ORDEN_POR_DEFECTO):
+        self.estado = estado if estado in ESTADOS_PEDIDO else None
+        self.desde = desde
+        self.hasta = hasta
+        self.correo = (correo or '').strip() or None
+        self.total_min = total_min
+        self.total_max = total_max
+        self.orden = orden if orden in ORDENES else ORDEN_POR_DEFECTO
+
+    @classmethod
+    def desde_args(cls, args):
+        # Un valor mal escrito se ignora en vez de romper la página
+        return cls(
+            estado=args.get('estado'),
+            desde=args.get('desde', type=_fecha),
+            hasta=args.get('hasta', type=_fecha),
+            correo=args.get('correo'),
+            total_min=args.get('total_min', type=float),
+            total_max=args.get('total_max', type=float),
+            orden=args.get('orden', ORDEN_POR_DEFECTO),
+        )
+
+    def condiciones(self, con_estado=True):
+        condiciones = []
+        if con_estado and self.estado:
+            condiciones.append(Pedido.estado == self.estado)
+        if self.desde:
+            condiciones.append(Pedido.fecha >= self.desde)
+        if self.hasta:
+            # "hasta" incluye todo ese día
+            condiciones.append(Pedido.fecha < self.hasta + timedelta(days=1))
+        if self.correo:
+            # Los clientes se resuelven primero; los pedidos usan ix_pedidos_usuario_fecha
+            clientes = select(Usuario.id).where(Usuario.correo.startswith(self.correo, autoescape=True))
+            condiciones.append(Pedido.usuario_id.in_(clientes))
+        if self.total_min is not None:
+            condiciones.append(Pedido.total >= self.total_min)
+        if self.total_max is not None:
+            condiciones.append(Pedido.total <= self.total_max)
+        return condiciones
+
+    def como_args(self):
+        """Filtros activos como argumentos de url_for (para los enlaces de página)."""
+        args = {
+            'estado': self.estado,
+            'desde': self.desde and self.desde.strftime('%Y-%m-%d'),
+            'hasta': self.hasta and self.hasta.strftime('%Y-%m-%d'),
+            'correo': self.correo,
+            'total_min': self.total_min,
+            'total_max': self.total_max,
+        }
+        if self.orden != ORDEN_POR_DEFECTO:
+            args['orden'] = self.orden
+        return {clave: valor for clave, valor in args.items() if valor is not None}
+
+
+# ---------- PAGINACIÓN POR CURSOR (KEYSET) ----------
+
+def _cursor(orden, pedido):
+    columna, _ = ORDENES[orden]
+    valor = getattr(pedido, columna.key)
+    valor = valor.isoformat() if isinstance(valor, datetime) else repr(valor)
+    return f'{valor}_{pedido.id}'
+
+
+def _leer_cursor(orden, cursor):
+    """'valor_id' -> (valor, id); None si el cursor no es válido para este orden."""
+    try:
+        valor, pedido_id = cursor.rsplit('_', 1)
+        columna, _ = ORDENES[orden]
+        valor = datetime.fromisoformat(valor) if columna is Pedido.fecha else float(valor)
+        return valor, int(pedido_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+class PaginaPedidos:
+    """Página de pedidos obtenida con un cursor sobre (columna de orden, id)."""
+
+    def __init__(self, pedidos, orden, hay_anterior, hay_siguiente):
+        self.pedidos = pedidos
+        self.orden = orden
+        self.hay_anterior = hay_anterior and bool(pedidos)
+        self.hay_siguiente = hay_siguiente and bool(pedidos)
+
+    @property
+    def cursor_anterior(self):
+        return _cursor(self.orden, self.pedidos[0]) if self.pedidos else None
+
+    @property
+    def cursor_siguiente(self):
+        return _cursor(self.orden, self.pedidos[-1]) if self.pedidos else None
+
+
+def paginar_pedidos(filtros, despues_de=None, antes_de=None, por_pagina=None):
+    """
+    Página de pedidos filtrada y ordenada en la base. Igual que
+    paginar_productos: WHERE (columna, id) >/< cursor en lugar de OFFSET, y un
+    registro extra para saber si hay más. Cada combinación filtro + orden
+    tiene un índice compuesto que la sirve (ver migración 0004).
+    """
+    por_pagina = por_pagina or current_app.config['PEDIDOS_POR_PAGINA']
+    columna, descendente = ORDENES[filtros.orden]
+    clave = tuple_(columna, Pedido.id)
+    adelante = (columna.desc(), Pedido.id.desc()) if descendente else (columna.asc(), Pedido.id.asc())
+    atras = (columna.asc(), Pedido.id.asc()) if descendente else (columna.desc(), Pedido.id.desc())
+
+    query = Pedido.query.options(*carga_listado_pedidos()).filter(*filtros.condiciones())
+
+    antes_de = antes_de and _leer_cursor(filtros.orden, antes_de)
+    if antes_de:
+        filas = (
+            query.filter(clave > antes_de if descendente else clave < antes_de)
+            .order_by(*atras)
+            .limit(por_pagina + 1)
+            .all()
+        )
+        if filas:
+            pedidos = list(reversed(filas[:por_pagina]))
+            return PaginaPedidos(pedidos, filtros.orden, len(filas) > por_pagina, True)
+        # Cursor fuera de rango: volver a la primera página
+        despues_de = None
+
+    despues_de = despues_de and _leer_cursor(filtros.orden, despues_de)
+    if despues_de:
+        query = query.filter(clave < despues_de if descendente else clave > despues_de)
+    filas = query.order_by(*adelante).limit(por_pagina + 1).all()
+    return PaginaPedidos(filas[:por_pagina], filtros.orden, bool(despues_de), len(filas) > por_pagina)
+
+
+def contar_por_estado(filtros):
+    """
+    {estado: cantidad} de los pedidos vivos con el resto de filtros aplicados.
+    El filtro de estado no se aplica para que las tarjetas muestren todos.
+
+    Sin filtros se lee el resumen pedidos_por_estado (unas pocas filas, al
+    día en cada transacción) en lugar de un GROUP BY sobre toda la tabla,
+    descontando los pedidos archivados, que el listado no muestra. Con
+    filtros el GROUP BY recorre solo las filas que coinciden, por los índices.
+    """
+    condiciones = filtros.condiciones(con_estado=False)
+    if not condiciones:
+        vivos = PedidosPorEstado.cantidad - PedidosPorEstado.archivados
+        filas = db.session.execute(select(PedidosPorEstado.estado, vivos).where(vivos != 0)).all()
+    else:
+        filas = db.session.execute(
+            select(Pedido.estado, func.count())
+            .where(*condiciones)
+            .group_by(Pedido.estado)
+        ).all()
+    return {estado: cantidad for estado, cantidad in filas}
@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUANTILES = (0.5, 0.95, 0.99)
+MUESTRAS_POR_RUTA = 1024
+MAX_SQL_REGISTRADAS = 50
+
+
+# ---------- ESTADÍSTICAS POR RUTA ----------
+
+class Serie:
+    """Suma, conteo y una ventana de las últimas muestras para calcular cuantiles."""
+
+    def __init__(self):
+        self.suma = 0.0
+        self.conteo = 0
+        self.muestras = deque(maxlen=MUESTRAS_POR_RUTA)
+
+    def agregar(self, valor):
+        self.suma += valor
+        self.conteo += 1
+        self.muestras.append(valor)
+
+    def cuantil(self, q):
+        if not self.muestras:
+            return 0.0
+        ordenadas = sorted(self.muestras)
+        return ordenadas[min(int(q * len(ordenadas)), len(ordenadas) - 1)]
+
+
+class EstadisticaRuta:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_SEGUNDOS)
+        self.duracion = Serie()
+        self.sql_tiempo = Serie()
+        self.sql_consultas = Serie()
+        self.plantilla_tiempo = Serie()
+        self.bytes = Serie()
+        self.por_estado = {}
+        self.condicional = {'304': 0, 'completa': 0}
+
+    def registrar(self, datos, estado):
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if datos['duracion'] <= limite:
+                self.buckets[i] += 1
+        self.duracion.agregar(datos['duracion'])
+        self.sql_tiempo.agregar(datos['sql_tiempo'])
+        self.sql_consultas.agregar(datos['sql_consultas'])
+        self.plantilla_tiempo.agregar(datos['plantilla_tiempo'])
+        self.bytes.agregar(datos['bytes'])
+        self.por_estado[estado] = self.por_estado.get(estado, 0) + 1
+        if datos.get('condicional') is not None:
+            self.condicional['304' if datos['condicional'] else 'completa'] += 1
+
+
+# ---------- MIDDLEWARE ----------
+
+class MetricasPeticiones:
+    """
+    Mide cada petición: tiempo total, consultas SQL (cantidad y tiempo, vía
+    eventos del motor), tiempo de render de plantillas, tamaño de respuesta
+    y, en las rutas con GET condicional, si se respondió 304.
+    Los datos son por proceso; cada worker de gunicorn publica los suyos.
+    """
+
+    def __init__(self, app=None):
+        self.rutas = {}
+        self._lock = threading.Lock()
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._inicio_peticion)
+        app.after_request(self._fin_peticion)
+        before_render_template.connect(_inicio_plantilla, app)
+        template_rendered.connect(_fin_plantilla, app)
+        if not event.contains(Engine, 'before_cursor_execute', _inicio_consulta):
+            event.listen(Engine, 'before_cursor_execute', _inicio_consulta)
+            event.listen(Engine, 'after_cursor_execute', _fin_consulta)
+        app.extensions['metricas'] = self
+
+    def _inicio_peticion(self):
+        g.metricas = {
+            'inicio': time.perf_counter(),
+            'sql_consultas': 0,
+            'sql_tiempo': 0.0,
+            'sql': [],
+            'plantilla_tiempo': 0.0,
+            'plantillas': [],
+            'condicional': None,
+        }
+
+    def _fin_peticion(self, respuesta):
+        datos = g.pop('metricas', None)
+        if datos is None:
+            return respuesta
+        datos['duracion'] = time.perf_counter() - datos['inicio']
+        # En una respuesta en streaming calculate_content_length() cargaría todo
+        # el cuerpo en memoria: ahí solo cuenta el Content-Length si lo trae.
+        if respuesta.is_streamed:
+            datos['bytes'] = respuesta.content_length or 0
+        else:
+            datos['bytes'] = respuesta.calculate_content_length() or 0
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+
+        with self._lock:
+            estadistica = self.rutas.get(ruta)
+            if estadistica is None:
+                estadistica = self.rutas[ruta] = EstadisticaRuta()
+            estadistica.registrar(datos, respuesta.status_code)
+
+        umbral = self.app.config['UMBRAL_PETICION_LENTA_MS'] / 1000
+        if datos['duracion'] >= umbral:
+            self._registrar_lenta(ruta, datos)
+        return respuesta
+
+    def _registrar_lenta(self, ruta, datos):
+        lineas = [
+            f"Petición lenta {request.method} {ruta}: {datos['duracion'] * 1000:.1f} ms, "
+            f"{datos['sql_consultas']} consultas SQL ({datos['sql_tiempo'] * 1000:.1f} ms), "
+            f"plantillas {datos['plantilla_tiempo'] * 1000:.1f} ms"
+        ]
+        for duracion, sentencia in sorted(datos['sql'], key=lambda s: s[0], reverse=True):
+            lineas.append(f'  {duracion * 1000:8.1f} ms  {" ".join(sentencia.split())}')
+        self.app.logger.warning('\n'.join(lineas))
+
+    # ---------- EXPOSICIÓN EN FORMATO PROMETHEUS ----------
+
+    def prometheus(self, extras=None):
+        """Texto de exposición de Prometheus con histogramas y cuantiles por ruta."""
+        salida = []
+        with self._lock:
+            rutas = sorted(self.rutas.items())
+
+            salida.append('# HELP ecom_peticiones_total Peticiones atendidas por ruta y código de estado')
+            salida.append('# TYPE ecom_peticiones_total counter')
+            for ruta, est in rutas:
+                for estado, conteo in sorted(est.por_estado.items()):
+                    salida.append(f'ecom_peticiones_total{{ruta="{ruta}",estado="{estado}"}} {conteo}')
+
+            salida.append('# HELP ecom_get_condicional_total GET con validador: respondidos 304 o completos (tasa de acierto = 304 / total)')
+            salida.append('# TYPE ecom_get_condicional_total counter')
+            for ruta, est in rutas:
+                if est.condicional['304'] or est.condicional['completa']:
+                    for resultado, conteo in est.condicional.items():
+                        salida.append(f'ecom_get_condicional_total{{ruta="{ruta}",resultado="{resultado}"}} {conteo}')
+
+            salida.append('# HELP ecom_peticion_duracion_segundos Tiempo total de la petición')
+            salida.append('# TYPE ecom_peticion_duracion_segundos histogram')
+            for ruta, est in rutas:
+                for limite, conteo in zip(BUCKETS_SEGUNDOS, est.buckets):
+                    salida.append(f'ecom_peticion_duracion_segundos_bucket{{ruta="{ruta}",le="{limite}"}} {conteo}')
+                salida.append(f'ecom_peticion_duracion_segundos_bucket{{ruta="{ruta}",le="+Inf"}} {est.duracion.conteo}')
+                salida.append(f'ecom_peticion_duracion_segundos_sum{{ruta="{ruta}"}} {est.duracion.suma:.6f}')
+                salida.append(f'ecom_peticion_duracion_segundos_count{{ruta="{ruta}"}} {est.duracion.conteo}')
+
+            resumenes = (
+                ('ecom_peticion_segundos', 'duracion', 'Cuantiles del tiempo total (últimas muestras)'),
+                ('ecom_sql_segundos', 'sql_tiempo', 'Tiempo en SQL por petición'),
+                ('ecom_sql_consultas', 'sql_consultas', 'Consultas SQL por petición'),
+                ('ecom_plantilla_segundos', 'plantilla_tiempo', 'Tiempo de render de plantillas por petición'),
+                ('ecom_respuesta_bytes', 'bytes', 'Tamaño de la respuesta'),
+            )
+            for nombre, atributo, ayuda in resumenes:
+                salida.append(f'# HELP {nombre} {ayuda}')
+                salida.append(f'# TYPE {nombre} summary')
+                for ruta, est in rutas:
+                    serie = getattr(est, atributo)
+                    for q in CUANTILES:
+                        salida.append(f'{nombre}{{ruta="{ruta}",quantile="{q}"}} {serie.cuantil(q):.6f}')
+                    salida.append(f'{nombre}_sum{{ruta="{ruta}"}} {serie.suma:.6f}')
+                    salida.append(f'{nombre}_count{{ruta="{ruta}"}} {serie.conteo}')
+
+        for nombre, tipo, ayuda, valor in extras or []:
+            salida.append(f'# HELP {nombre} {ayuda}')
+            salida.append(f'# TYPE {nombre} {tipo}')
+            salida.append(f'{nombre} {valor}')
+        return '\n'.join(salida) + '\n'
+
+
+metricas = MetricasPeticiones()
+
+
+# ---------- EVENTOS DE SQL Y PLANTILLAS ----------
+
+# El inicio se guarda en el contexto de ejecución de la sentencia: si falla,
+# el contexto se descarta con ella y no queda nada pendiente en la conexión.
+def _inicio_consulta(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metricas_inicio = time.perf_counter()
+
+
+def _fin_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, 'metricas_inicio', None)
+    if inicio is None or not has_request_context() or 'metricas' not in g:
+        return
+    duracion = time.perf_counter() - inicio
+    datos = g.metricas
+    datos['sql_consultas'] += 1
+    datos['sql_tiempo'] += duracion
+    if len(datos['sql']) < MAX_SQL_REGISTRADAS:
+        datos['sql'].append((duracion, statement))
+
+
+def _inicio_plantilla(sender, template, context, **extra):
+    if 'metricas' in g:
+        g.metricas['plantillas'].append(time.perf_counter())
+
+
+def _fin_plantilla(sender, template, context, **extra):
+    if 'metricas' in g and g.metricas['plantillas']:
+        g.metricas['plantilla_tiempo'] += time.perf_counter() - g.metricas['plantillas'].pop()
@@ -1,6 +1,5 @@
-from flask import flash, session
+from flask import flash
 from flask_login import current_user
-from ...models import db, Producto, DetallePedido, CarritoItem, MetodoPago
 
 
 # ---------- FUNCIONES COMUNES ----------
@@ -13,62 +12,24 @@ def verificar_propietario_pedido(pedido):
     return True
 
 
-def verificar_y_actualizar_stock(pedido):
-    """Verifica stock de productos antes de confirmar y actualiza inventario."""
-    detalles = DetallePedido.query.filter_by(pedido_id=pedido.id).all()
-    for detalle in detalles:
-        producto = Producto.query.get(detalle.producto_id)
-        if producto:
-            if producto.stock < detalle.cantidad:
-                flash(
-                    f"❌ Lo sentimos, {producto.nombre} no tiene suficiente stock. "
-                    f"Disponible: {producto.stock}.",
-                    "danger",
-                )
-                return False
-            # ✅ Reducir el stock sin permitir negativos
-            producto.stock = max(producto.stock - detalle.cantidad, 0)
-    return True
-
-
-def limpiar_carrito_y_sesion(usuario_id):
-    """Vacía el carrito y elimina la sesión de pedido pendiente."""
-    CarritoItem.query.filter_by(usuario_id=usuario_id).delete()
-    session.pop("pedido_pendiente", None)
-
-
 # ---------- FUNCIONES ESPECÍFICAS DE PAGO ----------
-
-def registrar_pago_tarjeta(pedido, numero_tarjeta, nombre_titular):
-    """Registra el pago con tarjeta."""
-    metodo = MetodoPago(
-        pedido_id=pedido.id,
-        tipo_pago="tarjeta",
-        estado_pago="Aprobado",
-        numero_tarjeta=numero_tarjeta[-4:],
-        nombre_titular=nombre_titular,
-    )
-    db.session.add(metodo)
-    pedido.estado = "Confirmado"
-    limpiar_carrito_y_sesion(current_user.id)
-    db.session.commit()
-
-
-def registrar_pago_pse(pedido, banco, tipo_persona, tipo_documento, numero_documento):
-    """Registra el pago PSE."""
-    metodo = MetodoPago(
-        pedido_id=pedido.id,
-        tipo_pago="pse",
-        estado_pago="Aprobado",
-        banco=banco,
-        tipo_persona=tipo_persona,
-        tipo_documento=tipo_documento,
-        numero_documento=numero_documento[-4:],
-    )
-    db.session.add(metodo)
-    pedido.estado = "Confirmado"
-    limpiar_carrito_y_sesion(current_user.id)
-    db.session.commit()
+# Solo lo que se guarda en metodos_pago: los números completos van a la
+# pasarela y no se persisten.
+
+def datos_publicos_tarjeta(numero_tarjeta, nombre_titular):
+    return {
+        "numero_tarjeta": numero_tarjeta[-4:],
+        "nombre_titular": nombre_titular,
+    }
+
+
+def datos_publicos_pse(banco, tipo_persona, tipo_documento, numero_documento):
+    return {
+        "banco": banco,
+        "tipo_persona": tipo_persona,
+        "tipo_documento": tipo_documento,
+        "numero_documento": numero_documento[-4:],
+    }
 
 # Función para verificar el número de tarjeta con el algoritmo Luhn
 def verificar_tarjeta_luhn(numero_tarjeta):
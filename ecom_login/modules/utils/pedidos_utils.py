@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import delete, exists, insert, select
+from ...models import db, Pedido, DetallePedido, MetodoPago
+from .cola_pagos_utils import INTENTOS_VIVOS
+
+
+PENDIENTE_DE_PAGO = 'Pendiente de Pago'
+
+
+# ---------- CREACIÓN DE PEDIDOS ----------
+
+def crear_pedido(usuario_id, lineas, total, estado=PENDIENTE_DE_PAGO):
+    """
+    Crea el pedido y todas sus líneas dentro de la transacción actual:
+    el pedido se inserta con flush (para obtener su id) y las líneas en un
+    solo executemany. No hace commit; el llamador confirma una sola vez.
+
+    `lineas` es una lista de dicts con producto_id, cantidad, precio y subtotal.
+    """
+    pedido = Pedido(usuario_id=usuario_id, total=total, estado=estado)
+    db.session.add(pedido)
+    db.session.flush()
+
+    if lineas:
+        db.session.execute(
+            insert(DetallePedido),
+            [dict(linea, pedido_id=pedido.id) for linea in lineas],
+        )
+    return pedido
+
+
+def _clave_lineas(lineas):
+    return sorted((l['producto_id'], l['cantidad'], l['precio'], l['subtotal']) for l in lineas)
+
+
+def pedido_para_carrito(usuario_id, lineas, total):
+    """
+    Pedido 'Pendiente de Pago' para el carrito del usuario. Si ya tiene uno
+    que ningún intento de pago esté usando, lo reutiliza (reemplazando sus
+    líneas si el carrito cambió) en lugar de crear otro en cada clic en
+    "finalizar compra". Sin commit.
+    """
+    intento_vivo = exists().where(
+        MetodoPago.pedido_id == Pedido.id,
+        MetodoPago.estado_pago.in_(INTENTOS_VIVOS),
+    )
+    pedido = (
+        Pedido.query.filter(Pedido.usuario_id == usuario_id, Pedido.estado == PENDIENTE_DE_PAGO, ~intento_vivo)
+        .order_by(Pedido.fecha.desc())
+        .with_for_update()
+        .first()
+    )
+    if pedido is None:
+        return crear_pedido(usuario_id, lineas, total)
+
+    actuales = db.session.execute(
+        select(DetallePedido.producto_id, DetallePedido.cantidad, DetallePedido.precio, DetallePedido.subtotal)
+        .where(DetallePedido.pedido_id == pedido.id)
+    ).all()
+    if _clave_lineas(fila._asdict() for fila in actuales) != _clave_lineas(lineas):
+        db.session.execute(delete(DetallePedido).where(DetallePedido.pedido_id == pedido.id))
+        db.session.execute(insert(DetallePedido), [dict(linea, pedido_id=pedido.id) for linea in lineas])
+
+    # La fecha es la del último checkout: el limpiador cuenta el TTL desde ahí
+    pedido.total = total
+    pedido.fecha = datetime.utcnow()
+    return pedido
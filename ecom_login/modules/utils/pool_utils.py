@@ -0,0 +1,79 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from ...models import db
+
+
+# ---------- TELEMETRÍA DEL POOL DE CONEXIONES ----------
+
+class TelemetriaPool:
+    """
+    Métricas del pool de este proceso: conexiones en uso, overflow y cuánto
+    esperan las peticiones para obtener una conexión.
+    """
+
+    def __init__(self, app=None):
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Debe llamarse antes de db.init_app, que es quien crea el motor."""
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+            return  # SQLite en memoria usa StaticPool: no hay nada que medir
+        opciones = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        opciones.setdefault('poolclass', PoolMedido)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones
+        app.extensions['telemetria_pool'] = self
+
+    def registrar_espera(self, segundos):
+        with self._lock:
+            self.esperas += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+
+    def registrar_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def estado(self):
+        pool = db.engine.pool
+        datos = {'pool': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            datos.update({
+                'tamano': pool.size(),
+                'en_uso': pool.checkedout(),
+                'libres': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        datos.update({
+            'esperas': self.esperas,
+            'espera_promedio_ms': (self.espera_total / self.esperas * 1000) if self.esperas else 0.0,
+            'espera_max_ms': self.espera_max * 1000,
+            'timeouts': self.timeouts,
+        })
+        return datos
+
+
+telemetria_pool = TelemetriaPool()
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que registra el tiempo de cada checkout y los timeouts."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            telemetria_pool.registrar_timeout()
+            raise
+        finally:
+            telemetria_pool.registrar_espera(time.perf_counter() - inicio)
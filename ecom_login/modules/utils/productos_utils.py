@@ -0,0 +1,65 @@
+import math
+
+
+# ---------- VALIDACIÓN DE PRODUCTOS ----------
+# Reglas comunes a nuevo_producto, editar_producto y la importación masiva.
+
+CAMPOS_OBLIGATORIOS = ('nombre', 'descripcion', 'precio', 'stock')
+
+# campo -> (mínimo, máximo) de caracteres; el máximo es el de la columna
+LONGITUDES = {
+    'nombre': (3, 100),
+    'descripcion': (5, 200),
+    'imagen': (0, 255),
+}
+
+MENSAJE_NUMEROS = 'Error: Precio y stock deben ser números válidos.'
+
+
+def validar_producto(datos, parcial=False):
+    """
+    Convierte y valida los campos de un producto. Devuelve un dict listo para
+    Producto(**valores) o para un UPDATE; lanza ValueError con el mensaje para
+    el usuario. Con parcial=True solo se validan los campos presentes (una
+    hoja de stock puede traer solo id y stock).
+    """
+    if not parcial:
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if campo not in datos]
+        if faltantes:
+            raise ValueError(f'Faltan campos: {", ".join(faltantes)}.')
+
+    valores = {}
+    try:
+        if 'precio' in datos:
+            valores['precio'] = float(datos['precio'])
+        if 'stock' in datos:
+            valores['stock'] = int(datos['stock'])
+    except (TypeError, ValueError):
+        raise ValueError(MENSAJE_NUMEROS) from None
+    if 'precio' in valores and not math.isfinite(valores['precio']):
+        raise ValueError(MENSAJE_NUMEROS)
+
+    # VALIDACIÓN: No permitir precios negativos
+    if valores.get('precio', 0) < 0:
+        raise ValueError('El precio no puede ser negativo.')
+
+    # VALIDACIÓN: No permitir stock negativo
+    if valores.get('stock', 0) < 0:
+        raise ValueError('El stock no puede ser negativo.')
+
+    for campo in ('nombre', 'descripcion', 'imagen'):
+        if campo not in datos:
+            continue
+        valor = '' if datos[campo] is None else str(datos[campo]).strip()
+        minimo, maximo = LONGITUDES[campo]
+        if len(valor) < minimo:
+            if campo == 'nombre':
+                raise ValueError('El nombre del producto debe tener al menos 3 caracteres.')
+            raise ValueError('La descripción debe tener al menos 5 caracteres.')
+        if len(valor) > maximo:
+            raise ValueError(f'El campo {campo} admite como máximo {maximo} caracteres.')
+        valores[campo] = valor
+
+    if not parcial:
+        valores.setdefault('imagen', '')
+    return valores
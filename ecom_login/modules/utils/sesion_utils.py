@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from ...models import db, Usuario
+
+
+# Columnas de Usuario que viven en el principal; si cambian, la entrada caduca
+CAMPOS_PRINCIPAL = ('id', 'correo', 'nombre', 'rol')
+
+
+# ---------- PRINCIPAL ----------
+
+class UsuarioSesion:
+    """
+    Lo que las rutas leen de current_user, sin sesión de SQLAlchemy detrás.
+    Para cambiar la cuenta hay que cargar el Usuario real con db.session.get().
+    """
+
+    __slots__ = CAMPOS_PRINCIPAL
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, correo, nombre, rol):
+        self.id = id
+        self.correo = correo
+        self.nombre = nombre
+        self.rol = rol
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, otro):
+        return isinstance(otro, UsuarioSesion) and otro.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<UsuarioSesion {self.id} {self.rol}>'
+
+
+# ---------- CACHÉ ----------
+
+class CachePrincipales:
+    """
+    LRU acotado con TTL de UsuarioSesion por id, dentro del proceso.
+    Cada fallo es una consulta a usuarios; cada acierto, una consulta ahorrada.
+    Las invalidaciones solo llegan al worker que hizo el cambio: en los demás
+    la entrada vieja dura como mucho USUARIOS_CACHE_TTL segundos.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.max_entradas = 10000
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config['USUARIOS_CACHE_TTL']
+        self.max_entradas = app.config['USUARIOS_CACHE_MAX_ENTRADAS']
+        self._datos.clear()
+
+        if not event.contains(db.session, 'before_flush', _detectar_cambios_usuario):
+            event.listen(db.session, 'before_flush', _detectar_cambios_usuario)
+            event.listen(db.session, 'after_commit', _invalidar_tras_commit)
+            event.listen(db.session, 'after_soft_rollback', _descartar_marca)
+        app.extensions['cache_principales'] = self
+
+    def obtener(self, usuario_id):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(usuario_id)
+            if entrada is not None and entrada[0] >= ahora:
+                self._datos.move_to_end(usuario_id)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+
+        fila = db.session.execute(
+            db.select(*(getattr(Usuario, campo) for campo in CAMPOS_PRINCIPAL)).where(Usuario.id == usuario_id)
+        ).first()
+        if fila is None:
+            self.invalidar(usuario_id)
+            return None
+        principal = UsuarioSesion(*fila)
+        self._guardar(principal)
+        return principal
+
+    def recordar(self, usuario):
+        """Guarda el principal de un Usuario ya cargado (p. ej. recién autenticado)."""
+        principal = UsuarioSesion(*(getattr(usuario, campo) for campo in CAMPOS_PRINCIPAL))
+        self._guardar(principal)
+        return principal
+
+    def _guardar(self, principal):
+        with self._lock:
+            self._datos[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._datos.move_to_end(principal.id)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, usuario_id):
+        with self._lock:
+            if self._datos.pop(usuario_id, None) is not None:
+                self.invalidaciones += 1
+
+    def estadisticas(self):
+        return {
+            'entradas': len(self._datos),
+            'max_entradas': self.max_entradas,
+            'ttl': self.ttl,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'consultas_ahorradas': self.aciertos,
+            'invalidaciones': self.invalidaciones,
+        }
+
+
+cache_principales = CachePrincipales()
+
+
+# ---------- INVALIDACIÓN ----------
+
+def invalidar_usuario(usuario_id):
+    """
+    Marca el principal del usuario como obsoleto en la transacción actual.
+    Se descarta de la caché cuando la transacción se confirma.
+    """
+    db.session.info.setdefault('usuarios_modificados', set()).add(usuario_id)
+
+
+def _detectar_cambios_usuario(session, flush_context, instances):
+    # Red de seguridad: cualquier cambio de rol, correo o nombre hecho por el ORM
+    # (también fuera de ajustes_usuario) invalida el principal al confirmar.
+    for objeto in list(session.dirty) + list(session.deleted):
+        if not isinstance(objeto, Usuario) or objeto.id is None:
+            continue
+        estado = inspect(objeto)
+        if objeto in session.deleted or any(
+            estado.attrs[campo].history.has_changes() for campo in CAMPOS_PRINCIPAL
+        ):
+            session.info.setdefault('usuarios_modificados', set()).add(objeto.id)
+
+
+def _invalidar_tras_commit(session):
+    for usuario_id in session.info.pop('usuarios_modificados', ()):
+        cache_principales.invalidar(usuario_id)
+
+
+def _descartar_marca(session, previous_transaction):
+    session.info.pop('usuarios_modificados', None)
@@ -0,0 +1,84 @@
+from collections import namedtuple
+from sqlalchemy import bindparam, select, update
+from ...models import db, Producto
+
+
+Faltante = namedtuple('Faltante', 'producto_id nombre solicitado disponible')
+
+_DESCONTAR = (
+    update(Producto.__table__)
+    .where(Producto.__table__.c.id == bindparam('pid'))
+    .where(Producto.__table__.c.stock >= bindparam('cantidad'))
+    .values(stock=Producto.__table__.c.stock - bindparam('cantidad'))
+)
+
+_DEVOLVER = (
+    update(Producto.__table__)
+    .where(Producto.__table__.c.id == bindparam('pid'))
+    .values(stock=Producto.__table__.c.stock + bindparam('cantidad'))
+)
+
+
+# ---------- RESERVA ATÓMICA DE STOCK ----------
+
+def agrupar_lineas(lineas):
+    """Suma cantidades por producto y ordena por id (mismo orden de bloqueo en todos los pedidos)."""
+    totales = {}
+    for producto_id, cantidad in lineas:
+        totales[producto_id] = totales.get(producto_id, 0) + cantidad
+    return sorted(totales.items())
+
+
+def reservar_stock(lineas):
+    """
+    Descuenta el stock de todas las líneas con UPDATE condicionales
+    (stock = stock - n WHERE stock >= n), enviados como un solo lote.
+    Si alguna línea no alcanza, se deshace toda la transacción y se devuelve
+    la lista de productos faltantes. Lista vacía = reserva hecha (sin commit).
+    """
+    agrupadas = agrupar_lineas(lineas)
+    if not agrupadas:
+        return []
+
+    parametros = [{'pid': pid, 'cantidad': cantidad} for pid, cantidad in agrupadas]
+    conexion = db.session.connection()
+
+    if conexion.dialect.supports_sane_multi_rowcount:
+        resultado = conexion.execute(_DESCONTAR, parametros)
+        completo = resultado.rowcount == len(parametros)
+    else:
+        # El driver no informa filas afectadas en executemany: una sentencia por línea
+        completo = all(conexion.execute(_DESCONTAR, p).rowcount == 1 for p in parametros)
+
+    if completo:
+        return []
+
+    db.session.rollback()
+    return buscar_faltantes(agrupadas)
+
+
+def liberar_stock(lineas):
+    """Devuelve al stock lo que reservó reservar_stock (un solo lote, sin commit)."""
+    agrupadas = agrupar_lineas(lineas)
+    if agrupadas:
+        db.session.connection().execute(
+            _DEVOLVER, [{'pid': pid, 'cantidad': cantidad} for pid, cantidad in agrupadas]
+        )
+
+
+def buscar_faltantes(agrupadas):
+    """Productos cuyo stock actual no cubre la cantidad pedida."""
+    solicitados = dict(agrupadas)
+    filas = db.session.execute(
+        select(Producto.id, Producto.nombre, Producto.stock).where(Producto.id.in_(solicitados))
+    ).all()
+    encontrados = {fila.id: fila for fila in filas}
+
+    faltantes = []
+    for producto_id, cantidad in agrupadas:
+        fila = encontrados.get(producto_id)
+        if fila is None:
+            faltantes.append(Faltante(producto_id, f'Producto #{producto_id}', cantidad, 0))
+        elif fila.stock < cantidad:
+            faltantes.append(Faltante(producto_id, fila.nombre, cantidad, fila.stock))
+    return faltantes
@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+
+from flask import current_app
+from ...models import db
+
+
+# ---------- TAREAS PERIÓDICAS ----------
+
+class TareaPeriodica:
+    """
+    Corre funcion() cada `intervalo` segundos en un hilo daemon por proceso,
+    dentro de un contexto de la aplicación. El hilo arranca con la primera
+    petición, así queda en el worker de gunicorn y no en el proceso padre.
+    """
+
+    def __init__(self, nombre, funcion):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, intervalo):
+        self.intervalo = intervalo
+        if intervalo:
+            app.before_request(self._arrancar)
+
+    def _arrancar(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        app = current_app._get_current_object()
+        threading.Thread(target=self._bucle, args=(app,), name=self.nombre, daemon=True).start()
+
+    def _bucle(self, app):
+        while True:
+            time.sleep(self.intervalo)
+            with app.app_context():
+                try:
+                    self.funcion()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Error en la tarea periódica %s', self.nombre)
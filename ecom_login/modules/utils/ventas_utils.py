@@ -0,0 +1,219 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, union_all
+from sqlalchemy.orm import joinedload
+from ...models import (
+    db, Pedido, DetallePedido, PedidoArchivado, DetallePedidoArchivado,
+    VentaDiaria, VentaProducto, PedidosPorEstado,
+)
+
+
+# Un pedido cuenta como venta mientras esté en uno de estos estados
+# (son los que descontaron stock; cancelar_pedido_admin lo devuelve).
+ESTADOS_VENDIDOS = frozenset({'Confirmado', 'Enviado', 'Entregado'})
+
+
+def es_venta(estado):
+    return estado in ESTADOS_VENDIDOS
+
+
+# ---------- DELTAS ----------
+
+class DeltasVentas:
+    """Cambios acumulados de un flush, aplicados con un upsert por tabla."""
+
+    def __init__(self):
+        self.dias = defaultdict(lambda: [0, 0, 0.0])        # dia -> [pedidos, unidades, ingresos]
+        self.productos = defaultdict(lambda: [0, 0.0])      # producto_id -> [unidades, ingresos]
+        self.estados = defaultdict(int)                     # estado -> cantidad
+        self.archivados = defaultdict(int)                  # estado -> pedidos movidos al archivo
+
+    def cambio_de_estado(self, anterior, nuevo):
+        if anterior is not None:
+            self.estados[anterior] -= 1
+        if nuevo is not None:
+            self.estados[nuevo] += 1
+
+    def venta(self, signo, dia, total, lineas):
+        fila = self.dias[dia]
+        fila[0] += signo
+        fila[2] += signo * total
+        for producto_id, cantidad, subtotal in lineas:
+            fila[1] += signo * cantidad
+            producto = self.productos[producto_id]
+            producto[0] += signo * cantidad
+            producto[1] += signo * subtotal
+
+    def aplicar(self, conexion):
+        _upsert(conexion, VentaDiaria, [VentaDiaria.dia], [
+            {'dia': dia, 'pedidos': p, 'unidades': u, 'ingresos': i}
+            for dia, (p, u, i) in self.dias.items() if (p, u, i) != (0, 0, 0.0)
+        ])
+        _upsert(conexion, VentaProducto, [VentaProducto.producto_id], [
+            {'producto_id': producto_id, 'unidades': u, 'ingresos': i}
+            for producto_id, (u, i) in self.productos.items() if (u, i) != (0, 0.0)
+        ])
+        _upsert(conexion, PedidosPorEstado, [PedidosPorEstado.estado], [
+            {'estado': estado, 'cantidad': self.estados.get(estado, 0), 'archivados': self.archivados.get(estado, 0)}
+            for estado in self.estados.keys() | self.archivados.keys()
+            if self.estados.get(estado) or self.archivados.get(estado)
+        ])
+
+
+def _upsert(conexion, modelo, claves, filas):
+    """INSERT ... ON CONFLICT DO UPDATE SET columna = columna + excluded.columna (executemany)."""
+    if not filas:
+        return
+    if conexion.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+
+    tabla = modelo.__table__
+    sentencia = insert_dialecto(tabla)
+    acumulables = [columna for columna in filas[0] if columna not in {clave.key for clave in claves}]
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=claves,
+        set_={columna: tabla.c[columna] + sentencia.excluded[columna] for columna in acumulables},
+    )
+    conexion.execute(sentencia, filas)
+
+
+def _lineas(conexion, pedido_id):
+    return conexion.execute(
+        select(DetallePedido.producto_id, DetallePedido.cantidad, DetallePedido.subtotal)
+        .where(DetallePedido.pedido_id == pedido_id)
+    ).all()
+
+
+def _acumular_pedido(deltas, conexion, pedido, anterior, nuevo):
+    deltas.cambio_de_estado(anterior, nuevo)
+    if es_venta(anterior) == es_venta(nuevo):
+        return
+    signo = 1 if es_venta(nuevo) else -1
+    dia = (pedido.fecha or datetime.utcnow()).date()
+    deltas.venta(signo, dia, pedido.total or 0.0, _lineas(conexion, pedido.id))
+
+
+def _actualizar_tras_flush(session, flush_context):
+    # Todo cambio de Pedido.estado hecho por el ORM (pago, cancelación,
+    # cambio manual, creación) mueve los resúmenes dentro de la misma transacción.
+    deltas = DeltasVentas()
+    conexion = session.connection()
+    for pedido in session.new:
+        if isinstance(pedido, Pedido):
+            _acumular_pedido(deltas, conexion, pedido, None, pedido.estado)
+    for pedido in session.dirty:
+        if isinstance(pedido, Pedido):
+            historia = inspect(pedido).attrs.estado.history
+            if historia.added and historia.deleted:
+                _acumular_pedido(deltas, conexion, pedido, historia.deleted[0], historia.added[0])
+    for pedido in session.deleted:
+        if isinstance(pedido, Pedido):
+            historia = inspect(pedido).attrs.estado.history
+            anterior = historia.deleted[0] if historia.deleted else pedido.estado
+            _acumular_pedido(deltas, conexion, pedido, anterior, None)
+    deltas.aplicar(conexion)
+
+
+# ---------- SERVICIO ----------
+
+class ResumenVentas:
+    """
+    Tablas de resumen (ventas por día, por producto y pedidos por estado)
+    mantenidas de forma incremental, para que el panel lea cifras sin
+    recorrer pedidos ni detalles_pedido.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not event.contains(db.session, 'after_flush', _actualizar_tras_flush):
+            event.listen(db.session, 'after_flush', _actualizar_tras_flush)
+        app.extensions['resumen_ventas'] = self
+
+    def reconstruir(self):
+        """
+        Recalcula los tres resúmenes desde cero con los pedidos vivos y los
+        archivados (archivar solo suma a pedidos_por_estado.archivados). No hace commit.
+        """
+        pedidos = union_all(
+            select(
+                Pedido.id, Pedido.fecha, Pedido.total, func.coalesce(Pedido.estado, 'Pendiente').label('estado'),
+                literal(0).label('archivado'),
+            ),
+            select(
+                PedidoArchivado.id, PedidoArchivado.fecha, PedidoArchivado.total, PedidoArchivado.estado,
+                literal(1).label('archivado'),
+            ),
+        ).subquery()
+        detalles = union_all(
+            select(DetallePedido.pedido_id, DetallePedido.producto_id, DetallePedido.cantidad, DetallePedido.subtotal),
+            select(
+                DetallePedidoArchivado.pedido_id, DetallePedidoArchivado.producto_id,
+                DetallePedidoArchivado.cantidad, DetallePedidoArchivado.subtotal,
+            ),
+        ).subquery()
+        vendidos = pedidos.c.estado.in_(ESTADOS_VENDIDOS)
+        dia = func.date(pedidos.c.fecha)
+        for modelo in (VentaDiaria, VentaProducto, PedidosPorEstado):
+            db.session.execute(delete(modelo))
+
+        unidades_por_pedido = (
+            select(detalles.c.pedido_id, func.sum(detalles.c.cantidad).label('unidades'))
+            .group_by(detalles.c.pedido_id)
+            .subquery()
+        )
+        db.session.execute(insert(VentaDiaria).from_select(
+            ['dia', 'pedidos', 'unidades', 'ingresos'],
+            select(dia, func.count(), func.coalesce(func.sum(unidades_por_pedido.c.unidades), 0), func.sum(pedidos.c.total))
+            .outerjoin(unidades_por_pedido, unidades_por_pedido.c.pedido_id == pedidos.c.id)
+            .where(vendidos)
+            .group_by(dia),
+        ))
+        db.session.execute(insert(VentaProducto).from_select(
+            ['producto_id', 'unidades', 'ingresos'],
+            select(detalles.c.producto_id, func.sum(detalles.c.cantidad), func.sum(detalles.c.subtotal))
+            .join(pedidos, pedidos.c.id == detalles.c.pedido_id)
+            .where(vendidos)
+            .group_by(detalles.c.producto_id),
+        ))
+        db.session.execute(insert(PedidosPorEstado).from_select(
+            ['estado', 'cantidad', 'archivados'],
+            select(pedidos.c.estado, func.count(), func.sum(pedidos.c.archivado)).group_by(pedidos.c.estado),
+        ))
+
+    def tablero(self, dias=7, mas_vendidos=5):
+        """Cifras del panel: cada consulta lee unas pocas filas de los resúmenes."""
+        hoy = datetime.utcnow().date()
+        por_dia = {
+            fila.dia: fila
+            for fila in VentaDiaria.query.filter(VentaDiaria.dia > hoy - timedelta(days=dias)).all()
+        }
+        ultimos_dias = [
+            (dia, por_dia[dia].pedidos if dia in por_dia else 0, por_dia[dia].ingresos if dia in por_dia else 0.0)
+            for dia in (hoy - timedelta(days=n) for n in range(dias - 1, -1, -1))
+        ]
+        productos = (
+            VentaProducto.query.options(joinedload(VentaProducto.producto))
+            .filter(VentaProducto.unidades > 0)
+            .order_by(VentaProducto.unidades.desc())
+            .limit(mas_vendidos)
+            .all()
+        )
+        return {
+            'hoy': por_dia.get(hoy),
+            'ultimos_dias': ultimos_dias,
+            'ingresos_periodo': sum(ingresos for _, _, ingresos in ultimos_dias),
+            'mas_vendidos': productos,
+            'por_estado': {
+                fila.estado: fila.cantidad
+                for fila in PedidosPorEstado.query.filter(PedidosPorEstado.cantidad != 0)
+            },
+        }
+
+
+resumen_ventas = ResumenVentas()
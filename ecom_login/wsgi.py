@@ -0,0 +1,4 @@
+from .app import create_app
+
+# Punto de entrada para gunicorn (ver gunicorn.conf.py y Procfile)
+app = create_app()
@@ -0,0 +1,37 @@
+# Configuración de gunicorn para `gunicorn -c gunicorn.conf.py ecom_login.wsgi:app`
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Workers con hilos: un login esperando su hash ocupa un hilo, no el worker
+# entero, y el resto de las rutas sigue atendiéndose. HASH_COLA_MAX (por
+# worker) debe ser menor que threads para que siempre queden hilos libres.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_HILOS', 8))
+
+# La app se importa una sola vez en el proceso padre y los workers la heredan por fork
+preload_app = (os.environ.get('GUNICORN_PRELOAD') or '1').lower() in ('1', 'true', 'si')
+
+
+def when_ready(server):
+    """Con preload: precalentar plantillas y caché en el padre antes de crear workers."""
+    if not preload_app:
+        return
+    from ecom_login.modules.utils.arranque_utils import precalentar
+
+    try:
+        resumen = precalentar(server.app.wsgi())
+        server.log.info('Precalentamiento: %s', resumen)
+    except Exception:
+        server.log.exception('No se pudo precalentar; los workers arrancan en frío')
+
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones; nunca reutiliza las del padre."""
+    if not preload_app:
+        return
+    from ecom_login.models import db
+
+    with worker.app.wsgi().app_context():
+        db.engine.dispose(close=False)
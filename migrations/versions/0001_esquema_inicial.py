@@ -0,0 +1,112 @@
+"""esquema inicial
+
+Tablas tal como las creaba db.create_all() antes de tener migraciones.
+Si la base ya existe (creada por create_all), las tablas presentes se omiten.
+
+Revision ID: 0001_esquema_inicial
+Revises:
+Create Date: 2026-10-16 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_esquema_inicial'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'usuarios' not in existentes:
+        op.create_table(
+            'usuarios',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('nombre', sa.String(length=50), nullable=False),
+            sa.Column('correo', sa.String(length=100), nullable=False),
+            sa.Column('contrasena', sa.String(length=200), nullable=False),
+            sa.Column('rol', sa.String(length=20), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('correo'),
+        )
+
+    if 'productos' not in existentes:
+        op.create_table(
+            'productos',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('nombre', sa.String(length=100), nullable=False),
+            sa.Column('descripcion', sa.String(length=200), nullable=True),
+            sa.Column('precio', sa.Float(), nullable=False),
+            sa.Column('stock', sa.Integer(), nullable=False),
+            sa.Column('imagen', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'pedidos' not in existentes:
+        op.create_table(
+            'pedidos',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('usuario_id', sa.Integer(), nullable=False),
+            sa.Column('fecha', sa.DateTime(), nullable=True),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('estado', sa.String(length=20), nullable=True),
+            sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'detalles_pedido' not in existentes:
+        op.create_table(
+            'detalles_pedido',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('pedido_id', sa.Integer(), nullable=False),
+            sa.Column('producto_id', sa.Integer(), nullable=False),
+            sa.Column('cantidad', sa.Integer(), nullable=False),
+            sa.Column('precio', sa.Float(), nullable=False),
+            sa.Column('subtotal', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['pedido_id'], ['pedidos.id']),
+            sa.ForeignKeyConstraint(['producto_id'], ['productos.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'metodos_pago' not in existentes:
+        op.create_table(
+            'metodos_pago',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('pedido_id', sa.Integer(), nullable=False),
+            sa.Column('tipo_pago', sa.String(length=50), nullable=False),
+            sa.Column('estado_pago', sa.String(length=20), nullable=True),
+            sa.Column('numero_tarjeta', sa.String(length=4), nullable=True),
+            sa.Column('nombre_titular', sa.String(length=100), nullable=True),
+            sa.Column('banco', sa.String(length=100), nullable=True),
+            sa.Column('tipo_persona', sa.String(length=20), nullable=True),
+            sa.Column('tipo_documento', sa.String(length=20), nullable=True),
+            sa.Column('numero_documento', sa.String(length=50), nullable=True),
+            sa.Column('fecha_pago', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['pedido_id'], ['pedidos.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'carrito_items' not in existentes:
+        op.create_table(
+            'carrito_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('usuario_id', sa.Integer(), nullable=True),
+            sa.Column('producto_id', sa.Integer(), nullable=True),
+            sa.Column('cantidad', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['producto_id'], ['productos.id']),
+            sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('carrito_items')
+    op.drop_table('metodos_pago')
+    op.drop_table('detalles_pedido')
+    op.drop_table('pedidos')
+    op.drop_table('productos')
+    op.drop_table('usuarios')
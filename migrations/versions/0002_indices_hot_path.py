@@ -0,0 +1,73 @@
+"""índices de las consultas calientes
+
+- carrito_items(usuario_id, producto_id) único: agregar_carrito / upsert
+- pedidos(usuario_id, fecha): mis_pedidos
+- pedidos(fecha): admin_pedidos
+- detalles_pedido(pedido_id) y metodos_pago(pedido_id): detalle y confirmación
+
+Antes de crear el índice único se fusionan las filas repetidas del carrito
+(se suman las cantidades en la fila de menor id).
+
+Revision ID: 0002_indices_hot_path
+Revises: 0001_esquema_inicial
+Create Date: 2026-10-16 10:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_indices_hot_path'
+down_revision = '0001_esquema_inicial'
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    ('uq_carrito_items_usuario_producto', 'carrito_items', ['usuario_id', 'producto_id'], True),
+    ('ix_pedidos_usuario_fecha', 'pedidos', ['usuario_id', 'fecha'], False),
+    ('ix_pedidos_fecha', 'pedidos', ['fecha'], False),
+    ('ix_detalles_pedido_pedido_id', 'detalles_pedido', ['pedido_id'], False),
+    ('ix_metodos_pago_pedido_id', 'metodos_pago', ['pedido_id'], False),
+]
+
+
+def _indices_existentes(tabla):
+    return {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes(tabla)}
+
+
+def upgrade():
+    # Fusionar duplicados del carrito en la fila más antigua
+    op.execute(
+        """
+        UPDATE carrito_items
+        SET cantidad = (
+            SELECT SUM(c2.cantidad) FROM carrito_items c2
+            WHERE c2.usuario_id = carrito_items.usuario_id
+              AND c2.producto_id = carrito_items.producto_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM carrito_items
+            GROUP BY usuario_id, producto_id HAVING COUNT(*) > 1
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM carrito_items
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM carrito_items GROUP BY usuario_id, producto_id
+        )
+        """
+    )
+
+    for nombre, tabla, columnas, unico in INDICES:
+        if nombre not in _indices_existentes(tabla):
+            op.create_index(nombre, tabla, columnas, unique=unico)
+
+
+def downgrade():
+    for nombre, tabla, _, _ in reversed(INDICES):
+        if nombre in _indices_existentes(tabla):
+            op.drop_index(nombre, table_name=tabla)
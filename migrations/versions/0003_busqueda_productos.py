@@ -0,0 +1,80 @@
+"""búsqueda de texto completo en productos
+
+- SQLite: tabla FTS5 productos_fts (contenido externo sobre productos) con
+  triggers de INSERT/UPDATE/DELETE y reconstrucción inicial.
+- PostgreSQL: columna generada productos.busqueda (tsvector, nombre con peso
+  A y descripción con peso B) con índice GIN ix_productos_busqueda.
+
+Revision ID: 0003_busqueda_productos
+Revises: 0002_indices_hot_path
+Create Date: 2026-10-16 12:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_busqueda_productos'
+down_revision = '0002_indices_hot_path'
+branch_labels = None
+depends_on = None
+
+
+SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+        nombre, descripcion,
+        content='productos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO productos_fts (rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, coalesce(new.descripcion, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, coalesce(old.descripcion, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, descripcion ON productos BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, coalesce(old.descripcion, ''));
+        INSERT INTO productos_fts (rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, coalesce(new.descripcion, ''));
+    END
+    """,
+    "INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')",
+]
+
+POSTGRESQL = [
+    """
+    ALTER TABLE productos ADD COLUMN IF NOT EXISTS busqueda tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(descripcion, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS ix_productos_busqueda ON productos USING GIN (busqueda)',
+]
+
+
+def upgrade():
+    dialecto = op.get_bind().dialect.name
+    for sentencia in {'sqlite': SQLITE, 'postgresql': POSTGRESQL}.get(dialecto, []):
+        op.execute(sentencia)
+
+
+def downgrade():
+    dialecto = op.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        for trigger in ('productos_fts_au', 'productos_fts_ad', 'productos_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS productos_fts')
+    elif dialecto == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_productos_busqueda')
+        op.execute('ALTER TABLE productos DROP COLUMN IF EXISTS busqueda')
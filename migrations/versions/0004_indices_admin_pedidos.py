@@ -0,0 +1,57 @@
+"""índices compuestos para el panel de pedidos
+
+admin_pedidos filtra por estado y ordena por fecha o total con paginación
+por cursor sobre (columna, id):
+
+- pedidos(fecha, id) reemplaza a pedidos(fecha)
+- pedidos(estado, fecha, id)
+- pedidos(total, id)
+- pedidos(estado, total, id)
+
+El filtro por cliente usa el ix_pedidos_usuario_fecha que ya existe.
+
+Revision ID: 0004_indices_admin_pedidos
+Revises: 0003_busqueda_productos
+Create Date: 2026-10-16 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_indices_admin_pedidos'
+down_revision = '0003_busqueda_productos'
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    ('ix_pedidos_fecha_id', ['fecha', 'id']),
+    ('ix_pedidos_estado_fecha_id', ['estado', 'fecha', 'id']),
+    ('ix_pedidos_total_id', ['total', 'id']),
+    ('ix_pedidos_estado_total_id', ['estado', 'total', 'id']),
+]
+
+
+def _indices_existentes():
+    return {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes('pedidos')}
+
+
+def upgrade():
+    existentes = _indices_existentes()
+    for nombre, columnas in INDICES:
+        if nombre not in existentes:
+            op.create_index(nombre, 'pedidos', columnas)
+    # (fecha, id) cubre todo lo que servía (fecha)
+    if 'ix_pedidos_fecha' in existentes:
+        op.drop_index('ix_pedidos_fecha', table_name='pedidos')
+
+
+def downgrade():
+    existentes = _indices_existentes()
+    if 'ix_pedidos_fecha' not in existentes:
+        op.create_index('ix_pedidos_fecha', 'pedidos', ['fecha'])
+    for nombre, _ in reversed(INDICES):
+        if nombre in existentes:
+            op.drop_index(nombre, table_name='pedidos')
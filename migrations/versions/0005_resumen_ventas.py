@@ -0,0 +1,84 @@
+"""tablas de resumen de ventas
+
+- ventas_diarias(dia): pedidos, unidades e ingresos vendidos por día
+- ventas_productos(producto_id): unidades e ingresos por producto
+- pedidos_por_estado(estado): cantidad de pedidos en cada estado
+
+Se llenan a partir de los pedidos existentes; desde aquí la aplicación las
+mantiene al cambiar el estado de un pedido (ventas_utils).
+
+Revision ID: 0005_resumen_ventas
+Revises: 0004_indices_admin_pedidos
+Create Date: 2026-10-16 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_resumen_ventas'
+down_revision = '0004_indices_admin_pedidos'
+branch_labels = None
+depends_on = None
+
+
+VENDIDOS = "('Confirmado', 'Enviado', 'Entregado')"
+
+
+def upgrade():
+    op.create_table(
+        'ventas_diarias',
+        sa.Column('dia', sa.Date(), primary_key=True),
+        sa.Column('pedidos', sa.Integer(), nullable=False),
+        sa.Column('unidades', sa.Integer(), nullable=False),
+        sa.Column('ingresos', sa.Float(), nullable=False),
+    )
+    op.create_table(
+        'ventas_productos',
+        sa.Column('producto_id', sa.Integer(), sa.ForeignKey('productos.id'), primary_key=True),
+        sa.Column('unidades', sa.Integer(), nullable=False),
+        sa.Column('ingresos', sa.Float(), nullable=False),
+    )
+    op.create_index('ix_ventas_productos_unidades', 'ventas_productos', ['unidades'])
+    op.create_table(
+        'pedidos_por_estado',
+        sa.Column('estado', sa.String(20), primary_key=True),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+    )
+
+    op.execute(
+        f"""
+        INSERT INTO ventas_diarias (dia, pedidos, unidades, ingresos)
+        SELECT date(p.fecha), COUNT(*), COALESCE(SUM(d.unidades), 0), SUM(p.total)
+        FROM pedidos p
+        LEFT JOIN (
+            SELECT pedido_id, SUM(cantidad) AS unidades FROM detalles_pedido GROUP BY pedido_id
+        ) d ON d.pedido_id = p.id
+        WHERE p.estado IN {VENDIDOS}
+        GROUP BY date(p.fecha)
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO ventas_productos (producto_id, unidades, ingresos)
+        SELECT d.producto_id, SUM(d.cantidad), SUM(d.subtotal)
+        FROM detalles_pedido d JOIN pedidos p ON p.id = d.pedido_id
+        WHERE p.estado IN {VENDIDOS}
+        GROUP BY d.producto_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO pedidos_por_estado (estado, cantidad)
+        SELECT COALESCE(estado, 'Pendiente'), COUNT(*) FROM pedidos
+        GROUP BY COALESCE(estado, 'Pendiente')
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('pedidos_por_estado')
+    op.drop_index('ix_ventas_productos_unidades', table_name='ventas_productos')
+    op.drop_table('ventas_productos')
+    op.drop_table('ventas_diarias')
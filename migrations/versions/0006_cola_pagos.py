@@ -0,0 +1,64 @@
+"""cola de pagos asíncrona
+
+metodos_pago guarda ahora cada intento de pago desde que se envía el
+formulario (estado 'Pendiente'), mientras un worker lo cobra en la pasarela:
+
+- clave_idempotencia (única): el mismo envío nunca crea dos intentos
+- referencia: id de la transacción en la pasarela
+- mensaje: motivo del rechazo
+- actualizado_en: para recuperar intentos que quedaron a medias
+  (índice por estado_pago, actualizado_en)
+
+Revision ID: 0006_cola_pagos
+Revises: 0005_resumen_ventas
+Create Date: 2026-10-16 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_cola_pagos'
+down_revision = '0005_resumen_ventas'
+branch_labels = None
+depends_on = None
+
+
+COLUMNAS = [
+    sa.Column('clave_idempotencia', sa.String(64), nullable=True),
+    sa.Column('referencia', sa.String(100), nullable=True),
+    sa.Column('mensaje', sa.String(200), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+]
+
+
+def _existentes():
+    inspector = sa.inspect(op.get_bind())
+    columnas = {columna['name'] for columna in inspector.get_columns('metodos_pago')}
+    indices = {indice['name'] for indice in inspector.get_indexes('metodos_pago')}
+    return columnas, indices
+
+
+def upgrade():
+    columnas, indices = _existentes()
+    with op.batch_alter_table('metodos_pago') as batch:
+        for columna in COLUMNAS:
+            if columna.name not in columnas:
+                batch.add_column(columna.copy())
+    if 'ux_metodos_pago_clave' not in indices:
+        op.create_index('ux_metodos_pago_clave', 'metodos_pago', ['clave_idempotencia'], unique=True)
+    if 'ix_metodos_pago_estado_actualizado' not in indices:
+        op.create_index('ix_metodos_pago_estado_actualizado', 'metodos_pago', ['estado_pago', 'actualizado_en'])
+    op.execute('UPDATE metodos_pago SET actualizado_en = fecha_pago WHERE actualizado_en IS NULL')
+
+
+def downgrade():
+    columnas, indices = _existentes()
+    for nombre in ('ix_metodos_pago_estado_actualizado', 'ux_metodos_pago_clave'):
+        if nombre in indices:
+            op.drop_index(nombre, table_name='metodos_pago')
+    with op.batch_alter_table('metodos_pago') as batch:
+        for columna in reversed(COLUMNAS):
+            if columna.name in columnas:
+                batch.drop_column(columna.name)
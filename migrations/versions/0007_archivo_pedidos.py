@@ -0,0 +1,74 @@
+"""archivo de pedidos
+
+Tablas con la misma forma que pedidos, detalles_pedido y metodos_pago (sin
+las columnas ni los índices de la cola de pagos), adonde `flask
+archivar-pedidos` mueve los pedidos entregados o cancelados viejos con el
+mismo id:
+
+- pedidos_archivados (índice usuario_id, fecha: mis_pedidos)
+- detalles_pedido_archivados (índice pedido_id)
+- metodos_pago_archivados (índice pedido_id)
+
+Revision ID: 0007_archivo_pedidos
+Revises: 0006_cola_pagos
+Create Date: 2026-10-17 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_archivo_pedidos'
+down_revision = '0006_cola_pagos'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pedidos_archivados',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('usuario_id', sa.Integer(), sa.ForeignKey('usuarios.id'), nullable=False),
+        sa.Column('fecha', sa.DateTime(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('estado', sa.String(20), nullable=False),
+        sa.Column('archivado_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_pedidos_archivados_usuario_fecha', 'pedidos_archivados', ['usuario_id', 'fecha'])
+    op.create_table(
+        'detalles_pedido_archivados',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('pedido_id', sa.Integer(), sa.ForeignKey('pedidos_archivados.id'), nullable=False),
+        sa.Column('producto_id', sa.Integer(), sa.ForeignKey('productos.id'), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('precio', sa.Float(), nullable=False),
+        sa.Column('subtotal', sa.Float(), nullable=False),
+    )
+    op.create_index('ix_detalles_pedido_archivados_pedido_id', 'detalles_pedido_archivados', ['pedido_id'])
+    op.create_table(
+        'metodos_pago_archivados',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('pedido_id', sa.Integer(), sa.ForeignKey('pedidos_archivados.id'), nullable=False),
+        sa.Column('tipo_pago', sa.String(50), nullable=False),
+        sa.Column('estado_pago', sa.String(20), nullable=True),
+        sa.Column('numero_tarjeta', sa.String(4), nullable=True),
+        sa.Column('nombre_titular', sa.String(100), nullable=True),
+        sa.Column('banco', sa.String(100), nullable=True),
+        sa.Column('tipo_persona', sa.String(20), nullable=True),
+        sa.Column('tipo_documento', sa.String(20), nullable=True),
+        sa.Column('numero_documento', sa.String(50), nullable=True),
+        sa.Column('fecha_pago', sa.DateTime(), nullable=True),
+        sa.Column('referencia', sa.String(100), nullable=True),
+        sa.Column('mensaje', sa.String(200), nullable=True),
+    )
+    op.create_index('ix_metodos_pago_archivados_pedido_id', 'metodos_pago_archivados', ['pedido_id'])
+
+
+def downgrade():
+    op.drop_index('ix_metodos_pago_archivados_pedido_id', table_name='metodos_pago_archivados')
+    op.drop_table('metodos_pago_archivados')
+    op.drop_index('ix_detalles_pedido_archivados_pedido_id', table_name='detalles_pedido_archivados')
+    op.drop_table('detalles_pedido_archivados')
+    op.drop_index('ix_pedidos_archivados_usuario_fecha', table_name='pedidos_archivados')
+    op.drop_table('pedidos_archivados')
@@ -0,0 +1,53 @@
+"""marcas de actualización para GET condicional
+
+- productos.actualizado_en (índice: MAX() barato para el ETag del catálogo)
+- pedidos.actualizado_en (ETag de mis_pedidos y detalle_pedido)
+
+Se inicializan con la fecha de la migración (productos) y la del pedido.
+Las columnas se agregan y quitan con ALTER TABLE directo (SQLite >= 3.35):
+recrear productos en modo batch perdería los triggers de productos_fts.
+
+Revision ID: 0008_get_condicional
+Revises: 0007_archivo_pedidos
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_get_condicional'
+down_revision = '0007_archivo_pedidos'
+branch_labels = None
+depends_on = None
+
+
+def _existentes(tabla):
+    inspector = sa.inspect(op.get_bind())
+    columnas = {columna['name'] for columna in inspector.get_columns(tabla)}
+    indices = {indice['name'] for indice in inspector.get_indexes(tabla)}
+    return columnas, indices
+
+
+def upgrade():
+    for tabla in ('productos', 'pedidos'):
+        columnas, _ = _existentes(tabla)
+        if 'actualizado_en' not in columnas:
+            op.add_column(tabla, sa.Column('actualizado_en', sa.DateTime(), nullable=True))
+
+    _, indices = _existentes('productos')
+    if 'ix_productos_actualizado_en' not in indices:
+        op.create_index('ix_productos_actualizado_en', 'productos', ['actualizado_en'])
+    op.execute('UPDATE productos SET actualizado_en = CURRENT_TIMESTAMP WHERE actualizado_en IS NULL')
+    op.execute('UPDATE pedidos SET actualizado_en = fecha WHERE actualizado_en IS NULL')
+
+
+def downgrade():
+    _, indices = _existentes('productos')
+    if 'ix_productos_actualizado_en' in indices:
+        op.drop_index('ix_productos_actualizado_en', table_name='productos')
+    for tabla in ('pedidos', 'productos'):
+        columnas, _ = _existentes(tabla)
+        if 'actualizado_en' in columnas:
+            op.drop_column(tabla, 'actualizado_en')
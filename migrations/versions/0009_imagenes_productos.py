@@ -0,0 +1,46 @@
+"""miniaturas de imágenes de productos
+
+- productos.imagen_clave: hash del contenido de la imagen (variantes en disco)
+- productos.imagen_ancho: ancho de la imagen original
+
+Quedan en NULL: `flask procesar-imagenes` genera las variantes de las
+imágenes existentes. ALTER TABLE directo por los triggers de productos_fts
+(ver 0008).
+
+Revision ID: 0009_imagenes_productos
+Revises: 0008_get_condicional
+Create Date: 2026-10-17 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_imagenes_productos'
+down_revision = '0008_get_condicional'
+branch_labels = None
+depends_on = None
+
+COLUMNAS = (
+    ('imagen_clave', sa.String(length=32)),
+    ('imagen_ancho', sa.Integer()),
+)
+
+
+def _columnas():
+    return {columna['name'] for columna in sa.inspect(op.get_bind()).get_columns('productos')}
+
+
+def upgrade():
+    existentes = _columnas()
+    for nombre, tipo in COLUMNAS:
+        if nombre not in existentes:
+            op.add_column('productos', sa.Column(nombre, tipo, nullable=True))
+
+
+def downgrade():
+    existentes = _columnas()
+    for nombre, _ in reversed(COLUMNAS):
+        if nombre in existentes:
+            op.drop_column('productos', nombre)
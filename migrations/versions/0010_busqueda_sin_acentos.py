@@ -0,0 +1,65 @@
+"""búsqueda sin acentos en PostgreSQL
+
+- Extensión unaccent y configuración de texto productos_busqueda (copia de
+  'simple' que quita los acentos), igual que remove_diacritics en SQLite.
+- productos.busqueda se vuelve a generar con esa configuración (una columna
+  generada no se puede alterar: se borra y se crea de nuevo con su índice).
+
+En SQLite no hace nada.
+
+Revision ID: 0010_busqueda_sin_acentos
+Revises: 0009_imagenes_productos
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_busqueda_sin_acentos'
+down_revision = '0009_imagenes_productos'
+branch_labels = None
+depends_on = None
+
+
+CONFIGURACION = """
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'productos_busqueda') THEN
+        CREATE TEXT SEARCH CONFIGURATION productos_busqueda (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION productos_busqueda
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END $$
+"""
+
+
+def _columna(configuracion):
+    return f"""
+    ALTER TABLE productos ADD COLUMN busqueda tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{configuracion}', coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('{configuracion}', coalesce(descripcion, '')), 'B')
+    ) STORED
+    """
+
+
+def _regenerar(configuracion):
+    op.execute('DROP INDEX IF EXISTS ix_productos_busqueda')
+    op.execute('ALTER TABLE productos DROP COLUMN IF EXISTS busqueda')
+    op.execute(_columna(configuracion))
+    op.execute('CREATE INDEX ix_productos_busqueda ON productos USING GIN (busqueda)')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    op.execute(CONFIGURACION)
+    _regenerar('productos_busqueda')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _regenerar('simple')
+    op.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS productos_busqueda')
@@ -0,0 +1,57 @@
+"""pedidos archivados por estado
+
+- pedidos_por_estado.archivados: cuántos pedidos de cada estado se movieron
+  al archivo. pedidos_por_estado.cantidad sigue siendo el total histórico
+  (panel) y cantidad - archivados son los pedidos vivos (listado de admin).
+
+Se llena con los pedidos que ya están en pedidos_archivados.
+
+Revision ID: 0011_pedidos_por_estado_archivados
+Revises: 0010_busqueda_sin_acentos
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_pedidos_por_estado_archivados'
+down_revision = '0010_busqueda_sin_acentos'
+branch_labels = None
+depends_on = None
+
+
+def _columnas():
+    return {columna['name'] for columna in sa.inspect(op.get_bind()).get_columns('pedidos_por_estado')}
+
+
+def upgrade():
+    if 'archivados' in _columnas():
+        return
+    op.add_column(
+        'pedidos_por_estado',
+        sa.Column('archivados', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.execute(
+        """
+        UPDATE pedidos_por_estado SET archivados = (
+            SELECT COUNT(*) FROM pedidos_archivados a WHERE a.estado = pedidos_por_estado.estado
+        )
+        """
+    )
+    # Estados que solo quedan en el archivo (el resumen los cuenta igual)
+    op.execute(
+        """
+        INSERT INTO pedidos_por_estado (estado, cantidad, archivados)
+        SELECT a.estado, COUNT(*), COUNT(*) FROM pedidos_archivados a
+        WHERE a.estado IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM pedidos_por_estado e WHERE e.estado = a.estado)
+        GROUP BY a.estado
+        """
+    )
+
+
+def downgrade():
+    if 'archivados' in _columnas():
+        op.drop_column('pedidos_por_estado', 'archivados')